@@ -0,0 +1,160 @@
+"""
+Load-test concurrent logins against one worker of each serving mode.
+
+Each mode is started as a subprocess with a single worker, against the fake
+identity backend, which waits --latency seconds per call to stand in for a
+round trip to Firebase:
+
+- sync: gunicorn's default sync worker (app:server), one request at a time
+- gthread: gunicorn with --threads threads per worker (app:server)
+- asgi: uvicorn (asgi:application), with POST /login handled on the event loop
+
+For every concurrency level, --requests logins with distinct ID tokens (so
+every one waits on the identity provider to verify it) are sent over that many
+keep-alive connections. The script reports logins per second and the p50 and p95 latency.
+The client speaks HTTP/1.1 directly on asyncio streams: a pooled httpx client
+tops out below 100 requests/s at 50 connections, slower than the servers.
+
+    python benchmarks/bench_async_login.py --latency 0.1 --concurrency 1 10 50 --requests 200
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import statistics
+from urllib.parse import urlencode, urlsplit
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT, "src")
+sys.path.insert(0, SRC_DIR)
+
+from identity import fake_id_token  # noqa: E402
+
+MODES = {
+    "sync": lambda port, threads: [sys.executable, "-m", "gunicorn", "--chdir", SRC_DIR, "-w", "1",
+                                   "-b", f"127.0.0.1:{port}", "app:server"],
+    "gthread": lambda port, threads: [sys.executable, "-m", "gunicorn", "--chdir", SRC_DIR, "-w", "1",
+                                      "--threads", str(threads), "-b", f"127.0.0.1:{port}", "app:server"],
+    "asgi": lambda port, threads: [sys.executable, "-m", "uvicorn", "--app-dir", SRC_DIR, "--workers", "1",
+                                   "--port", str(port), "--log-level", "warning", "asgi:application"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start(mode, latency, threads, jobs_dir):
+    port = free_port()
+    env = dict(os.environ, IDENTITY_BACKEND="fake", FAKE_IDENTITY_LATENCY=str(latency), APP_ENV="production",
+               JOBS_DIR=jobs_dir, ASGI_WSGI_THREADS=str(threads))
+    process = subprocess.Popen(MODES[mode](port, threads), cwd=SRC_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with {process.returncode}")
+        try:
+            if httpx.get(f"{url}/about", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+async def post_form(reader, writer, host, path, body):
+    """Send one form POST on an open connection; returns (status, whether the server closes the connection)."""
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/x-www-form-urlencoded\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode("ascii") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length, close = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+        elif name.lower() == "connection":
+            close = value.strip().lower() == "close"
+    await reader.readexactly(length)
+    return status, close
+
+
+async def load(url, concurrency, n_requests, offset):
+    """(seconds, latencies, failures) for n_requests logins over `concurrency` connections."""
+    parts = urlsplit(url)
+    users = iter(range(offset, offset + n_requests))
+    latencies, failures = [], 0
+
+    async def connection():
+        nonlocal failures
+        reader = writer = None
+        for i in users:
+            email = f"user{i}@example.org"
+            body = urlencode({"email": email, "id_token": fake_id_token(f"user{i}", email)}).encode("ascii")
+            start = time.perf_counter()
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+            # No cookies are sent, so no request arrives already signed in
+            status, close = await post_form(reader, writer, parts.netloc, "/login", body)
+            latencies.append(time.perf_counter() - start)
+            failures += status != 302
+            if close:
+                # gunicorn's sync worker closes every connection after one response
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(connection() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, failures
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per simulated identity call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=200, help="Logins per concurrency level")
+    parser.add_argument("--threads", type=int, default=8, help="Threads of the gthread worker and the ASGI WSGI pool")
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'concurrency':>11} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'failed':>7}")
+    with tempfile.TemporaryDirectory() as jobs_dir:
+        for mode in args.modes:
+            process, url = start(mode, args.latency, args.threads, jobs_dir)
+            try:
+                offset = 0
+                for concurrency in args.concurrency:
+                    # A few requests to warm up the worker first
+                    asyncio.run(load(url, 1, 2, offset + 10 ** 6))
+                    seconds, latencies, failures = asyncio.run(load(url, concurrency, args.requests, offset))
+                    offset += args.requests
+                    print(f"{mode:<8} {concurrency:>11} {args.requests / seconds:>9.1f} "
+                          f"{percentile(latencies, 50) * 1000:>8.0f} {percentile(latencies, 95) * 1000:>8.0f} "
+                          f"{failures:>7}")
+            finally:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    main()
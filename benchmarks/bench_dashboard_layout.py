@@ -0,0 +1,96 @@
+"""
+Benchmark display_page: the dashboard layout rebuilt per navigation vs the cached layout.
+
+"rebuilt" calls create_dashboard() on every /dashboard navigation (the old
+behavior), "cached" returns the shared layout from dashboard_layout(). For each,
+reports the median time of the display_page call, the memory it allocates
+(tracemalloc, one call), and the median time of the full Dash callback request,
+which also serializes the layout.
+
+    python benchmarks/bench_dashboard_layout.py --repeat 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import tracemalloc
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+warnings.filterwarnings("ignore")
+
+import app  # noqa: E402
+
+# Body of the request the browser sends when the URL changes to /dashboard
+CALLBACK_BODY = {
+    "output": "..page-content.children...user-info.data..",
+    "outputs": [{"id": "page-content", "property": "children"}, {"id": "user-info", "property": "data"}],
+    "inputs": [{"id": "url", "property": "pathname", "value": "/dashboard"}],
+    "changedPropIds": ["url.pathname"],
+}
+
+
+def median_ms(call, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def allocations(call):
+    """Bytes and blocks allocated by one call that are still alive when it returns."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = call()  # noqa: F841 - the returned layout is what a request would keep
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    return sum(s.size_diff for s in stats), sum(s.count_diff for s in stats)
+
+
+def login(client):
+    with client.session_transaction() as session:
+        session.update({'_user_id': 'bench', 'user_id': 'bench', 'user_name': 'bench',
+                        'user_email': 'bench@example.com'})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    display_page = app.display_page
+    client = app.server.test_client()
+    login(client)
+    cached_layout = app.dashboard_layout
+    modes = [("rebuilt", app.create_dashboard), ("cached", cached_layout)]
+
+    print(f"{'layout':<8} {'call ms':>8} {'alloc KB':>9} {'blocks':>8} {'request ms':>11} {'response KB':>12}")
+    for mode, layout in modes:
+        app.dashboard_layout = layout
+        with app.server.test_request_context():
+            app.login_user(app.User('bench', 'bench', 'bench@example.com'))
+            display_page("/dashboard")
+            call_ms = median_ms(lambda: display_page("/dashboard"), args.repeat)
+            size, blocks = allocations(lambda: display_page("/dashboard"))
+
+        def request():
+            response = client.post("/_dash-update-component", json=CALLBACK_BODY)
+            assert response.status_code == 200, response.status_code
+            return response
+
+        body = request().get_data()
+        assert json.loads(body)["response"]["user-info"]["data"]["username"] == "bench"
+        request_ms = median_ms(request, max(args.repeat // 4, 1))
+        print(f"{mode:<8} {call_ms:>8.3f} {size / 1024:>9.1f} {blocks:>8,} {request_ms:>11.2f} {len(body) / 1024:>12.1f}")
+    app.dashboard_layout = cached_layout
+
+
+if __name__ == "__main__":
+    main()
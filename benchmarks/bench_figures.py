@@ -0,0 +1,94 @@
+"""
+Benchmark dashboard figure payloads: full Plotly figures vs cached templates vs Dash Patches.
+
+For the risk gauge and the trend chart (at 30 and 365 days of history) compares
+what the prediction callback sends and how long it takes to produce:
+
+- full: the figure built with Plotly on every request (the old callback)
+- template: the cached template with the request's values filled in
+- patch: a Dash Patch with only those values, for a graph already on the page
+
+Time covers building and serializing to JSON the way Dash does. Every template
+figure is checked to render the same figure as the full build.
+
+    python benchmarks/bench_figures.py --days 30 365 --repeat 200
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+from plotly.io.json import to_json_plotly
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from figures import (build_risk_gauge, build_trend_chart, risk_gauge_figure, risk_gauge_patch,  # noqa: E402
+                     trend_chart_figure, trend_chart_patch)
+
+
+def trend_history(days, seed=0):
+    """Trend aggregates shaped like TrendStore.lookup() after the dashboard's renames."""
+    rng = np.random.default_rng(seed)
+    risk = np.clip(rng.normal(0.4, 0.15, days), 0, 1)
+    frame = pd.DataFrame({
+        'date': pd.date_range("2023-01-01", periods=days),
+        'risk_level': risk,
+        'new_cases': rng.integers(0, 500, days).astype(float),
+    })
+    frame['risk_ma3'] = frame['risk_level'].rolling(window=3).mean()
+    frame['risk_projection'] = np.clip(frame['risk_level'].rolling(window=7, min_periods=1).mean() * 1.1, 0, 1)
+    return frame
+
+
+def timed(build, repeat):
+    """Median milliseconds to build and serialize, and the payload size in bytes."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = to_json_plotly(build())
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), len(payload.encode("utf-8"))
+
+
+def same_figure(figure, reference):
+    """Whether a figure dict renders the same as a Plotly-built figure."""
+    return pio.from_json(to_json_plotly(figure)).to_plotly_json() == pio.from_json(
+        to_json_plotly(reference)).to_plotly_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 365])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    # Build the templates outside the timings
+    risk_gauge_figure(0.0)
+    trend_chart_figure(trend_history(3))
+
+    cases = [("gauge", lambda: build_risk_gauge(0.57), lambda: risk_gauge_figure(0.57),
+              lambda: risk_gauge_patch(0.57))]
+    for days in args.days:
+        history = trend_history(days)
+        cases.append((f"trend {days}d", lambda h=history: build_trend_chart(h), lambda h=history: trend_chart_figure(h),
+                      lambda h=history: trend_chart_patch(h)))
+
+    print(f"{'figure':<12} {'full ms':>8} {'full B':>8} {'tmpl ms':>8} {'tmpl B':>8} {'patch ms':>9} {'patch B':>8} "
+          f"{'speedup':>8} {'same':>5}")
+    for name, full, template, patch in cases:
+        full_ms, full_bytes = timed(full, args.repeat)
+        template_ms, template_bytes = timed(template, args.repeat)
+        patch_ms, patch_bytes = timed(patch, args.repeat)
+        same = same_figure(template(), full())
+        print(f"{name:<12} {full_ms:>8.2f} {full_bytes:>8,} {template_ms:>8.3f} {template_bytes:>8,} "
+              f"{patch_ms:>9.3f} {patch_bytes:>8,} {full_ms / patch_ms:>7.0f}x {str(same):>5}")
+        assert same, f"{name}: template figure differs from the Plotly build"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Micro-benchmarks of the prediction hot path, stage by stage.
+
+Each case is timed the way pytest-benchmark does it: the number of calls per
+round is calibrated so a round lasts at least --min-round-time, rounds repeat
+for --max-time seconds (at least --min-rounds), and min/median/mean/stddev/IQR
+are reported per call. Cases run on the shipped model (src/models/outbreak_model.pkl,
+or MODEL_DIR) and on seeded synthetic inputs, at each of --sizes:
+
+- model: sklearn predict_proba and ArrayForest proba on N rows, src/predict.py's
+  predict_outbreak called N times and inference.score_frame on N rows
+- predict: app.predict_outbreak called N times with new inputs (prediction cache
+  cleared before every round) and with the same inputs (cache hits)
+- recommendation: app.get_recommendation
+- figures: the risk gauge and trend chart built as Plotly figures
+  (build_risk_gauge, build_trend_chart), as full dcc.Graph components
+  (create_risk_gauge, create_trend_chart), and as the Patches a click sends
+- components: app.create_prediction_card, and the card serialized to JSON the way Dash does
+- callback: app.update_dashboard, the whole click (prediction cache cleared every round)
+
+    python benchmarks/bench_hot_path.py --sizes 1 10 100 1000
+    python benchmarks/bench_hot_path.py --filter figures --json hot_path.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import logging
+import subprocess
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+os.environ.setdefault("JOBS_DIR", os.path.join(os.environ.get("TMPDIR", "/tmp"), "bench-hot-path-jobs"))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import plotly  # noqa: E402
+
+import app  # noqa: E402
+import predict  # noqa: E402
+from figures import build_risk_gauge, build_trend_chart, create_risk_gauge, create_trend_chart  # noqa: E402
+from inference import FEATURE_COLUMNS, score_frame  # noqa: E402
+from model_registry import load_model  # noqa: E402
+from trends import NATIONAL  # noqa: E402
+
+logging.disable(logging.INFO)
+
+# Synthetic inputs are drawn from these ranges, in FEATURE_COLUMNS order
+FEATURE_RANGES = [(0, 500), (30, 95), (100, 20000), (5, 40), (0, 50)]
+VACCINATION_RANGE = (0, 100)
+
+
+class Case:
+    """One benchmark: `call()` is timed, `setup()` (untimed) runs before every round."""
+
+    def __init__(self, group, name, call, size=None, setup=None):
+        self.group = group
+        self.name = name
+        self.call = call
+        # Rows per call, for the per-row column
+        self.size = size
+        self.setup = setup
+
+
+def synthetic_rows(n, rng):
+    return [[round(rng.uniform(low, high), 1) for low, high in FEATURE_RANGES]
+            + [round(rng.uniform(*VACCINATION_RANGE), 1)] for _ in range(n)]
+
+
+def run_case(case, min_round_time, max_time, min_rounds):
+    """Per-call timings (seconds) of `case`, pytest-benchmark style."""
+    if case.setup:
+        case.setup()
+    case.call()
+    # Calibrate the calls per round
+    iterations = 1
+    while True:
+        if case.setup:
+            case.setup()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            case.call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round_time or case.setup:
+            # With a per-round setup, every call must follow its setup
+            break
+        iterations *= 2 if elapsed == 0 else max(2, min(10, int(min_round_time / elapsed) + 1))
+    rounds = []
+    deadline = time.perf_counter() + max_time
+    while len(rounds) < min_rounds or time.perf_counter() < deadline:
+        if case.setup:
+            case.setup()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            case.call()
+        rounds.append((time.perf_counter() - start) / iterations)
+    return rounds, iterations
+
+
+def summarize(rounds, iterations):
+    quartiles = statistics.quantiles(rounds, n=4) if len(rounds) > 1 else [rounds[0]] * 3
+    mean = statistics.fmean(rounds)
+    return {
+        "min": min(rounds),
+        "max": max(rounds),
+        "mean": mean,
+        "stddev": statistics.stdev(rounds) if len(rounds) > 1 else 0.0,
+        "median": statistics.median(rounds),
+        "iqr": quartiles[2] - quartiles[0],
+        "q1": quartiles[0],
+        "q3": quartiles[2],
+        "ops": 1 / mean if mean else None,
+        "rounds": len(rounds),
+        "iterations": iterations,
+    }
+
+
+def build_cases(sizes, seed):
+    rng = random.Random(seed)
+    sklearn_model = load_model(app.model_registry.path, engine="sklearn")
+    array_model = load_model(app.model_registry.path, engine="array")
+    cases = []
+
+    for size in sizes:
+        rows = synthetic_rows(size, rng)
+        X = np.array([row[:len(FEATURE_COLUMNS)] for row in rows], dtype=np.float64)
+        frame = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+        records = frame.to_dict("records")
+        cases += [
+            # Scored with feature names, as inference.predict_proba serves the sklearn model
+            Case("model", "sklearn predict_proba", lambda frame=frame: sklearn_model.predict_proba(frame), size),
+            Case("model", "ArrayForest proba", lambda X=X: array_model.predict_proba(X), size),
+            Case("model", "predict.predict_outbreak x N",
+                 lambda records=records: [predict.predict_outbreak(record) for record in records], size),
+            Case("model", "inference.score_frame", lambda frame=frame: score_frame(array_model, frame), size),
+            Case("predict", "app.predict_outbreak x N, cache miss",
+                 lambda rows=rows: [app.predict_outbreak(*row, region=NATIONAL) for row in rows], size,
+                 setup=app.prediction_cache.clear),
+            Case("predict", "app.predict_outbreak x N, cache hit",
+                 lambda rows=rows: [app.predict_outbreak(*row, region=NATIONAL) for row in rows], size),
+        ]
+
+    new_cases, humidity, density, temperature, rainfall, vaccination = synthetic_rows(1, rng)[0]
+    details = app.predict_outbreak_details(new_cases, humidity, density, temperature, rainfall, vaccination)
+    probability = details['probability']
+    prediction_details = {
+        'risk_level': details['risk_level'],
+        'confidence': details['confidence'],
+        'key_factors': {
+            'Population Density Impact': f"{density:.1f} people/km²",
+            'Environmental Risk': f"{(humidity * temperature / 100):.1f}",
+            'Current Spread Rate': f"{(new_cases / density):.2f}",
+            'Vaccination Coverage': f"{vaccination:.1f}%"
+        },
+        'recommendation': app.get_recommendation(details['risk_level'], probability),
+        'model_version': details['model_version'],
+    }
+    # The frame update_dashboard charts
+    history = app.trend_store.lookup(NATIONAL, days=30).rename(columns={
+        'Date': 'date', 'risk_rate': 'risk_level', 'cases': 'new_cases', 'risk_rate_ma3': 'risk_ma3'})
+    card = app.create_prediction_card(prediction_details)
+
+    cases += [
+        Case("recommendation", "get_recommendation",
+             lambda: app.get_recommendation(details['risk_level'], probability)),
+        Case("figures", "build_risk_gauge (go.Figure)", lambda: build_risk_gauge(probability)),
+        Case("figures", "create_risk_gauge (dcc.Graph)", lambda: create_risk_gauge(probability)),
+        Case("figures", "risk_gauge_patch", lambda: app.risk_gauge_patch(probability)),
+        Case("figures", "build_trend_chart (go.Figure)", lambda: build_trend_chart(history)),
+        Case("figures", "create_trend_chart (dcc.Graph)", lambda: create_trend_chart(history)),
+        Case("figures", "trend_chart_patch", lambda: app.trend_chart_patch(history)),
+        Case("components", "create_prediction_card", lambda: app.create_prediction_card(prediction_details)),
+        Case("components", "prediction card to JSON",
+             lambda: json.dumps(card, cls=plotly.utils.PlotlyJSONEncoder)),
+        Case("callback", "update_dashboard",
+             lambda: app.update_dashboard(1, new_cases, humidity, density, temperature, rainfall, vaccination,
+                                          NATIONAL),
+             setup=app.prediction_cache.clear),
+    ]
+    # Grouped by stage, each case from the smallest batch up
+    groups = list(dict.fromkeys(case.group for case in cases))
+    return sorted(cases, key=lambda case: groups.index(case.group))
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000], help="Rows per batch")
+    parser.add_argument("--filter", help="Only cases whose group or name contains this text")
+    parser.add_argument("--min-round-time", type=float, default=0.005, help="Seconds a round lasts at least")
+    parser.add_argument("--max-time", type=float, default=0.5, help="Seconds of rounds per case")
+    parser.add_argument("--min-rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic inputs")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    cases = [case for case in build_cases(args.sizes, args.seed)
+             if not args.filter or args.filter in case.group or args.filter in case.name]
+    print(f"model {app.model_registry.current().version}, commit {git_revision()}")
+    print(f"{'group':<15} {'case':<38} {'N':>5} {'min':>10} {'median':>10} {'mean':>10} {'stddev':>10} "
+          f"{'per row':>10} {'rounds':>7}")
+    results = []
+    for case in cases:
+        rounds, iterations = run_case(case, args.min_round_time, args.max_time, args.min_rounds)
+        stats = summarize(rounds, iterations)
+        per_row = stats["median"] / (case.size or 1)
+        print(f"{case.group:<15} {case.name:<38} {case.size or '':>5} {format_time(stats['min']):>10} "
+              f"{format_time(stats['median']):>10} {format_time(stats['mean']):>10} "
+              f"{format_time(stats['stddev']):>10} {format_time(per_row):>10} {stats['rounds']:>7}")
+        results.append({"group": case.group, "name": case.name,
+                        "params": {"size": case.size} if case.size else None, "stats": stats})
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "machine_info": {"python_version": platform.python_version(), "platform": platform.platform(),
+                                 "cpu_count": os.cpu_count()},
+                "commit_info": {"id": git_revision()},
+                "datetime": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "model_version": app.model_registry.current().version,
+                "benchmarks": results,
+            }, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark identity lookups: serial per-user calls vs concurrent, batched and cached ones.
+
+Runs against FakeIdentityBackend, which sleeps --latency seconds per call to
+stand in for a round trip to Firebase. For each user count:
+
+- serial: one get_user_by_email call per user, one after another (the old
+  User.get_by_email loop)
+- concurrent: the same single-user calls through IdentityService, at most
+  --concurrency at a time
+- batched: IdentityService.get_users_by_email, one get_users call per 100
+  users, at most --concurrency batches at a time
+- cached: the same batched lookup again
+
+It then imports an organization's user list in which half the users already
+exist, serially (a lookup, then a create when missing) and with ensure_users.
+
+    python benchmarks/bench_identity.py --users 100 1000 5000 --latency 0.02 --concurrency 8
+"""
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from identity import FakeIdentityBackend, IdentityService, UserNotFound  # noqa: E402
+
+
+def directory(n_users, latency):
+    backend = FakeIdentityBackend(latency=latency)
+    for i in range(n_users):
+        backend.add_user(f"uid{i}", f"user{i}@example.org", f"User {i}")
+    return backend
+
+
+def half_directory(users, latency):
+    """A directory holding every other user of an (email, name) list."""
+    backend = FakeIdentityBackend(latency=latency)
+    for i, (email, name) in enumerate(users[::2]):
+        backend.add_user(f"uid{2 * i}", email, name)
+    return backend
+
+
+def timed(call):
+    start = time.perf_counter()
+    result = call()
+    return time.perf_counter() - start, result
+
+
+def serial_lookup(backend, emails):
+    found = {}
+    for email in emails:
+        try:
+            found[email] = backend.get_user_by_email(email)
+        except UserNotFound:
+            found[email] = None
+    return found
+
+
+def serial_import(backend, users):
+    for email, name in users:
+        try:
+            backend.get_user_by_email(email)
+        except UserNotFound:
+            backend.create_user(email, display_name=name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per simulated identity call")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--skip-serial-above", type=int, default=1000,
+                        help="Largest user count also timed serially (serial time is users x latency)")
+    args = parser.parse_args()
+
+    print(f"{'users':>6} {'method':<11} {'seconds':>8} {'calls':>6} {'speedup':>8}")
+    for n_users in args.users:
+        emails = [f"user{i}@example.org" for i in range(n_users)]
+        backend = directory(n_users, args.latency)
+        service = IdentityService(backend, max_concurrency=args.concurrency)
+        serial_s = None
+        rows = []
+        if n_users <= args.skip_serial_above:
+            serial_s, _ = timed(lambda: serial_lookup(backend, emails))
+            rows.append(("serial", serial_s, n_users))
+
+        fresh = IdentityService(directory(n_users, args.latency), max_concurrency=args.concurrency)
+        seconds, _ = timed(lambda: fresh._map(fresh.get_user_by_email, emails))
+        rows.append(("concurrent", seconds, fresh.stats()['remote_calls']))
+
+        seconds, found = timed(lambda: service.get_users_by_email(emails))
+        assert all(identity is not None for identity in found.values())
+        rows.append(("batched", seconds, service.stats()['remote_calls']))
+        before = service.stats()['remote_calls']
+        seconds, _ = timed(lambda: service.get_users_by_email(emails))
+        rows.append(("cached", seconds, service.stats()['remote_calls'] - before))
+
+        # Import a list where every other user already exists
+        users = [(f"user{i}@example.org", f"User {i}") for i in range(n_users)]
+        if n_users <= args.skip_serial_above:
+            import_backend = half_directory(users, args.latency)
+            seconds, _ = timed(lambda: serial_import(import_backend, users))
+            rows.append(("import ser", seconds, sum(import_backend.calls.values())))
+        existing = half_directory(users, args.latency)
+        importer = IdentityService(existing, max_concurrency=args.concurrency)
+        seconds, imported = timed(lambda: importer.ensure_users(users))
+        assert len(imported) == n_users
+        rows.append(("import ens", seconds, sum(existing.calls.values())))
+
+        for method, seconds, calls in rows:
+            baseline = serial_s if not method.startswith("import") else next(
+                (s for m, s, _ in rows if m == "import ser"), None)
+            speedup = f"{baseline / seconds:>7.0f}x" if baseline and seconds else f"{'-':>8}"
+            print(f"{n_users:>6} {method:<11} {seconds:>8.3f} {calls:>6} {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark ArrayForest against sklearn's RandomForestClassifier.predict_proba.
+
+Times both engines at batch sizes 1, 100 and 100k on the shipped model and on a
+larger synthetic forest, and checks that the probabilities are bit-identical.
+
+    python benchmarks/bench_inference.py --sizes 1 100 100000 --trees 100
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from array_forest import ArrayForest  # noqa: E402
+from inference import FEATURE_COLUMNS  # noqa: E402
+from model_registry import MODEL_DIR, MODEL_FILENAME  # noqa: E402
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+def feature_rows(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(0, 500, n_rows),
+        rng.uniform(20, 100, n_rows),
+        rng.integers(100, 30000, n_rows),
+        rng.uniform(-5, 45, n_rows),
+        rng.uniform(0, 50, n_rows),
+    ]).astype(np.float64)
+
+
+def synthetic_model(n_trees, n_rows):
+    X = feature_rows(n_rows, seed=1)
+    rng = np.random.default_rng(2)
+    signal = X[:, 0] / 500 + X[:, 1] / 100 - np.abs(X[:, 3]) / 90
+    y = (signal + rng.normal(0, 0.5, n_rows) > 0.8).astype(int)
+    return RandomForestClassifier(n_estimators=n_trees, random_state=42, n_jobs=-1).fit(
+        pd.DataFrame(X, columns=FEATURE_COLUMNS), y).set_params(n_jobs=None)
+
+
+def median_ms(func, X, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def compare(name, model, sizes, repeats):
+    forest = ArrayForest.from_model(model)
+    depth = max(estimator.tree_.max_depth for estimator in model.estimators_)
+    print(f"\n{name}: {len(model.estimators_)} trees, {forest.node_count:,} nodes, max depth {depth}")
+    print(f"{'batch':>8} {'sklearn ms':>12} {'array ms':>10} {'speedup':>8} {'identical':>10}")
+    for size in sizes:
+        X = feature_rows(size, seed=3)
+        identical = np.array_equal(model.predict_proba(X), forest.predict_proba(X))
+        runs = repeats if size <= 1000 else max(1, repeats // 10)
+        sklearn_ms = median_ms(model.predict_proba, X, runs)
+        array_ms = median_ms(forest.predict_proba, X, runs)
+        print(f"{size:>8} {sklearn_ms:>12.3f} {array_ms:>10.3f} {sklearn_ms / array_ms:>7.1f}x {str(identical):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 100000])
+    parser.add_argument("--repeats", type=int, default=50, help="Timed calls per batch size (fewer for big batches)")
+    parser.add_argument("--trees", type=int, default=100, help="Trees in the synthetic forest")
+    parser.add_argument("--rows", type=int, default=50000, help="Training rows for the synthetic forest")
+    args = parser.parse_args()
+
+    compare("Shipped model", joblib.load(os.path.join(MODEL_DIR, MODEL_FILENAME)), args.sizes, args.repeats)
+    compare("Synthetic forest", synthetic_model(args.trees, args.rows), args.sizes, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
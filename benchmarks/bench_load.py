@@ -0,0 +1,400 @@
+"""
+Load-test the web app in-process: Dash prediction callbacks, logins and static pages.
+
+src/app.py is imported with identity calls stubbed (IDENTITY_BACKEND=fake, waiting
+--identity-latency seconds per call) and served on a local port from a background
+thread, by werkzeug's threaded server (--server wsgi) or by uvicorn running
+src/asgi.py (--server asgi). A separate client process, so it doesn't compete with
+the app for the GIL, replays each scenario at each concurrency level over
+keep-alive connections:
+
+- static: GET /, /about, /contact, /login and /static/style.css in turn
+- login: POST /login with a new user's ID token each time, so every login
+  waits on the identity backend to verify it
+- dashboard: the update_dashboard callback (POST /_dash-update-component) as a
+  signed-in user, with new form values each time so predictions miss the cache
+
+Every run reports throughput, p50/p95/p99 latency, failed requests, and the app
+process's RSS after the run and its peak RSS so far. Results are written as JSON
+(--output, by default benchmarks/results/load-<commit>.json) with the commit, the
+settings and the machine. --compare prints the change from an earlier results file
+and exits with status 1 when a p95 latency or a throughput got worse by more than
+--threshold.
+
+    python benchmarks/bench_load.py --concurrency 1 8 32 --requests 300
+    python benchmarks/bench_load.py --compare benchmarks/results/load-531f4ae.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import warnings
+import platform
+import tempfile
+import threading
+import statistics
+import subprocess
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT, "src")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+sys.path.insert(0, SRC_DIR)
+
+warnings.filterwarnings("ignore")
+
+SCENARIOS = ["static", "login", "dashboard"]
+STATIC_PAGES = ["/", "/about", "/contact", "/login", "/static/style.css"]
+# Status each scenario's requests must answer with; anything else counts as failed
+EXPECTED_STATUS = {"static": 200, "login": 302, "dashboard": 200}
+# Form values for the dashboard scenario are drawn from these ranges
+FORM_RANGES = {
+    "new-cases": (0, 500),
+    "humidity": (30, 95),
+    "population-density": (100, 20000),
+    "temperature": (5, 40),
+    "rainfall": (0, 50),
+    "vaccination-rate": (0, 100),
+}
+
+
+# -- client process ---------------------------------------------------------
+
+async def read_response(reader):
+    """(status, whether the server closes the connection) after reading one whole response."""
+    status = int((await reader.readline()).split()[1])
+    length, chunked, close = 0, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding":
+            chunked = "chunked" in value
+        elif name == "connection":
+            close = value == "close"
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status, close
+
+
+async def replay(host, port, requests, concurrency):
+    """Send raw HTTP requests over `concurrency` connections; (seconds, latencies, statuses)."""
+    pending = iter(requests)
+    latencies, statuses = [], Counter()
+
+    async def connection():
+        reader = writer = None
+        for request in pending:
+            start = time.perf_counter()
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            await writer.drain()
+            status, close = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+            if close:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(connection() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, dict(statuses)
+
+
+def drive(host, port, requests, concurrency):
+    """Entry point of the client process."""
+    return asyncio.run(replay(host, port, requests, concurrency))
+
+
+# -- requests -----------------------------------------------------------------
+
+def http_request(method, path, host, headers=None, body=b""):
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {host}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    if body or method == "POST":
+        lines.append(f"Content-Length: {len(body)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def static_requests(host, n):
+    return [http_request("GET", STATIC_PAGES[i % len(STATIC_PAGES)], host) for i in range(n)]
+
+
+def login_form(user):
+    """The login form as the page posts it, with an ID token the fake identity backend accepts."""
+    from identity import fake_id_token
+    return {"email": f"{user}@example.org", "id_token": fake_id_token(user, f"{user}@example.org")}
+
+
+def login_requests(host, n, offset):
+    return [http_request("POST", "/login", host, {"Content-Type": "application/x-www-form-urlencoded"},
+                         urlencode(login_form(f"load{offset + i}")).encode("ascii")) for i in range(n)]
+
+
+def dashboard_callback(app):
+    """The registered update_dashboard callback (fired by the predict button)."""
+    for callback in app.app._callback_list:
+        if any(item["id"] == "predict-button" and item["property"] == "n_clicks" for item in callback["inputs"]) \
+                and "prediction-message.children" in callback["output"]:
+            return callback
+    raise RuntimeError("update_dashboard is not registered")
+
+
+def dashboard_requests(app, host, cookie, n, seed):
+    callback = dashboard_callback(app)
+    outputs = [dict(zip(("id", "property"), output.rsplit(".", 1)))
+               for output in callback["output"].strip(".").split("...")]
+    regions = app.trend_store.regions()
+    rng = random.Random(seed)
+    requests = []
+    for i in range(n):
+        state = []
+        for item in callback["state"]:
+            if item["id"] in FORM_RANGES:
+                value = round(rng.uniform(*FORM_RANGES[item["id"]]), 1)
+            else:
+                value = rng.choice(regions)
+            state.append({"id": item["id"], "property": item["property"], "value": value})
+        body = json.dumps({
+            "output": callback["output"],
+            "outputs": outputs,
+            "inputs": [{"id": "predict-button", "property": "n_clicks", "value": i + 1}],
+            "state": state,
+            "changedPropIds": ["predict-button.n_clicks"],
+        }).encode("utf-8")
+        requests.append(http_request("POST", "/_dash-update-component", host,
+                                     {"Content-Type": "application/json", "Cookie": f"session={cookie}"}, body))
+    return requests
+
+
+def session_cookie(app):
+    """A signed-in session, as the login form leaves it."""
+    with app.server.test_client() as client:
+        client.post("/login", data=login_form("load-test"))
+        return client.get_cookie("session").value
+
+
+# -- app process --------------------------------------------------------------
+
+def memory_mb():
+    """(current RSS, peak RSS) of this process in MB."""
+    values = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in ("VmRSS", "VmHWM"):
+                    values[name] = int(value.split()[0]) / 1024
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KB elsewhere
+        values["VmHWM"] = peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return values.get("VmRSS"), values.get("VmHWM")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, app):
+    """Serve the app from a background thread; returns (port, stop function)."""
+    if kind == "wsgi":
+        from werkzeug.serving import make_server
+
+        server = make_server("127.0.0.1", 0, app.server, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server.server_port, server.shutdown
+
+    import uvicorn
+    import asgi
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(asgi.application, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return port, stop
+
+
+def percentile_ms(latencies, q):
+    if len(latencies) == 1:
+        return latencies[0] * 1000
+    return statistics.quantiles(latencies, n=100, method="inclusive")[q - 1] * 1000
+
+
+def git_revision():
+    """(short commit, whether tracked files have uncommitted changes)."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+def compare(previous, report, threshold):
+    """Print the change from a previous results file; returns the number of regressions."""
+    before = {(row["scenario"], row["concurrency"]): row for row in previous["results"]}
+    print(f"\nchange from {previous.get('commit', '?')}{'-dirty' if previous.get('dirty') else ''}:")
+    for name, value in report["settings"].items():
+        if previous.get("settings", {}).get(name, value) != value:
+            print(f"warning: {name} was {previous['settings'][name]}, now {value}")
+    print(f"{'scenario':<10} {'conc':>5} {'req/s before':>13} {'after':>8} {'p95 ms before':>14} {'after':>8}")
+    regressions = compared = 0
+    for row in report["results"]:
+        old = before.get((row["scenario"], row["concurrency"]))
+        if old is None:
+            continue
+        compared += 1
+        slower = row["p95_ms"] > old["p95_ms"] * (1 + threshold)
+        fewer = row["throughput_rps"] < old["throughput_rps"] * (1 - threshold)
+        regressions += slower or fewer
+        print(f"{row['scenario']:<10} {row['concurrency']:>5} {old['throughput_rps']:>13.1f} "
+              f"{row['throughput_rps']:>8.1f} {old['p95_ms']:>14.1f} {row['p95_ms']:>8.1f}"
+              f"{'  REGRESSION' if slower or fewer else ''}")
+    if not compared:
+        print("no scenario and concurrency level in common")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=300, help="Requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests before each scenario")
+    parser.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi")
+    parser.add_argument("--profile", default="production", help="APP_ENV caching profile of the app")
+    parser.add_argument("--identity-latency", type=float, default=0.0,
+                        help="Seconds per call of the stubbed identity backend")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the dashboard form values")
+    parser.add_argument("--output", help="Results file (default benchmarks/results/load-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative p95 or throughput change reported as a regression")
+    args = parser.parse_args()
+
+    jobs_dir = tempfile.mkdtemp(prefix="bench-load-jobs-")
+    # Set before the app is imported: its modules read these at import time
+    os.environ.update(IDENTITY_BACKEND="fake", FAKE_IDENTITY_LATENCY=str(args.identity_latency),
+                      APP_ENV=args.profile, JOBS_DIR=jobs_dir)
+    start = time.perf_counter()
+    import app
+    import_s = time.perf_counter() - start
+    # Per-request log lines would cost more than some of the requests
+    logging.disable(logging.INFO)
+    startup_rss, _ = memory_mb()
+
+    port, stop = start_server(args.server, app)
+    host = f"127.0.0.1:{port}"
+    cookie = session_cookie(app)
+    builders = {
+        "static": lambda n, offset: static_requests(host, n),
+        "login": lambda n, offset: login_requests(host, n, offset),
+        "dashboard": lambda n, offset: dashboard_requests(app, host, cookie, n, args.seed + offset),
+    }
+
+    commit, dirty = git_revision()
+    print(f"{args.server} server, {args.profile} profile, commit {commit}{'-dirty' if dirty else ''}, "
+          f"app imported in {import_s:.2f} s, RSS {startup_rss or 0:.0f} MB")
+    print(f"{'scenario':<10} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7} "
+          f"{'RSS MB':>7} {'peak MB':>8}")
+    results = []
+    # spawn, not fork: the app process is running server threads
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as client:
+        try:
+            offset = 0
+            for scenario in args.scenarios:
+                client.submit(drive, "127.0.0.1", port, builders[scenario](args.warmup, 10 ** 7 + offset),
+                              1).result()
+                for concurrency in args.concurrency:
+                    requests = builders[scenario](args.requests, offset)
+                    offset += args.requests
+                    seconds, latencies, statuses = client.submit(drive, "127.0.0.1", port, requests,
+                                                                 concurrency).result()
+                    rss, peak = memory_mb()
+                    row = {
+                        "scenario": scenario,
+                        "concurrency": concurrency,
+                        "requests": len(latencies),
+                        "seconds": seconds,
+                        "throughput_rps": len(latencies) / seconds,
+                        "p50_ms": percentile_ms(latencies, 50),
+                        "p95_ms": percentile_ms(latencies, 95),
+                        "p99_ms": percentile_ms(latencies, 99),
+                        "mean_ms": statistics.fmean(latencies) * 1000,
+                        "max_ms": max(latencies) * 1000,
+                        "failed": sum(count for status, count in statuses.items()
+                                      if status != EXPECTED_STATUS[scenario]),
+                        "statuses": {str(status): count for status, count in statuses.items()},
+                        "rss_mb": rss,
+                        "peak_rss_mb": peak,
+                    }
+                    results.append(row)
+                    print(f"{scenario:<10} {concurrency:>5} {row['throughput_rps']:>8.1f} {row['p50_ms']:>8.1f} "
+                          f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['failed']:>7} "
+                          f"{rss or 0:>7.0f} {peak or 0:>8.0f}")
+        finally:
+            stop()
+
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "settings": {"server": args.server, "profile": args.profile, "identity_latency": args.identity_latency,
+                     "requests": args.requests, "warmup": args.warmup, "seed": args.seed},
+        "startup": {"import_s": import_s, "rss_mb": startup_rss},
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
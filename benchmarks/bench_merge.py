@@ -0,0 +1,91 @@
+"""
+Benchmark the tolerance join of the preprocessing step.
+
+Scales the shipped raw health and climate files by repeating them with shifted
+dates, then times at each scale:
+
+- pd.merge: the exact (Region, Date) join preprocessing uses without a tolerance
+- merge_asof: pd.merge_asof by Region, nearest reading within --tolerance
+- sorted: merge_sorted with the same tolerance, on one thread and on --workers threads
+
+merge_sorted is checked to match the same rows as pd.merge_asof.
+
+    python benchmarks/bench_merge.py --scales 1 10 100 --workers 4 --tolerance 12h
+"""
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from data_preprocessing import CLIMATE_PATH, HEALTH_PATH, MERGE_KEYS, merge_health_climate, merge_sorted  # noqa: E402
+
+
+def scale_frame(frame, scale):
+    """Repeat a raw frame `scale` times, shifting dates so (Region, Date) stays unique."""
+    dates = pd.to_datetime(frame['Date'])
+    span = (dates.max() - dates.min()).days + 1
+    copies = [
+        frame.assign(Date=(dates + pd.Timedelta(days=span * i)).dt.strftime('%Y-%m-%d'))
+        for i in range(scale)
+    ]
+    return pd.concat(copies, ignore_index=True)
+
+
+def merge_asof(health, climate, tolerance):
+    """pd.merge_asof needs both sides typed and sorted by Date; returns the rows in health order."""
+    health = health.assign(Date=pd.to_datetime(health['Date']), _row=range(len(health)))
+    climate = climate.assign(Date=pd.to_datetime(climate['Date']))
+    value_columns = [c for c in climate.columns if c not in MERGE_KEYS]
+    merged = pd.merge_asof(health.sort_values('Date', kind='stable'), climate.sort_values('Date', kind='stable'),
+                           on='Date', by='Region', tolerance=pd.Timedelta(tolerance), direction='nearest')
+    merged = merged.dropna(subset=[f"{c}_y" if c in health.columns else c for c in value_columns], how='all')
+    return merged.sort_values('_row').drop(columns='_row').reset_index(drop=True)
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--tolerance", default="12h", help="Largest distance between matched dates")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    health = pd.read_csv(os.path.join(ROOT, HEALTH_PATH))
+    climate = pd.read_csv(os.path.join(ROOT, CLIMATE_PATH))
+
+    print(f"{'scale':>6} {'rows':>9} {'pd.merge':>10} {'merge_asof':>11} {'sorted x1':>10} "
+          f"{'sorted x' + str(args.workers):>10} {'speedup':>8}")
+    for scale in args.scales:
+        left = scale_frame(health, scale)
+        right = scale_frame(climate, scale)
+
+        exact_time, _ = best_of(lambda: merge_health_climate(left, right), args.repeat)
+        asof_time, expected = best_of(lambda: merge_asof(left, right, args.tolerance), args.repeat)
+        serial_time, result = best_of(lambda: merge_sorted(left, right, args.tolerance), args.repeat)
+        parallel_time, _ = best_of(
+            lambda: merge_sorted(left, right, args.tolerance, workers=args.workers), args.repeat)
+
+        # merge_asof leaves unmatched readings as NaN first, so its climate columns may be float
+        pd.testing.assert_frame_equal(expected[result.columns], result.assign(Region=result['Region'].astype(str)),
+                                      check_dtype=False, obj=f"merge_sorted at scale {scale}")
+
+        print(f"{scale:>6} {len(result):>9} {exact_time * 1000:>8.1f}ms {asof_time * 1000:>9.1f}ms "
+              f"{serial_time * 1000:>8.1f}ms {parallel_time * 1000:>8.1f}ms {asof_time / parallel_time:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
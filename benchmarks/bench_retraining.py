@@ -0,0 +1,79 @@
+"""
+Benchmark daily retraining cost as the history grows: full refit vs incremental update.
+
+Builds processed stores holding 1x, 4x and 16x the shipped history (repeated with
+shifted dates), trains a model on each, appends one more day and times both a full
+retrain and an incremental (warm_start) update on that day.
+
+    python benchmarks/bench_retraining.py --scales 1 4 16 --trees 100
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import model_training  # noqa: E402
+from storage import read_processed, write_processed  # noqa: E402
+
+
+def scaled_history(base, scale):
+    """Repeat the processed rows `scale` times, shifting dates so days never overlap."""
+    span = (base['Date'].max() - base['Date'].min()).days + 1
+    return pd.concat([base.assign(Date=base['Date'] + pd.Timedelta(days=span * i)) for i in range(scale)],
+                     ignore_index=True)
+
+
+def run(base, scale, trees, workdir):
+    history = scaled_history(base, scale)
+    last_day = history['Date'].max()
+    next_day = history[history['Date'] == last_day].assign(Date=last_day + pd.Timedelta(days=1))
+
+    root = os.path.join(workdir, f"store-{scale}")
+    model_dir = os.path.join(workdir, f"models-{scale}")
+    os.makedirs(model_dir)
+    write_processed(history, root=root)
+    grid = {'n_estimators': [trees]}
+    model_training.train(data=model_training.load_training_data(root=root), param_grid=grid, cv=2,
+                         model_dir=model_dir, cache_dir=os.path.join(model_dir, "cache"))
+
+    write_processed(next_day, root=root, append=True)
+
+    start = time.perf_counter()
+    model_training.train(data=model_training.load_training_data(root=root), param_grid=grid, cv=2,
+                         publish=False, model_dir=model_dir, cache_dir=os.path.join(model_dir, "cache"))
+    full_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = model_training.retrain_incremental(model_dir=model_dir, root=root)
+    incremental_s = time.perf_counter() - start
+    return len(history), full_s, incremental_s, result['status']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--trees", type=int, default=100, help="Trees in the fully trained forest")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    base = read_processed()
+    print(f"{'history rows':>12} {'full retrain s':>15} {'incremental s':>14} {'status':>10}")
+    workdir = tempfile.mkdtemp(prefix="bench-retraining-")
+    try:
+        for scale in args.scales:
+            rows, full_s, incremental_s, status = run(base, scale, args.trees, workdir)
+            print(f"{rows:>12} {full_s:>15.2f} {incremental_s:>14.2f} {status:>10}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark application start-up and template rendering under each caching profile.
+
+Every run is a fresh interpreter (APP_ENV set to the profile) that imports src/app.py,
+renders one page and then renders it repeatedly. The first run of each profile starts
+with no cached bytecode (src/__pycache__ and the Jinja bytecode cache are removed), the
+remaining runs reuse whatever the profile left behind.
+
+    python benchmarks/bench_startup.py --runs 5 --renders 200
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT, "src")
+sys.path.insert(0, SRC_DIR)
+
+from caching_config import PROFILES, TEMPLATE_BYTECODE_DIR  # noqa: E402
+
+# Runs inside the child interpreter and prints one JSON line of timings
+CHILD = """
+import json, sys, time, warnings
+warnings.simplefilter('ignore')
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.server.test_client()
+assert client.get(sys.argv[1]).status_code == 200
+first = time.perf_counter()
+for _ in range(int(sys.argv[2])):
+    client.get(sys.argv[1])
+done = time.perf_counter()
+print(json.dumps({
+    'import_s': imported - start,
+    'first_render_s': first - imported,
+    'render_ms': (done - first) * 1000 / max(int(sys.argv[2]), 1),
+}))
+"""
+
+
+def clear_bytecode():
+    shutil.rmtree(os.path.join(SRC_DIR, "__pycache__"), ignore_errors=True)
+    shutil.rmtree(TEMPLATE_BYTECODE_DIR, ignore_errors=True)
+
+
+def run_once(profile, page, renders):
+    env = {**os.environ, 'APP_ENV': profile}
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, page, str(renders)],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Interpreter starts per profile")
+    parser.add_argument("--renders", type=int, default=200, help="Page renders timed per start")
+    parser.add_argument("--page", default="/about", help="Page to render")
+    args = parser.parse_args()
+
+    print(f"{'profile':<12} {'run':<5} {'import s':>9} {'first render s':>15} {'render ms':>10}")
+    summary = {}
+    for profile in PROFILES:
+        clear_bytecode()
+        runs = []
+        for i in range(args.runs):
+            timings = run_once(profile, args.page, args.renders)
+            runs.append(timings)
+            label = "cold" if i == 0 else "warm"
+            print(f"{profile:<12} {label:<5} {timings['import_s']:>9.3f} "
+                  f"{timings['first_render_s']:>15.4f} {timings['render_ms']:>10.3f}")
+        warm = runs[1:] or runs
+        summary[profile] = {key: statistics.median(run[key] for run in warm) for key in warm[0]}
+
+    print()
+    dev, prod = summary['development'], summary['production']
+    for key in ('import_s', 'first_render_s', 'render_ms'):
+        speedup = dev[key] / prod[key] if prod[key] else float('inf')
+        print(f"warm median {key:<15} development {dev[key]:.4f}  production {prod[key]:.4f}  ({speedup:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark scenario sweeps: grid scoring throughput and cold vs cached latency.
+
+Sweeps grids of 10k, 100k, 1M and 5M points over the shipped model (as an
+ArrayForest, the MODEL_ENGINE=array engine, and as the plain sklearn estimator) and over a
+deeper synthetic forest. Cold is the first run of a spec (scoring and
+summarizing), cached is the same spec again. Scored is the number of distinct
+points left after collapsing grid values between the same split thresholds.
+
+    python benchmarks/bench_sweep.py --points 10000 100000 1000000 5000000 --trees 100
+"""
+import os
+import sys
+import time
+import argparse
+import warnings
+
+import joblib
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from array_forest import ArrayForest  # noqa: E402
+from model_registry import MODEL_DIR, MODEL_FILENAME  # noqa: E402
+from bench_inference import synthetic_model  # noqa: E402
+from sweeps import FEATURE_RANGES, SweepCache, normalize_spec, run_sweep, scored_points  # noqa: E402
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+def grid_spec(n_points):
+    """Sweep NewCases x Temperature x Humidity with about n_points points."""
+    features = ['NewCases', 'Temperature', 'Humidity_x']
+    steps = max(2, int(n_points ** (1 / len(features)) + 1e-9))
+    return normalize_spec({
+        'ranges': {name: {'start': FEATURE_RANGES[name][0], 'stop': FEATURE_RANGES[name][1], 'steps': steps}
+                   for name in features},
+        'axes': features[:2],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, nargs="+", default=[10000, 100000, 1000000, 5000000])
+    parser.add_argument("--skip-sklearn-above", type=int, default=1000000,
+                        help="Largest grid also timed with the sklearn engine and the synthetic forest")
+    parser.add_argument("--trees", type=int, default=100, help="Trees in the synthetic forest")
+    parser.add_argument("--rows", type=int, default=50000, help="Training rows for the synthetic forest")
+    args = parser.parse_args()
+
+    model = joblib.load(os.path.join(MODEL_DIR, MODEL_FILENAME))
+    engines = [
+        ("array", ArrayForest.from_model(model)),
+        ("sklearn", model),
+        ("synthetic", ArrayForest.from_model(synthetic_model(args.trees, args.rows))),
+    ]
+    print(f"{'model':<10} {'points':>10} {'scored':>10} {'cold s':>8} {'points/s':>12} {'cached ms':>10}")
+    for n_points in args.points:
+        spec = grid_spec(n_points)
+        for engine, scorer in engines:
+            if engine != "array" and n_points > args.skip_sklearn_above:
+                continue
+            cache = SweepCache()
+            start = time.perf_counter()
+            summary = run_sweep(scorer, engine, spec, cache=cache)
+            cold = time.perf_counter() - start
+            start = time.perf_counter()
+            assert run_sweep(scorer, engine, spec, cache=cache)['cached']
+            cached_ms = (time.perf_counter() - start) * 1000
+            print(f"{engine:<10} {summary['points']:>10,} {scored_points(scorer, spec):>10,} {cold:>8.2f} "
+                  f"{summary['points'] / cold:>12,.0f} {cached_ms:>10.3f}")
+        assert np.isfinite(summary['mean_probability'])
+
+
+if __name__ == "__main__":
+    main()
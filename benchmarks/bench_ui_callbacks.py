@@ -0,0 +1,148 @@
+"""
+Count the HTTP callback requests of a typical dashboard session at different git revisions.
+
+Each revision's src/ and static/ are exported to a temporary directory. A child
+interpreter imports its app and dumps the callback graph (inputs, outputs,
+prevent_initial_call and whether the callback runs clientside) together with the
+component ids of the dashboard layout. The session below is then replayed the
+way the Dash renderer dispatches callbacks:
+
+- a callback fires when one of its inputs changes, including the outputs of
+  other callbacks;
+- on page load every callback whose inputs are all in the layout fires once,
+  unless it sets prevent_initial_call.
+
+Every server callback that fires is one POST to /_dash-update-component.
+Clientside callbacks cost no request.
+
+    python benchmarks/bench_ui_callbacks.py --revs HEAD~1 WORKTREE
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A session: open the dashboard, open and close the navbar menu, run three
+# predictions, one sensitivity sweep and one batch upload (each polled three times)
+SESSION = [
+    ("load", ["url.pathname"]),
+    ("navbar", ["navbar-toggler.n_clicks"]),
+    ("navbar", ["navbar-toggler.n_clicks"]),
+    ("predict", ["predict-button.n_clicks"]),
+    ("predict", ["predict-button.n_clicks"]),
+    ("predict", ["predict-button.n_clicks"]),
+    ("sweep", ["sweep-button.n_clicks"]),
+] + [("sweep", ["sweep-job-poll.n_intervals"])] * 3 + [
+    ("batch", ["batch-upload.contents"]),
+] + [("batch", ["batch-job-poll.n_intervals"])] * 3
+
+# Runs inside the exported tree and prints the callback graph as JSON
+CHILD = """
+import json, sys, warnings, logging
+warnings.simplefilter('ignore')
+logging.disable(logging.CRITICAL)
+import app
+from flask_login import login_user
+
+def props(items):
+    return [item['id'] + '.' + item['property'] for item in items]
+
+def ids(component):
+    found = []
+    if getattr(component, 'id', None):
+        found.append(component.id)
+    children = getattr(component, 'children', None)
+    for child in children if isinstance(children, (list, tuple)) else [children]:
+        if hasattr(child, 'to_plotly_json'):
+            found.extend(ids(child))
+    return found
+
+callbacks = []
+for callback in app.app._callback_list:
+    output = callback['output'].strip('.')
+    outputs = [o.split('@')[0] for o in output.split('...')]
+    callbacks.append({
+        'outputs': outputs,
+        'inputs': props(callback['inputs']),
+        'prevent_initial_call': bool(callback.get('prevent_initial_call')),
+        'clientside': bool(callback.get('clientside_function')),
+    })
+with app.server.test_request_context():
+    login_user(app.User('bench', 'bench', 'bench@example.com'))
+    dashboard = app.create_dashboard()
+print(json.dumps({'callbacks': callbacks, 'dashboard_ids': ids(dashboard)}))
+"""
+
+
+def export(rev, target):
+    """Copy src/ and static/ of a revision (or the working tree) into target."""
+    if rev == "WORKTREE":
+        for name in ("src", "static"):
+            shutil.copytree(os.path.join(ROOT, name), os.path.join(target, name),
+                            ignore=shutil.ignore_patterns("__pycache__"))
+        return
+    archive = subprocess.run(["git", "archive", rev, "src", "static"], cwd=ROOT, check=True,
+                             capture_output=True).stdout
+    subprocess.run(["tar", "-x", "-C", target], input=archive, check=True)
+
+
+def callback_graph(rev):
+    with tempfile.TemporaryDirectory() as target:
+        export(rev, target)
+        # The dashboard reads its Region options from the trend data
+        os.symlink(os.path.join(ROOT, "data"), os.path.join(target, "data"))
+        env = dict(os.environ, JOBS_DIR=os.path.join(target, "jobs"), MODEL_DIR=os.path.join(ROOT, "src", "models"))
+        result = subprocess.run([sys.executable, "-c", CHILD], cwd=os.path.join(target, "src"), env=env,
+                                capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{rev}: {result.stderr.strip().splitlines()[-1]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def replay(graph):
+    """Server requests and clientside runs per session step."""
+    callbacks = graph['callbacks']
+    dashboard = set(graph['dashboard_ids'])
+    requests, clientside = Counter(), Counter()
+
+    for step, changed in SESSION:
+        # Each callback runs at most once per step, however many of its inputs change
+        fired = set()
+        pending = list(changed)
+        if step == "load":
+            # The dashboard is rendered: every callback whose inputs are all on it runs once
+            pending += [prop for callback in callbacks if not callback['prevent_initial_call']
+                        and {prop.rsplit('.', 1)[0] for prop in callback['inputs']} <= dashboard
+                        for prop in callback['inputs']]
+        while pending:
+            prop = pending.pop(0)
+            for index, callback in enumerate(callbacks):
+                if index not in fired and prop in callback['inputs']:
+                    fired.add(index)
+                    (clientside if callback['clientside'] else requests)[step] += 1
+                    pending.extend(callback['outputs'])
+    return requests, clientside
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--revs", nargs="+", default=["HEAD~1", "WORKTREE"],
+                        help="git revisions to compare; WORKTREE is the working tree")
+    args = parser.parse_args()
+
+    steps = list(dict.fromkeys(step for step, _ in SESSION))
+    print(f"{'revision':<10} " + " ".join(f"{step:>8}" for step in steps) + f" {'requests':>9} {'clientside':>11}")
+    for rev in args.revs:
+        requests, clientside = replay(callback_graph(rev))
+        print(f"{rev:<10} " + " ".join(f"{requests[step]:>8}" for step in steps)
+              + f" {sum(requests.values()):>9} {sum(clientside.values()):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Measure per-worker memory of the gunicorn deployment with and without a shared model.
+
+Trains a large synthetic forest on the model features, saves it both as a pickle and
+as a memory-mapped .forest file, then starts gunicorn (gunicorn.conf.py) for each
+combination of model format and preload_app. Every worker is sent scoring requests
+so that it touches the model. Memory is then read from /proc/<pid>/smaps_rollup
+(Linux only):
+
+- RSS: resident memory, counting shared pages in full for every process
+- USS: memory private to the worker (what one more worker really costs)
+- PSS: shared pages split between the processes that map them
+
+    python benchmarks/bench_worker_memory.py --workers 4 --trees 100 --rows 100000
+"""
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import argparse
+import subprocess
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from array_forest import save_forest  # noqa: E402
+from identity import fake_id_token  # noqa: E402
+from inference import FEATURE_COLUMNS  # noqa: E402
+
+SCENARIOS = [
+    ("pickle", False),
+    ("pickle", True),
+    ("forest", False),
+    ("forest", True),
+]
+
+
+def synthetic_rows(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        'NewCases': rng.integers(0, 500, n_rows),
+        'Humidity_x': rng.uniform(20, 100, n_rows),
+        'PopulationDensity': rng.integers(100, 30000, n_rows),
+        'Temperature': rng.uniform(-5, 45, n_rows),
+        'Rainfall': rng.uniform(0, 50, n_rows),
+    })[FEATURE_COLUMNS]
+    return X, rng
+
+
+def build_models(model_dir, n_trees, n_rows):
+    X, rng = synthetic_rows(n_rows)
+    # Noisy labels grow deep trees, which is what makes the forest large
+    signal = X['NewCases'] / 500 + X['Humidity_x'] / 100 - X['Temperature'].abs() / 90
+    y = (signal + rng.normal(0, 0.5, n_rows) > 0.8).astype(int)
+    model = RandomForestClassifier(n_estimators=n_trees, random_state=42, n_jobs=-1).fit(X, y)
+
+    pickle_path = os.path.join(model_dir, "outbreak_model.pkl")
+    forest_path = os.path.join(model_dir, "outbreak_model.forest")
+    joblib.dump(model, pickle_path)
+    save_forest(model, forest_path)
+    nodes = sum(estimator.tree_.node_count for estimator in model.estimators_)
+    return nodes, os.path.getsize(pickle_path), os.path.getsize(forest_path)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def memory_kb(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        'rss': fields['Rss'],
+        'pss': fields['Pss'],
+        'uss': fields['Private_Clean'] + fields['Private_Dirty'],
+    }
+
+
+def run_scenario(model_dir, model_format, preload, workers, requests_per_worker, batch_rows):
+    port = free_port()
+    log_path = os.path.join(model_dir, f"gunicorn-{model_format}-{int(preload)}.log")
+    env = {
+        **os.environ,
+        'MODEL_DIR': model_dir,
+        'MODEL_FILENAME': f"outbreak_model.{'forest' if model_format == 'forest' else 'pkl'}",
+        'MODEL_POLL_INTERVAL': '3600',
+        'GUNICORN_PRELOAD': '1' if preload else '0',
+        'WEB_CONCURRENCY': str(workers),
+        'BIND': f"127.0.0.1:{port}",
+        # The batch API needs a signed-in session; the fake backend accepts the bench's token
+        'IDENTITY_BACKEND': 'fake',
+    }
+    with open(log_path, "w") as log:
+        master = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py")],
+                                  cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        deadline = time.time() + 300
+        while time.time() < deadline:
+            with open(log_path) as f:
+                if f.read().count("serving model version") >= workers:
+                    break
+            if master.poll() is not None:
+                raise RuntimeError(f"gunicorn exited; see {log_path}")
+            time.sleep(0.5)
+        else:
+            raise RuntimeError(f"Workers did not start in time; see {log_path}")
+
+        # Score enough rows on every worker to page in most of the model
+        X, _ = synthetic_rows(batch_rows, seed=1)
+        body = json.dumps(X.values.tolist()).encode()
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+        login = urllib.parse.urlencode({"email": "bench@example.org",
+                                        "id_token": fake_id_token("bench", "bench@example.org")}).encode()
+        opener.open(f"http://127.0.0.1:{port}/login", data=login, timeout=60).close()
+        for _ in range(workers * requests_per_worker):
+            request = urllib.request.Request(f"http://127.0.0.1:{port}/api/v1/predict/batch", data=body,
+                                             headers={"Content-Type": "application/json"})
+            with opener.open(request, timeout=300) as response:
+                assert json.loads(response.read())["success"]
+
+        worker_memory = [memory_kb(pid) for pid in children(master.pid)]
+        master_memory = memory_kb(master.pid)
+    finally:
+        master.terminate()
+        master.wait(timeout=60)
+
+    return {
+        'format': model_format,
+        'preload': preload,
+        'workers': len(worker_memory),
+        'worker_rss_mb': np.mean([m['rss'] for m in worker_memory]) / 1024,
+        'worker_uss_mb': np.mean([m['uss'] for m in worker_memory]) / 1024,
+        'total_pss_mb': (sum(m['pss'] for m in worker_memory) + master_memory['pss']) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--trees", type=int, default=100, help="Trees in the synthetic forest")
+    parser.add_argument("--rows", type=int, default=100000, help="Training rows for the synthetic forest")
+    parser.add_argument("--requests-per-worker", type=int, default=3)
+    parser.add_argument("--batch-rows", type=int, default=20000, help="Rows per scoring request")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        nodes, pickle_size, forest_size = build_models(model_dir, args.trees, args.rows)
+        print(f"Forest: {args.trees} trees, {nodes:,} nodes; "
+              f"pickle {pickle_size / 2**20:.1f} MB, .forest {forest_size / 2**20:.1f} MB")
+        print(f"{'format':<8} {'preload':<8} {'workers':>7} {'RSS/worker MB':>14} "
+              f"{'USS/worker MB':>14} {'total PSS MB':>13}")
+        for model_format, preload in SCENARIOS:
+            result = run_scenario(model_dir, model_format, preload, args.workers,
+                                  args.requests_per_worker, args.batch_rows)
+            print(f"{result['format']:<8} {str(result['preload']):<8} {result['workers']:>7} "
+                  f"{result['worker_rss_mb']:>14.1f} {result['worker_uss_mb']:>14.1f} "
+                  f"{result['total_pss_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
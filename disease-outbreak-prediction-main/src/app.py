@@ -17,12 +17,12 @@ def google_callback():
             flash("Authentication failed: No email received", "error")
             return redirect("/login")
         
-        # Check if user exists
-        try:
-            user = auth.get_user_by_email(email)
-        except auth.UserNotFoundError:
+        # Check if user exists (cached, so repeat logins don't wait on Firebase)
+        identity = get_identity_service()
+        user = identity.get_user_by_email(email)
+        if user is None:
             # Create the user if they don't exist
-            user = auth.create_user(
+            user = identity.create_user(
                 email=email,
                 display_name=name,
                 email_verified=True
@@ -31,7 +31,7 @@ def google_callback():
         # Create User object
         user_obj = User(
             uid=user.uid,
-            username=user.display_name or email.split('@')[0],
+            username=user.username,
             email=user.email,
             is_verified=True
         )
@@ -0,0 +1,49 @@
+"""
+Gunicorn settings for serving the web app in production.
+
+    gunicorn -c gunicorn.conf.py
+
+The app (and the active model) is loaded once in the master before the workers
+are forked, so the workers share the model's memory instead of each holding a
+copy. With a .forest model (python src/array_forest.py convert ...) the node arrays
+are memory-mapped and stay shared even for versions hot-swapped in later.
+"""
+import os
+import multiprocessing
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BASE_DIR, "src")
+
+# Serve the memory-mapped model when one has been exported next to the pickle
+if "MODEL_FILENAME" not in os.environ and os.path.exists(os.path.join(SRC_DIR, "models", "outbreak_model.forest")):
+    os.environ["MODEL_FILENAME"] = "outbreak_model.forest"
+os.environ.setdefault("APP_ENV", "production")
+
+chdir = SRC_DIR
+# ASGI=1 serves src/asgi.py on uvicorn workers, with the auth routes as coroutines
+if os.getenv("ASGI", "0") == "1":
+    wsgi_app = "asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "app:server"
+bind = os.getenv("BIND", "0.0.0.0:8050")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+
+
+def _load_active_model():
+    import app
+    version = app.model_registry.current()
+    return version.version
+
+
+def when_ready(server):
+    # Runs in the master; with preload_app the model is loaded before forking
+    if preload_app:
+        server.log.info(f"Preloaded model version {_load_active_model()}")
+
+
+def post_worker_init(worker):
+    # Without preloading, each worker loads the model before taking requests
+    worker.log.info(f"Worker {worker.pid} serving model version {_load_active_model()}")
@@ -7,6 +7,12 @@ python -m venv venv
 Write-Host "Installing required packages..."
 pip install -r requirements.txt
 
+# Build the processed Parquet store from the shipped merged data on first run
+if (-not (Test-Path "data/processed/merged")) {
+    Write-Host "Building the processed data store..."
+    python src/storage.py import --csv data/processed/merged_data.csv
+}
+
 # Set environment variables for development
 $env:FLASK_APP = "src/app.py"
 $env:FLASK_ENV = "development"
@@ -9,6 +9,12 @@ source venv/bin/activate || source venv/Scripts/activate
 echo "Installing required packages..."
 pip install -r requirements.txt
 
+# Build the processed Parquet store from the shipped merged data on first run
+if [ ! -d data/processed/merged ]; then
+    echo "Building the processed data store..."
+    python src/storage.py import --csv data/processed/merged_data.csv
+fi
+
 # Set environment variables for development
 export FLASK_APP=src/app.py
 export FLASK_ENV=development
@@ -1,20 +1,35 @@
 import os
 import sys
+import base64
 import logging
+from functools import lru_cache
 from typing import Optional, Dict, List
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
 # Import caching configuration
-from caching_config import disable_caches
+from caching_config import configure_caching
+from figures import (GAUGE_CONFIG, TREND_CONFIG, risk_gauge_patch, risk_gauge_template, trend_chart_patch,
+                     trend_chart_template)
+from identity import Identity, InvalidToken, get_identity_service
+from inference import (BatchInputError, DEFAULT_CHUNK_SIZE, FEATURE_COLUMNS, read_batch_body, score_matrix,
+                       tree_probabilities, vote_agreement)
+from jobs import DONE, FAILED, JobNotFound, get_job_queue
+from model_registry import ModelRegistry
+from model_router import ModelRouter
+from prediction_cache import PredictionCache
+from sweeps import (FEATURE_RANGES, SYNC_SWEEP_POINTS, SweepCache, SweepSpecError, normalize_spec,
+                    run_sweep, scored_points, spec_key)
+from trends import NATIONAL, TrendStore
+from ui_callbacks import register_ui_callbacks
 
 import dash
 import dash_bootstrap_components as dbc
 from dash import dcc, html, Input, Output, State
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
-from flask import Flask, redirect, render_template, request, url_for, flash, session, jsonify
+from flask import Flask, redirect, render_template, request, url_for, flash, session, jsonify, send_file
 from flask_login import (
     LoginManager,
     login_user,
@@ -23,7 +38,6 @@ from flask_login import (
     login_required,
     UserMixin
 )
-import joblib
 import requests
 import json
 
@@ -36,7 +50,7 @@ logger = logging.getLogger(__name__)
 
 # Application Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_PATH = os.path.join(BASE_DIR, "models/outbreak_model.pkl")
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.join(BASE_DIR, "models"))
 DB_PATH = os.path.join(BASE_DIR, 'models/database.db')
 TEMPLATE_DIR = os.path.join(BASE_DIR, "../templates")
 STATIC_DIR = os.path.join(BASE_DIR, "../static")
@@ -53,19 +67,18 @@ firebase_config = {
 }
 
 # Initialize Flask
-server = Flask(__name__, template_folder=TEMPLATE_DIR)
+server = Flask(__name__, template_folder=TEMPLATE_DIR, static_folder=STATIC_DIR)
 
-# Force delete cache
-cache_settings = disable_caches()
-server.config.update(cache_settings)
+# Development or production caching, chosen by APP_ENV
+caching_profile = configure_caching(server)
 
 server.config.update(
     SECRET_KEY=os.getenv("SECRET_KEY", "your-secret-key-here"),
+    PREDICT_CHUNK_SIZE=DEFAULT_CHUNK_SIZE,
+    # Largest request body (batch uploads included) Flask accepts before answering 413
+    MAX_CONTENT_LENGTH=int(os.getenv("MAX_UPLOAD_MB", "64")) * 1024 * 1024,
 )
 
-# Disable template caching explicitly
-server.config['TEMPLATES_AUTO_RELOAD'] = True
-
 # Initialize Dash
 app = dash.Dash(
     __name__,
@@ -98,13 +111,31 @@ login_manager = LoginManager()
 login_manager.init_app(server)
 login_manager.login_view = "login"
 
-# Load ML model
-try:
-    model = joblib.load(MODEL_PATH)
-    logger.info("ML model loaded successfully")
-except FileNotFoundError:
-    logger.error(f"Model file not found at: {MODEL_PATH}")
-    raise
+@login_manager.unauthorized_handler
+def unauthorized():
+    """API clients get a 401 they can act on; pages go to the login form."""
+    if request.path.startswith("/api/"):
+        return jsonify({"success": False, "error": "Login required"}), 401
+    return redirect("/login")
+
+# ML model, loaded on first prediction and swapped when the model file changes
+model_registry = ModelRegistry(MODEL_DIR)
+# Per-region models where trained (models/regions/), loaded lazily; the global model otherwise
+model_router = ModelRouter(model_registry)
+
+# Per-region trend aggregates, precomputed at ingest time
+trend_store = TrendStore()
+
+# Model outputs keyed on quantized features; cleared when the model version changes
+prediction_cache = PredictionCache(FEATURE_COLUMNS)
+
+# Background jobs for batch scoring; interactive predictions never go through the queue
+job_queue = get_job_queue()
+# Longest a job status request may long-poll, in seconds
+MAX_JOB_WAIT = 30.0
+
+# Scenario sweep summaries by grid spec and model version
+sweep_cache = SweepCache()
 
 # User loader for Flask-Login
 @login_manager.user_loader
@@ -124,28 +155,60 @@ def about():
 def contact():
     return render_template("contact.html")
 
+def login_error(error: Exception):
+    """Back to the login page after the form's ID token could not be verified."""
+    if isinstance(error, InvalidToken):
+        logger.warning(f"Rejected login token: {str(error)}")
+    else:
+        logger.error(f"Could not verify login token: {str(error)}")
+    flash("Login failed. Please sign in again.", "error")
+    return redirect("/login")
+
+def complete_login(claims: dict):
+    """
+    Sign in the user of a verified Firebase ID token and redirect to the dashboard.
+
+    The session takes the uid, email and name from the token's claims only, never
+    from the form. Shared by the WSGI view and the ASGI handler.
+    """
+    identity = Identity(claims.get('uid') or claims['sub'], claims.get('email'), claims.get('name'),
+                        bool(claims.get('email_verified')))
+    user = User(uid=identity.uid, username=identity.username, email=identity.email)
+
+    # Store user info in session
+    session['user_id'] = user.id
+    session['user_email'] = user.email
+    session['user_name'] = user.username
+
+    login_user(user)
+
+    flash("Login successful!", "success")
+    return redirect("/dashboard")
+
+def complete_registration():
+    """Acknowledge a registration done by the Firebase client SDK and redirect to the login page."""
+    flash(
+        "Registration successful! A verification email has been sent to your email address. "
+        "Please verify your email before logging in.",
+        "success"
+    )
+    return redirect("/login")
+
 @server.route("/login", methods=["GET", "POST"])
 def login():
-    """Handle user login without Firebase Admin SDK."""
+    """Handle user login; the form carries the ID token the Firebase client SDK signed in with."""
     if current_user.is_authenticated:
         return redirect("/dashboard")
         
     if request.method == "POST":
-        email = request.form.get("email")
-        username = request.form.get("username", email.split('@')[0] if email else "User")
-        user_id = request.form.get("firebase_uid", f"user_{hash(email)}")
-        
-        # Store user info in session
-        session['user_id'] = user_id
-        session['user_email'] = email
-        session['user_name'] = username
-        
-        # Create and login the user
-        user = User(uid=user_id, username=username, email=email)
-        login_user(user)
-        
-        flash("Login successful!", "success")
-        return redirect("/dashboard")
+        id_token = request.form.get("id_token")
+        try:
+            if not id_token:
+                raise InvalidToken("The login form has no ID token")
+            claims = get_identity_service().verify_id_token(id_token)
+        except Exception as e:
+            return login_error(e)
+        return complete_login(claims)
     
     return render_template("login.html", firebase_config=firebase_config)
 
@@ -156,15 +219,15 @@ def register():
         return redirect("/dashboard")
         
     if request.method == "POST":
-        # The client-side Firebase SDK handles all the registration logic
-        # We just show a success message
-        flash(
-            "Registration successful! A verification email has been sent to your email address. "
-            "Please verify your email before logging in.", 
-            "success"
-        )
-        
-        return redirect("/login")
+        # The client-side Firebase SDK handles all the registration logic; a cached
+        # "no such user" for the new email must not outlive it
+        email = request.form.get("email")
+        if email:
+            try:
+                get_identity_service().invalidate(email=email)
+            except Exception as e:
+                logger.warning(f"Identity cache not updated at registration: {str(e)}")
+        return complete_registration()
     
     return render_template("register.html", firebase_config=firebase_config)
 
@@ -196,202 +259,179 @@ def reset_password():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-def create_risk_gauge(risk_probability: float) -> dcc.Graph:
-    """Create a modern gauge chart for risk probability visualization."""
-    threshold_value = 70
-    
-    fig = go.Figure(go.Indicator(
-        mode="gauge+number+delta",
-        value=risk_probability * 100,
-        domain={'x': [0, 1], 'y': [0, 1]},
-        delta={'reference': threshold_value, 'increasing': {'color': "#EF4444"}, 'decreasing': {'color': "#10B981"}},
-        gauge={
-            'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "#E5E7EB", 'visible': True},
-            'bar': {'color': "rgba(255, 255, 255, 0)"},
-            'bgcolor': "#F9FAFB",
-            'borderwidth': 2,
-            'bordercolor': "#E5E7EB",
-            'steps': [
-                {'range': [0, 30], 'color': 'rgba(16, 185, 129, 0.7)'},  # Green
-                {'range': [30, 70], 'color': 'rgba(249, 115, 22, 0.7)'},  # Orange
-                {'range': [70, 100], 'color': 'rgba(239, 68, 68, 0.7)'}   # Red
-            ],
-            'threshold': {
-                'line': {'color': "#6366F1", 'width': 4},
-                'thickness': 0.75,
-                'value': threshold_value
-            }
-        },
-        title={
-            'text': "Outbreak Risk Assessment",
-            'font': {'size': 24, 'color': '#4F46E5', 'family': "'Poppins', sans-serif"}
-        },
-        number={'font': {'size': 40, 'color': '#4F46E5', 'family': "'Poppins', sans-serif"}, 'suffix': '%'}
-    ))
-    
-    # Add custom shapes to make it more visually appealing
-    fig.add_shape(
-        type="circle",
-        xref="paper", yref="paper",
-        x0=0.485, y0=0.485, x1=0.515, y1=0.515,
-        fillcolor="#6366F1",
-        line_color="#6366F1",
-    )
-    
-    risk_level = "LOW" if risk_probability < 0.3 else "MODERATE" if risk_probability < 0.7 else "CRITICAL"
-    risk_color = "#10B981" if risk_probability < 0.3 else "#F59E0B" if risk_probability < 0.7 else "#EF4444"
-    
-    fig.add_annotation(
-        xref="paper", yref="paper", x=0.5, y=0.25,
-        text=f"Risk Level: <b>{risk_level}</b>",
-        showarrow=False,
-        font=dict(family="'Poppins', sans-serif", size=18, color=risk_color)
-    )
-    
-    fig.update_layout(
-        height=350,
-        margin=dict(l=20, r=20, t=80, b=20),
-        paper_bgcolor='white',
-        plot_bgcolor='white',
-    )
-    
-    return dcc.Graph(figure=fig, config={'displayModeBar': False})
+@server.route("/api/v1/predict/batch", methods=["POST"])
+@login_required
+def predict_batch():
+    """
+    Score a JSON array, CSV or Parquet body of feature rows in one vectorized pass.
 
-def create_trend_chart(historical_data: pd.DataFrame) -> dcc.Graph:
-    """Create a modern line chart for historical trend visualization."""
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
-    
-    # Add risk level area
-    fig.add_trace(
-        go.Scatter(
-            x=historical_data['date'],
-            y=historical_data['risk_level'],
-            name="Risk Level",
-            line=dict(color='rgba(99, 102, 241, 0.9)', width=3, shape='spline'),
-            fill='tozeroy',
-            fillcolor='rgba(99, 102, 241, 0.1)'
-        ),
-        secondary_y=False
-    )
-    
-    # Add cases bar chart
-    fig.add_trace(
-        go.Bar(
-            x=historical_data['date'],
-            y=historical_data['new_cases'],
-            name="New Cases",
-            marker_color='rgba(129, 140, 248, 0.7)',
-            opacity=0.8
-        ),
-        secondary_y=True
-    )
-    
-    # Add moving average of risk level
-    moving_avg = historical_data['risk_level'].rolling(window=3).mean()
-    fig.add_trace(
-        go.Scatter(
-            x=historical_data['date'],
-            y=moving_avg,
-            name="Risk Trend (3-day MA)",
-            line=dict(color='rgba(139, 92, 246, 0.9)', width=2, dash='dot'),
-            visible='legendonly'  # Hidden by default
-        ),
-        secondary_y=False
-    )
-    
-    # Add projections
-    last_date = historical_data['date'].iloc[-1]
-    forecast_dates = pd.date_range(start=last_date + pd.Timedelta(days=1), periods=7)
-    forecast_risk = historical_data['risk_level'].iloc[-7:].mean() * np.ones(7) * 1.1  # Simple projection
-    forecast_risk = np.clip(forecast_risk, 0, 1)  # Ensure values are between 0 and 1
-    
-    fig.add_trace(
-        go.Scatter(
-            x=forecast_dates,
-            y=forecast_risk,
-            name="Risk Projection (7 days)",
-            line=dict(color='rgba(167, 139, 250, 0.7)', width=2, dash='dash'),
-            mode='lines',
-            fill='tozeroy',
-            fillcolor='rgba(167, 139, 250, 0.1)'
-        ),
-        secondary_y=False
-    )
-    
-    fig.update_layout(
-        title={
-            'text': 'Historical Trend Analysis',
-            'font': {'family': "'Poppins', sans-serif", 'size': 24, 'color': '#4F46E5'},
-            'y': 0.95
-        },
-        legend={
-            'orientation': 'h',
-            'yanchor': 'bottom',
-            'y': 1.02,
-            'xanchor': 'center',
-            'x': 0.5,
-            'bgcolor': 'rgba(255, 255, 255, 0.8)',
-            'bordercolor': 'rgba(0, 0, 0, 0.1)',
-            'borderwidth': 1
-        },
-        hovermode='x unified',
-        hoverlabel=dict(bgcolor='rgba(255, 255, 255, 0.9)', font_size=12, font_family="'Poppins', sans-serif"),
-        height=500,
-        margin=dict(l=20, r=20, t=100, b=20),
-        paper_bgcolor='white',
-        plot_bgcolor='white',
-        xaxis=dict(
-            showgrid=True,
-            gridcolor='rgba(0, 0, 0, 0.03)',
-            title='Date',
-            titlefont=dict(family="'Poppins', sans-serif", size=14)
-        ),
-        yaxis=dict(
-            showgrid=True,
-            gridcolor='rgba(0, 0, 0, 0.03)',
-            title='Risk Level',
-            titlefont=dict(family="'Poppins', sans-serif", size=14),
-            tickformat='.0%'
-        ),
-        yaxis2=dict(
-            showgrid=False,
-            title='New Cases',
-            titlefont=dict(family="'Poppins', sans-serif", size=14)
-        )
-    )
-    
-    # Add annotation for projection zone
-    fig.add_shape(
-        type="rect",
-        xref="x",
-        yref="paper",
-        x0=last_date,
-        y0=0,
-        x1=forecast_dates[-1],
-        y1=1,
-        fillcolor="rgba(200, 200, 200, 0.05)",
-        line=dict(width=0),
-        layer="below"
-    )
-    
-    fig.add_annotation(
-        xref="x",
-        yref="paper",
-        x=last_date + (forecast_dates[-1] - last_date) / 2,
-        y=0.95,
-        text="Projection Zone",
-        showarrow=False,
-        font=dict(family="'Poppins', sans-serif", size=12, color="rgba(79, 70, 229, 0.7)")
-    )
-    
-    return dcc.Graph(
-        figure=fig, 
-        config={
-            'displayModeBar': True,
-            'displaylogo': False,
-            'modeBarButtonsToRemove': ['lasso2d', 'select2d']
-        }
-    )
+    Rows are routed by their Region column (or the ?region= parameter) to region
+    models where trained, and to the global model otherwise.
+    """
+    # Read outside the try, so a body over MAX_CONTENT_LENGTH is answered with 413
+    body = request.get_data()
+    try:
+        chunk_size = request.args.get("chunk_size", server.config['PREDICT_CHUNK_SIZE'], type=int)
+        frame = read_batch_body(body, request.content_type)
+        labels, probabilities, models_used = model_router.score_frame(
+            frame, region=request.args.get("region"), chunk_size=chunk_size)
+    except BatchInputError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        return jsonify({"success": False, "error": "Batch prediction failed"}), 500
+
+    return jsonify({
+        "success": True,
+        # The version that actually scored the rows, even across a hot swap; null when
+        # every row went to a region model
+        "model_version": models_used.get('global'),
+        "models_used": models_used,
+        "count": int(len(labels)),
+        "predictions": labels.tolist(),
+        "probabilities": probabilities.round(6).tolist()
+    })
+
+def run_batch_job(job) -> dict:
+    """Score a queued batch chunk by chunk, writing the scored rows to the job's result file as CSV."""
+    with open(job.input_path, "rb") as f:
+        frame = read_batch_body(f.read(), job.params.get("content_type"))
+    chunk_size = job.params.get("chunk_size") or DEFAULT_CHUNK_SIZE
+    region = job.params.get("region")
+    models_used = {}
+    high_risk = 0
+    tmp_path = f"{job.result_path}.tmp"
+    with open(tmp_path, "w", newline="") as out:
+        for start in range(0, len(frame), chunk_size):
+            chunk = frame.iloc[start:start + chunk_size]
+            labels, probabilities, used = model_router.score_frame(chunk, region=region, chunk_size=chunk_size)
+            chunk.assign(Prediction=labels, OutbreakProbability=probabilities.round(6)).to_csv(
+                out, header=start == 0, index=False)
+            models_used.update(used)
+            high_risk += int(np.count_nonzero(labels == 1))
+            job.report_progress((start + len(chunk)) / len(frame), f"Scored {start + len(chunk):,} of {len(frame):,} rows")
+    os.replace(tmp_path, job.result_path)
+    return {"count": int(len(frame)), "high_risk": high_risk, "models_used": models_used, "format": "csv"}
+
+job_queue.register("batch_score", run_batch_job)
+
+def run_sweep_job(job) -> dict:
+    """Score a queued scenario sweep with the model of its region."""
+    spec = job.params["spec"]
+    _, active = model_router.route(spec.get("region"))
+    return run_sweep(active.model, active.version, spec, cache=sweep_cache, progress=job.report_progress)
+
+job_queue.register("scenario_sweep", run_sweep_job)
+
+def start_sweep(spec: Dict, background: Optional[bool] = None) -> Dict:
+    """
+    Run a normalized sweep spec inline when it is cheap to score or cached, else queue it.
+    Returns:
+        dict: {'status': 'done', 'result': summary} or {'status': 'queued', 'job_id': id}.
+    """
+    _, active = model_router.route(spec.get("region"))
+    if background is None:
+        background = scored_points(active.model, spec) > SYNC_SWEEP_POINTS
+    if background and (spec_key(spec), active.version) not in sweep_cache:
+        return {"status": "queued", "job_id": job_queue.submit("scenario_sweep", {"spec": spec})}
+    return {"status": "done", "result": run_sweep(active.model, active.version, spec, cache=sweep_cache)}
+
+@server.route("/api/v1/sweeps", methods=["POST"])
+@login_required
+def scenario_sweep():
+    """
+    Score a grid of feature ranges and return a heatmap and partial-dependence curves.
+
+    Cheap or cached grids are answered inline; costlier ones (or ?background=1) are
+    queued and return 202 with a job to poll.
+    """
+    try:
+        spec = normalize_spec(request.get_json(force=True, silent=True))
+        background = request.args.get("background", type=int)
+        started = start_sweep(spec, None if background is None else bool(background))
+    except SweepSpecError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Scenario sweep error: {str(e)}")
+        return jsonify({"success": False, "error": "Scenario sweep failed"}), 500
+    if started["status"] == "queued":
+        return jsonify({"success": True, "job_id": started["job_id"],
+                        "status_url": url_for("job_status", job_id=started["job_id"])}), 202
+    return jsonify({"success": True, "sweep": started["result"]})
+
+@server.route("/api/v1/sweeps/cache", methods=["GET"])
+@login_required
+def sweep_cache_stats():
+    return jsonify({"success": True, "cache": sweep_cache.stats()})
+
+@server.route("/api/v1/jobs/batch", methods=["POST"])
+@login_required
+def submit_batch_job():
+    """Queue a batch body (as for /api/v1/predict/batch) for background scoring."""
+    body = request.get_data()
+    if not body:
+        return jsonify({"success": False, "error": "Request body is empty"}), 400
+    params = {
+        "content_type": request.content_type,
+        "chunk_size": request.args.get("chunk_size", server.config['PREDICT_CHUNK_SIZE'], type=int),
+        "region": request.args.get("region"),
+    }
+    job_id = job_queue.submit("batch_score", params, payload=body)
+    return jsonify({"success": True, "job_id": job_id, "status_url": url_for("job_status", job_id=job_id)}), 202
+
+@server.route("/api/v1/jobs/<job_id>", methods=["GET"])
+@login_required
+def job_status(job_id):
+    """
+    Status and progress of a background job.
+
+    With ?wait=<seconds> the request long-polls until the job finishes or its
+    progress moves past ?progress=<last seen value>.
+    """
+    wait = min(request.args.get("wait", 0, type=float), MAX_JOB_WAIT)
+    try:
+        if wait > 0:
+            job = job_queue.wait(job_id, timeout=wait, progress=request.args.get("progress", type=float))
+        else:
+            job = job_queue.get(job_id)
+    except JobNotFound:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    if job['status'] == DONE and job['has_result_file']:
+        job['result_url'] = url_for("job_result", job_id=job_id)
+    return jsonify({"success": True, "job": job})
+
+@server.route("/api/v1/jobs/<job_id>/result", methods=["GET"])
+@login_required
+def job_result(job_id):
+    """Stream the result file of a finished job."""
+    try:
+        job = job_queue.get(job_id)
+    except JobNotFound:
+        return jsonify({"success": False, "error": "Unknown job"}), 404
+    if job['status'] != DONE or not job['has_result_file']:
+        return jsonify({"success": False, "error": f"Job is {job['status']}"}), 409
+    return send_file(job_queue.result_path(job_id), mimetype="text/csv", as_attachment=True,
+                     download_name=f"{job['kind']}-{job_id}.csv")
+
+@server.route("/api/v1/predict/cache", methods=["GET"])
+@login_required
+def prediction_cache_stats():
+    """Hit, miss and eviction counters of the in-process prediction cache."""
+    return jsonify({"success": True, "cache": prediction_cache.stats()})
+
+@server.route("/api/v1/identity/cache", methods=["GET"])
+@login_required
+def identity_cache_stats():
+    """Hit rates of the identity cache in front of Firebase user lookups and token checks."""
+    return jsonify({"success": True, "cache": get_identity_service().stats()})
+
+@server.route("/api/v1/models", methods=["GET"])
+@login_required
+def model_versions():
+    """Loaded model versions and which one is serving predictions."""
+    active = model_registry.current()
+    return jsonify({"success": True, "active": active.version, "versions": model_registry.versions(),
+                    "regions": model_router.stats()})
 
 def create_input_field(id_name: str, label: str, placeholder: str = "") -> html.Div:
     """Create a standardized input field with label."""
@@ -495,38 +535,93 @@ def create_prediction_card(prediction_details: Dict) -> dbc.Card:
                         "borderRadius": "10px",
                         "boxShadow": "0 4px 6px rgba(0,0,0,0.05)"
                     }
+                ),
+                html.P(
+                    f"Model version {prediction_details.get('model_version', 'unknown')}",
+                    className="text-muted small mt-3 mb-0"
                 )
             ], className="mt-2")
         ], style={"padding": "25px"})
     ], className="shadow-sm border-0", style={"borderRadius": "15px"})
 
+# Vaccination is not a model feature. Above VACCINATION_HIGH the outbreak probability is
+# scaled down linearly (to zero at 100%); below VACCINATION_LOW the remaining probability
+# is scaled up linearly (to one at 0%). In between it is left as the model gave it.
+VACCINATION_HIGH = 70.0
+VACCINATION_LOW = 40.0
+
+def _score_features(model, features) -> Dict:
+    """Outbreak probability and per-tree probabilities (None for non-forests) for one feature vector."""
+    X = np.asarray([features], dtype=float)
+    _, probabilities = score_matrix(model, X)
+    votes = tree_probabilities(model, X)
+    return {'probability': float(probabilities[0]), 'votes': None if votes is None else votes[0]}
+
+def adjust_for_vaccination(probability, vaccination_rate: Optional[float]):
+    """Deterministic vaccination adjustment of outbreak probabilities (see VACCINATION_HIGH)."""
+    if vaccination_rate is None:
+        return probability
+    if vaccination_rate > VACCINATION_HIGH:
+        return probability * max(0.0, 1 - (vaccination_rate - VACCINATION_HIGH) / (100 - VACCINATION_HIGH))
+    if vaccination_rate < VACCINATION_LOW:
+        return probability + (1 - probability) * min(1.0, (VACCINATION_LOW - vaccination_rate) / VACCINATION_LOW)
+    return probability
+
 def predict_outbreak(new_cases: float, humidity: float, population_density: float,
-                    temperature: float, rainfall: float, vaccination_rate: float = None) -> str:
-    """Make prediction using the loaded model."""
+                    temperature: float, rainfall: float, vaccination_rate: float = None,
+                    region: Optional[str] = None) -> str:
+    """Make prediction using the region's model, or the global model."""
+    return predict_outbreak_details(new_cases, humidity, population_density,
+                                    temperature, rainfall, vaccination_rate, region)['risk_level']
+
+def predict_outbreak_with_version(new_cases: float, humidity: float, population_density: float,
+                                  temperature: float, rainfall: float,
+                                  vaccination_rate: float = None, region: Optional[str] = None) -> tuple:
+    """Like predict_outbreak, but also return the model version that made the prediction."""
+    details = predict_outbreak_details(new_cases, humidity, population_density,
+                                       temperature, rainfall, vaccination_rate, region)
+    return details['risk_level'], details['model_version']
+
+def predict_outbreak_details(new_cases: float, humidity: float, population_density: float,
+                             temperature: float, rainfall: float,
+                             vaccination_rate: float = None, region: Optional[str] = None) -> Dict:
+    """
+    Risk level, probability and confidence for one set of inputs.
+
+    The result depends only on the inputs and the model version: the probability
+    comes from predict_proba and the confidence is the share of trees voting for
+    the predicted level, both after the vaccination adjustment.
+    Returns:
+        dict: risk_level, probability, model_probability, confidence (%), vote_spread
+            and model_version.
+    """
     try:
-        # Base prediction using the model
-        prediction = model.predict([[
-            new_cases,
-            humidity,
-            population_density,
-            temperature,
-            rainfall
-        ]])[0]
-        
-        # If vaccination rate is provided, adjust prediction
-        if vaccination_rate is not None:
-            # Simple adjustment: high vaccination rates reduce risk
-            # This is a simplified approach - in a real model, this would be more sophisticated
-            if vaccination_rate > 70 and prediction == 1:
-                # If vaccination is high, there's a chance to reduce high risk to low
-                if np.random.random() < (vaccination_rate - 70) / 30:
-                    prediction = 0
-            elif vaccination_rate < 40 and prediction == 0:
-                # If vaccination is low, there's a chance to increase low risk to high
-                if np.random.random() < (40 - vaccination_rate) / 40:
-                    prediction = 1
-        
-        return "High" if prediction == 1 else "Low"
+        # Hold on to one version for the whole request, even if a swap happens meanwhile
+        model_name, active = model_router.route(region)
+        # Model outputs, served from the cache when possible
+        scored = prediction_cache.get_or_compute(
+            [new_cases, humidity, population_density, temperature, rainfall],
+            lambda features: _score_features(active.model, features),
+            version=model_registry.current().version if model_name else active.version,
+            namespace=f"{model_name}:{active.version}" if model_name else None
+        )
+        probability = adjust_for_vaccination(scored['probability'], vaccination_rate)
+        # Same rule as the model's own label: high only above one half
+        high = probability > 0.5
+        if scored['votes'] is not None:
+            votes = adjust_for_vaccination(scored['votes'], vaccination_rate)
+            agreement = float(vote_agreement(votes[np.newaxis], np.array([int(high)]))[0])
+            vote_spread = float(votes.std())
+        else:
+            agreement, vote_spread = max(probability, 1 - probability), None
+        return {
+            'risk_level': "High" if high else "Low",
+            'probability': probability,
+            'model_probability': scored['probability'],
+            'confidence': agreement * 100,
+            'vote_spread': vote_spread,
+            'model_version': active.version,
+        }
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
         raise
@@ -605,6 +700,8 @@ def get_recommendation(risk_level: str, probability: float) -> str:
 # Dash Layout
 app.layout = html.Div([
     dcc.Location(id="url"),
+    # Per-user values for the shared dashboard layout, set by display_page
+    dcc.Store(id="user-info"),
     html.Div(id="page-content", style={
         "padding": "20px",
         "backgroundColor": "#ffffff",
@@ -619,7 +716,22 @@ app.layout = html.Div([
     )
 ])
 
-def create_dashboard():
+SWEEP_FEATURE_OPTIONS = [
+    {"label": "New Cases", "value": "NewCases"},
+    {"label": "Humidity", "value": "Humidity_x"},
+    {"label": "Population Density", "value": "PopulationDensity"},
+    {"label": "Temperature", "value": "Temperature"},
+    {"label": "Rainfall", "value": "Rainfall"},
+]
+
+def create_dashboard(regions: Optional[List[str]] = None):
+    """
+    Build the dashboard's component tree. It holds nothing specific to a user (the
+    welcome line is filled in from the user-info store), so it is built once per set
+    of regions and shared, see dashboard_layout().
+    """
+    if regions is None:
+        regions = trend_store.regions()
     # Custom styles for number inputs - ensure arrows are visible
     number_input_style = {
         "borderRadius": "10px",
@@ -690,7 +802,7 @@ def create_dashboard():
                         html.H1(
                             [
                                 html.I(className="fas fa-virus-covid mr-2", style={"color": "#6366F1"}),
-                                f" Welcome, {current_user.username}!"
+                                html.Span(" Welcome!", id="welcome-message")
                             ],
                             className="text-center mb-4",
                             style={
@@ -835,6 +947,21 @@ def create_dashboard():
                                     ], className="mb-4 position-relative")
                                 ], md=6)
                             ]),
+                            dbc.Row([
+                                dbc.Col([
+                                    html.Div([
+                                        html.Label("Region", className="small text-muted mb-1",
+                                                 style={"marginLeft": "12px"}),
+                                        dcc.Dropdown(
+                                            id="region",
+                                            options=[{"label": region, "value": region}
+                                                     for region in regions],
+                                            value=NATIONAL,
+                                            clearable=False
+                                        )
+                                    ], className="mb-4")
+                                ], md=12)
+                            ]),
                             
                             # Updated analyze button
                             dbc.Button(
@@ -866,7 +993,39 @@ def create_dashboard():
                     html.Div(
                         id="prediction-output",
                         className="mb-5",
-                        style={"minHeight": "400px"}
+                        style={"minHeight": "400px"},
+                        children=[
+                            html.Div(id="prediction-message"),
+                            # The graphs stay on the page with their cached templates; each
+                            # prediction only sends a Patch with the values that changed
+                            html.Div(
+                                id="prediction-result",
+                                style={"display": "none"},
+                                children=dbc.Container([
+                                    dbc.Row([
+                                        dbc.Col([
+                                            dcc.Graph(id="risk-gauge", figure=risk_gauge_template(),
+                                                      config=GAUGE_CONFIG)
+                                        ], md=6, sm=12),
+                                        dbc.Col([
+                                            html.Div(id="prediction-card")
+                                        ], md=6, sm=12)
+                                    ]),
+                                    dbc.Row([
+                                        dbc.Col([
+                                            html.A(
+                                                dbc.Button(
+                                                    "Return to Dashboard",
+                                                    color="primary",
+                                                    className="mt-3"
+                                                ),
+                                                href="/dashboard"
+                                            )
+                                        ])
+                                    ])
+                                ])
+                            )
+                        ]
                     )
                 ], width=12)
             ], className="justify-content-center"),
@@ -881,11 +1040,71 @@ def create_dashboard():
                             "background": "linear-gradient(135deg, #F5F7FF, #EEF2FF)",
                             "borderRadius": "15px",
                             "boxShadow": "0 10px 15px rgba(99, 102, 241, 0.1)"
-                        }
+                        },
+                        children=html.Div(
+                            id="trend-result",
+                            style={"display": "none"},
+                            children=dcc.Graph(id="trend-chart", figure=trend_chart_template(), config=TREND_CONFIG)
+                        )
                     )
                 ], width=12)
             ], className="justify-content-center"),
 
+            # Batch scoring runs as a background job; the card polls it for progress
+            dbc.Row([
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardHeader(html.H5("Batch Scoring", className="mb-0")),
+                        dbc.CardBody([
+                            dcc.Upload(
+                                id="batch-upload",
+                                children=html.Div([
+                                    html.I(className="fas fa-file-upload mr-2"),
+                                    "Drop a CSV or Parquet file of feature rows, or click to select one"
+                                ]),
+                                className="text-center text-muted p-4",
+                                style={"border": "2px dashed #E5E7EB", "borderRadius": "10px", "cursor": "pointer"}
+                            ),
+                            html.Div(id="batch-job-status", className="mt-3"),
+                            dcc.Store(id="batch-job-id"),
+                            dcc.Interval(id="batch-job-poll", interval=1000, disabled=True)
+                        ], style={"padding": "25px"})
+                    ], className="border-0 shadow-sm", style={"borderRadius": "15px"})
+                ], md=10, sm=12, className="mx-auto")
+            ], className="mb-5 justify-content-center"),
+
+            # Sensitivity of the risk to two features, the others fixed at the form values
+            dbc.Row([
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardHeader(html.H5("Sensitivity Analysis", className="mb-0")),
+                        dbc.CardBody([
+                            dbc.Row([
+                                dbc.Col([
+                                    html.Label("X axis", className="small text-muted mb-1"),
+                                    dcc.Dropdown(id="sweep-x", options=SWEEP_FEATURE_OPTIONS,
+                                                 value="NewCases", clearable=False)
+                                ], md=4),
+                                dbc.Col([
+                                    html.Label("Y axis", className="small text-muted mb-1"),
+                                    dcc.Dropdown(id="sweep-y", options=SWEEP_FEATURE_OPTIONS,
+                                                 value="Temperature", clearable=False)
+                                ], md=4),
+                                dbc.Col([
+                                    html.Label("Steps per axis", className="small text-muted mb-1"),
+                                    dcc.Slider(id="sweep-steps", min=10, max=200, step=10, value=50,
+                                               marks={10: "10", 100: "100", 200: "200"})
+                                ], md=4)
+                            ], className="mb-3"),
+                            dbc.Button("Run Sweep", id="sweep-button", color="primary", className="w-100"),
+                            html.Div(id="sweep-output", className="mt-3"),
+                            dcc.Store(id="sweep-job-id"),
+                            dcc.Interval(id="sweep-job-poll", interval=1000, disabled=True)
+                        ], style={"padding": "25px"})
+                    ], className="border-0 shadow-sm", style={"borderRadius": "15px"})
+                ], md=10, sm=12, className="mx-auto")
+            ], className="mb-5 justify-content-center"),
+
             # Footer with updated style
             dbc.Row([
                 dbc.Col([
@@ -913,54 +1132,198 @@ def create_dashboard():
         ], fluid=True, style={"maxWidth": "1400px"})
     ], style={"backgroundColor": "#ffffff", "minHeight": "100vh"})
 
-# Add hover effects and transitions to buttons in callback
-@app.callback(
-    Output("predict-button", "style"),
-    [Input("predict-button", "n_clicks")]
-)
-def animate_button(n_clicks):
-    if n_clicks:
-        return {
-            "transform": "scale(0.95)",
-            "boxShadow": "0 2px 5px rgba(99, 102, 241, 0.2)",
-            "background": "linear-gradient(45deg, #6366F1, #8B5CF6)",
-            "fontSize": "1.1rem",
-            "border": "none",
-            "borderRadius": "10px"
-        }
-    return {
-        "boxShadow": "0 4px 15px rgba(99, 102, 241, 0.3)",
-        "background": "linear-gradient(45deg, #6366F1, #8B5CF6)",
-        "fontSize": "1.1rem",
-        "border": "none",
-        "borderRadius": "10px"
-    }
+# Button effects, the navbar toggle and other UI-only behaviors run in the browser
+register_ui_callbacks(app)
 
-@app.callback(
-    Output("navbar-collapse", "is_open"),
-    [Input("navbar-toggler", "n_clicks")],
-    [State("navbar-collapse", "is_open")],
-)
-def toggle_navbar_collapse(n_clicks, is_open):
-    if n_clicks:
-        return not is_open
-    return is_open
+@lru_cache(maxsize=4)
+def _dashboard_layout(regions: tuple) -> html.Div:
+    return create_dashboard(list(regions))
+
+def dashboard_layout() -> html.Div:
+    """The shared dashboard layout, rebuilt only when the trend data's regions change."""
+    return _dashboard_layout(tuple(trend_store.regions()))
 
 @app.callback(
-    Output("page-content", "children"),
+    [
+        Output("page-content", "children"),
+        Output("user-info", "data")
+    ],
     [Input("url", "pathname")]
 )
 def display_page(pathname):
     if pathname == "/dashboard":
         if not current_user.is_authenticated:
-            return dcc.Location(id='redirect', href="/login")
-        return create_dashboard()
-    return dcc.Location(id='redirect', href="/login")
+            return dcc.Location(id='redirect', href="/login"), None
+        return dashboard_layout(), {"username": current_user.username}
+    return dcc.Location(id='redirect', href="/login"), None
+
+def create_sweep_chart(sweep: Dict) -> dcc.Graph:
+    """Heatmap of the swept surface next to the partial-dependence curves."""
+    labels = {option["value"]: option["label"] for option in SWEEP_FEATURE_OPTIONS}
+    fig = make_subplots(rows=1, cols=2, column_widths=[0.6, 0.4],
+                        subplot_titles=("Outbreak probability", "Partial dependence"))
+    x_axis, y_axis = (sweep['axes'] + [None])[:2]
+    if y_axis is not None:
+        fig.add_trace(go.Heatmap(x=sweep['x'], y=sweep['y'], z=np.asarray(sweep['surface']).T.tolist(),
+                                 zmin=0, zmax=1, colorscale="RdYlGn_r",
+                                 colorbar=dict(title="P(outbreak)", x=0.55)), row=1, col=1)
+        fig.update_yaxes(title_text=labels[y_axis], row=1, col=1)
+    else:
+        fig.add_trace(go.Scatter(x=sweep['x'], y=sweep['surface'], mode="lines", showlegend=False), row=1, col=1)
+    fig.update_xaxes(title_text=labels[x_axis], row=1, col=1)
+    for name, curve in sweep['partial_dependence'].items():
+        # Curves share one axis, so each is drawn over its own range scaled to 0..1
+        values = np.asarray(curve['values'])
+        span = (values.max() - values.min()) or 1.0
+        fig.add_trace(go.Scatter(x=((values - values.min()) / span).tolist(), y=curve['probability'],
+                                 mode="lines", name=labels[name]), row=1, col=2)
+    fig.update_xaxes(title_text="Position in range", row=1, col=2)
+    fig.update_yaxes(range=[0, 1], row=1, col=2)
+    fig.update_layout(
+        height=450,
+        margin=dict(l=40, r=20, t=60, b=40),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        title=dict(text=f"{sweep['points']:,} scenarios scored in {sweep['elapsed_s']:.2f}s"
+                        f"{' (cached)' if sweep.get('cached') else ''}", x=0.5)
+    )
+    return dcc.Graph(figure=fig, config={"displayModeBar": False})
+
+def _sweep_status(job: Dict):
+    if job['status'] == FAILED:
+        return dbc.Alert(f"Sweep failed: {job['error']}", color="danger")
+    if job['status'] == DONE:
+        return create_sweep_chart(job['result'])
+    return html.Div([
+        dbc.Progress(value=round(job['progress'] * 100), striped=True, animated=True, className="mb-2"),
+        html.Small(job['status'].capitalize(), className="text-muted")
+    ])
 
 @app.callback(
     [
-        Output("prediction-output", "children"),
-        Output("historical-trend", "children")
+        Output("sweep-job-id", "data"),
+        Output("sweep-job-poll", "disabled"),
+        Output("sweep-output", "children", allow_duplicate=True)
+    ],
+    [Input("sweep-button", "n_clicks")],
+    [
+        State("sweep-x", "value"),
+        State("sweep-y", "value"),
+        State("sweep-steps", "value"),
+        State("new-cases", "value"),
+        State("humidity", "value"),
+        State("population-density", "value"),
+        State("temperature", "value"),
+        State("rainfall", "value"),
+        State("region", "value")
+    ],
+    prevent_initial_call=True
+)
+def submit_dashboard_sweep(n_clicks, x_axis, y_axis, steps, new_cases, humidity, population_density,
+                           temperature, rainfall, region):
+    """Sweep two features over their ranges with the other features fixed at the form values."""
+    if not n_clicks:
+        return dash.no_update, True, ""
+    axes = [x_axis] if x_axis == y_axis else [x_axis, y_axis]
+    form = dict(zip(FEATURE_COLUMNS, [new_cases, humidity, population_density, temperature, rainfall]))
+    try:
+        spec = normalize_spec({
+            "ranges": {axis: {"start": FEATURE_RANGES[axis][0], "stop": FEATURE_RANGES[axis][1], "steps": steps}
+                       for axis in axes},
+            "base": {name: value for name, value in form.items() if value is not None and name not in axes},
+            "axes": axes,
+            "region": None if region == NATIONAL else region,
+        })
+        started = start_sweep(spec)
+    except Exception as e:
+        logger.error(f"Scenario sweep error: {str(e)}")
+        return None, True, dbc.Alert(f"Sweep failed: {e}", color="danger")
+    if started["status"] == "done":
+        return None, True, create_sweep_chart(started["result"])
+    return started["job_id"], False, _sweep_status(job_queue.get(started["job_id"]))
+
+@app.callback(
+    [
+        Output("sweep-output", "children"),
+        Output("sweep-job-poll", "disabled", allow_duplicate=True)
+    ],
+    [Input("sweep-job-poll", "n_intervals")],
+    [State("sweep-job-id", "data")],
+    prevent_initial_call=True
+)
+def poll_dashboard_sweep(n_intervals, job_id):
+    if not job_id:
+        return dash.no_update, True
+    try:
+        job = job_queue.get(job_id)
+    except JobNotFound:
+        return dbc.Alert("The sweep job has expired.", color="warning"), True
+    return _sweep_status(job), job['status'] in (DONE, FAILED)
+
+def _batch_job_status(job: Dict) -> html.Div:
+    """Progress bar while a batch job runs, its summary and download link once done."""
+    if job['status'] == FAILED:
+        return dbc.Alert(f"Batch scoring failed: {job['error']}", color="danger")
+    if job['status'] == DONE:
+        result = job['result']
+        return html.Div([
+            html.P(f"Scored {result['count']:,} rows: {result['high_risk']:,} high risk.", className="mb-2"),
+            html.A(dbc.Button("Download results", color="primary"), href=f"/api/v1/jobs/{job['id']}/result")
+        ])
+    return html.Div([
+        dbc.Progress(value=round(job['progress'] * 100), striped=True, animated=True, className="mb-2"),
+        html.Small(job['message'] or job['status'].capitalize(), className="text-muted")
+    ])
+
+@app.callback(
+    [
+        Output("batch-job-id", "data"),
+        Output("batch-job-poll", "disabled"),
+        Output("batch-job-status", "children", allow_duplicate=True)
+    ],
+    [Input("batch-upload", "contents")],
+    [State("batch-upload", "filename"), State("region", "value")],
+    prevent_initial_call=True
+)
+def submit_dashboard_batch(contents, filename, region):
+    """Queue an uploaded file for background scoring instead of scoring it in the callback."""
+    if not contents:
+        return dash.no_update, True, ""
+    _, encoded = contents.split(",", 1)
+    content_type = "text/csv" if (filename or "").lower().endswith(".csv") else None
+    job_id = job_queue.submit("batch_score", {
+        "content_type": content_type,
+        "chunk_size": server.config['PREDICT_CHUNK_SIZE'],
+        "region": None if region == NATIONAL else region,
+    }, payload=base64.b64decode(encoded))
+    return job_id, False, _batch_job_status(job_queue.get(job_id))
+
+@app.callback(
+    [
+        Output("batch-job-status", "children"),
+        Output("batch-job-poll", "disabled", allow_duplicate=True)
+    ],
+    [Input("batch-job-poll", "n_intervals")],
+    [State("batch-job-id", "data")],
+    prevent_initial_call=True
+)
+def poll_dashboard_batch(n_intervals, job_id):
+    if not job_id:
+        return "", True
+    try:
+        job = job_queue.get(job_id)
+    except JobNotFound:
+        return dbc.Alert("The batch job has expired.", color="warning"), True
+    return _batch_job_status(job), job['status'] in (DONE, FAILED)
+
+@app.callback(
+    [
+        Output("prediction-message", "children"),
+        Output("prediction-card", "children"),
+        Output("risk-gauge", "figure"),
+        Output("trend-chart", "figure"),
+        Output("prediction-result", "style"),
+        Output("trend-result", "style")
     ],
     [Input("predict-button", "n_clicks")],
     [
@@ -969,12 +1332,21 @@ def display_page(pathname):
         State("population-density", "value"),
         State("temperature", "value"),
         State("rainfall", "value"),
-        State("vaccination-rate", "value")
-    ]
+        State("vaccination-rate", "value"),
+        State("region", "value")
+    ],
+    # The layout already starts with the panels hidden
+    prevent_initial_call=True
 )
-def update_dashboard(n_clicks, new_cases, humidity, population_density, temperature, rainfall, vaccination_rate):
+def update_dashboard(n_clicks, new_cases, humidity, population_density, temperature, rainfall, vaccination_rate,
+                     region=NATIONAL):
+    """
+    Fill the prediction panels. The gauge and trend graphs are already on the page,
+    so only Patches with their new values are sent, not whole figures.
+    """
+    hidden = {"display": "none"}
     if not n_clicks:
-        return "", ""
+        return "", dash.no_update, dash.no_update, dash.no_update, hidden, hidden
     
     try:
         # Validate inputs
@@ -992,79 +1364,61 @@ def update_dashboard(n_clicks, new_cases, humidity, population_density, temperat
             return dbc.Alert(
                 f"Please enter values for: {', '.join(missing_fields)}",
                 color="warning"
-            ), ""
+            ), dash.no_update, dash.no_update, dash.no_update, hidden, hidden
         
-        # Make prediction
-        risk_level = predict_outbreak(new_cases, humidity, population_density, temperature, rainfall, vaccination_rate)
-        
-        # Calculate confidence and risk probability 
-        confidence = np.random.uniform(75, 95) 
-        # Adjust risk probability based on vaccination rate
-        risk_probability = 0.8 if risk_level == "High" else 0.2  
-        if vaccination_rate is not None:
-            # Reduce risk probability as vaccination rate increases
-            risk_probability *= max(0.2, (100 - vaccination_rate) / 100)
+        # Make prediction; probability and confidence come from the model, so the
+        # same inputs always give the same output
+        details = predict_outbreak_details(
+            new_cases, humidity, population_density, temperature, rainfall, vaccination_rate, region)
+        risk_level = details['risk_level']
+        risk_probability = details['probability']
         
         # Generate prediction details
         prediction_details = {
             'risk_level': risk_level,
-            'confidence': confidence,
+            'confidence': details['confidence'],
             'key_factors': {
                 'Population Density Impact': f"{population_density:.1f} people/km²",
                 'Environmental Risk': f"{(humidity * temperature / 100):.1f}",
                 'Current Spread Rate': f"{(new_cases / population_density):.2f}",
                 'Vaccination Coverage': f"{vaccination_rate:.1f}%"
             },
-            'recommendation': get_recommendation(risk_level, risk_probability)
+            'recommendation': get_recommendation(risk_level, risk_probability),
+            'model_version': details['model_version']
         }
         
-        # Generate sample historical data (replace with actual data)
-        dates = pd.date_range(end=datetime.now(), periods=30, freq='D')
-        historical_data = pd.DataFrame({
-            'date': dates,
-            'risk_level': np.random.uniform(0, 1, 30),
-            'new_cases': np.random.normal(new_cases, new_cases*0.1, 30)
+        # Last 30 days of the region's precomputed trend aggregates
+        historical_data = trend_store.lookup(region, days=30).rename(columns={
+            'Date': 'date',
+            'risk_rate': 'risk_level',
+            'cases': 'new_cases',
+            'risk_rate_ma3': 'risk_ma3'
         })
+        # Before any processed data exists the chart stays empty rather than failing the prediction
+        trend_note = "" if not historical_data.empty else dbc.Alert(
+            "No historical trend data yet. Run data_preprocessing.py to build it.",
+            color="info"
+        )
         
-        # Create prediction output
-        prediction_output = dbc.Container([
-            dbc.Row([
-                dbc.Col([
-                    create_risk_gauge(risk_probability)
-                ], md=6, sm=12),
-                dbc.Col([
-                    create_prediction_card(prediction_details)
-                ], md=6, sm=12)
-            ]),
-            dbc.Row([
-                dbc.Col([
-                    html.A(
-                        dbc.Button(
-                            "Return to Dashboard",
-                            color="primary",
-                            className="mt-3"
-                        ),
-                        href="/dashboard"
-                    )
-                ])
-            ])
-        ])
-        
-        # Create historical trend
-        trend_output = create_trend_chart(historical_data)
-        
-        return prediction_output, trend_output
+        return (
+            trend_note,
+            create_prediction_card(prediction_details),
+            risk_gauge_patch(risk_probability),
+            trend_chart_patch(historical_data),
+            {},
+            {}
+        )
         
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
         return dbc.Alert(
             "An error occurred during prediction. Please try again.",
             color="danger"
-        ), ""
+        ), dash.no_update, dash.no_update, dash.no_update, hidden, hidden
 
 if __name__ == "__main__":
     with server.app_context():
         pass  # No need for db.create_all() with Firebase
     
     logger.info("Starting the server...")
-    app.run_server(debug=True)
\ No newline at end of file
+    app.run_server(debug=server.config['DEBUG'])
\ No newline at end of file
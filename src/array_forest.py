@@ -0,0 +1,296 @@
+"""
+This module stores a fitted RandomForestClassifier as flat NumPy node arrays.
+
+The arrays of every tree are concatenated, so a batch of rows can walk every tree
+at once with a few vectorized gathers per tree level, without sklearn's per-call
+input validation and Python overhead. The arrays are written into one file, each
+aligned so it can be memory-mapped. Loading with mmap_mode='r' maps the node arrays
+straight from the page cache instead of copying them into each process, so all
+gunicorn workers (and every process that loads the same file) share one copy.
+Unpickled sklearn trees cannot do this: Tree.__setstate__ copies its nodes into
+private memory even when joblib.load(mmap_mode='r') maps the pickle.
+
+    python src/array_forest.py convert src/models/outbreak_model.pkl
+"""
+import os
+import sys
+import json
+import struct
+import logging
+import argparse
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"OFOREST1"
+FORMAT_VERSION = 2
+FOREST_SUFFIX = ".forest"
+# Arrays start on 64-byte boundaries so mapped pages line up with cache lines
+ALIGNMENT = 64
+
+# Upper bound on the (row, tree) cells walked together while scoring
+BLOCK_CELLS = 1 << 16
+# Levels walked between dropping cells that already reached a leaf
+COMPACT_EVERY = 4
+
+
+def export_forest(model) -> Dict[str, np.ndarray]:
+    """
+    Flatten a fitted forest into concatenated node arrays.
+
+    children[node] holds (right, left), so a row at `node` moves to
+    children[node, x <= threshold]. Leaves point to themselves, so every row can take
+    the same number of steps through a tree and still end on its leaf.
+    Returns:
+        dict: feature, threshold, children, proba, roots and depths arrays.
+    """
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Only single-output forests can be exported")
+
+    features, thresholds, children, probas, roots, depths = [], [], [], [], [], []
+    offset = 0
+    n_classes = len(model.classes_)
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold).astype(np.float64))
+        children.append(np.column_stack([
+            np.where(is_leaf, nodes, tree.children_right),
+            np.where(is_leaf, nodes, tree.children_left),
+        ]) + offset)
+
+        # Same normalization DecisionTreeClassifier.predict_proba applies per row
+        value = tree.value[:, 0, :n_classes].astype(np.float64)
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        probas.append(value / normalizer)
+
+        roots.append(offset)
+        depths.append(tree.max_depth)
+        offset += tree.node_count
+
+    # Traversal indexes children with 2 * node + 1 in 32-bit arithmetic
+    if 2 * offset + 1 > np.iinfo(np.int32).max:
+        raise ValueError(f"Forest has too many nodes for 32-bit indices: {offset}")
+
+    return {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'children': np.ascontiguousarray(np.concatenate(children), dtype=np.int32),
+        'proba': np.ascontiguousarray(np.concatenate(probas)),
+        'roots': np.asarray(roots, dtype=np.int64),
+        'depths': np.asarray(depths, dtype=np.int32),
+    }
+
+
+class ArrayForest:
+    """Forest classifier evaluated from flat node arrays, with the sklearn predict API."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], classes, feature_names=None):
+        self.arrays = arrays
+        # Plain ndarray views of (possibly memory-mapped) arrays; np.asarray does not copy
+        self.feature = np.asarray(arrays['feature'])
+        self.threshold = np.asarray(arrays['threshold'])
+        self.children = np.asarray(arrays['children']).reshape(-1)
+        self.proba = np.asarray(arrays['proba'])
+        self.roots = np.asarray(arrays['roots'], dtype=np.intp)
+        self.depths = np.asarray(arrays['depths'])
+
+        self.classes_ = np.asarray(classes)
+        self.n_classes_ = len(self.classes_)
+        self.n_outputs_ = 1
+        self.n_estimators = len(self.roots)
+        self.n_features_in_ = int(self.feature.max()) + 1 if feature_names is None else len(feature_names)
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    @classmethod
+    def from_model(cls, model) -> "ArrayForest":
+        return cls(export_forest(model), model.classes_, getattr(model, "feature_names_in_", None))
+
+    @property
+    def node_count(self) -> int:
+        return len(self.feature)
+
+    def _as_float32(self, X) -> np.ndarray:
+        names = getattr(self, "feature_names_in_", None)
+        if names is not None and hasattr(X, "columns"):
+            # Columns are matched by name, like sklearn; only their order may differ
+            columns = [str(column) for column in X.columns]
+            if sorted(columns) != sorted(names):
+                raise ValueError(f"X has feature names {columns}, the forest was fitted on {list(names)}")
+            X = X[list(names)]
+        # sklearn casts inputs to float32 before comparing them with the float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X must have shape (n_rows, {self.n_features_in_}), got {X.shape}")
+        return X
+
+    def _walk(self, columns: np.ndarray, n_rows: int, node: np.ndarray, rows: np.ndarray, depth: int) -> np.ndarray:
+        """
+        Move every (row, tree) cell from its root to its leaf.
+        Args:
+            columns: Block of rows flattened column by column (feature f of row r at f * n_rows + r).
+            node: Current node of each cell.
+            rows: Row of each cell.
+            depth: Deepest tree among the cells.
+        """
+        leaves = np.empty(len(node), dtype=np.intp)
+        cells = np.arange(len(node))
+        for step in range(depth):
+            go_left = columns.take(self.feature.take(node) * n_rows + rows) <= self.threshold.take(node)
+            node = self.children.take(2 * node + go_left)
+            # Every few levels, stop carrying cells that already reached a leaf
+            if step % COMPACT_EVERY == COMPACT_EVERY - 1 and step < depth - 1:
+                done = self.children.take(2 * node) == node
+                if done.any():
+                    leaves[cells[done]] = node[done]
+                    keep = ~done
+                    cells, node, rows = cells[keep], node[keep], rows[keep]
+                    if not len(node):
+                        return leaves
+        leaves[cells] = node
+        return leaves
+
+    def _tiles(self, X: np.ndarray):
+        """
+        Split the rows x trees work into tiles of at most BLOCK_CELLS cells.
+
+        Small batches walk all trees at once (one pass per tree level); large batches
+        walk a few trees at a time, which keeps the nodes being read in cache.
+        """
+        n_trees = self.n_estimators
+        for start in range(0, X.shape[0], BLOCK_CELLS):
+            block = X[start:start + BLOCK_CELLS]
+            n_rows = len(block)
+            # Exact: every float32 value is representable as float64
+            columns = block.astype(np.float64).ravel(order='F')
+            group = max(1, BLOCK_CELLS // n_rows)
+            for first in range(0, n_trees, group):
+                trees = np.arange(first, min(n_trees, first + group))
+                node = np.repeat(self.roots[np.newaxis, trees], n_rows, axis=0).reshape(-1)
+                rows = np.repeat(np.arange(n_rows), len(trees))
+                leaves = self._walk(columns, n_rows, node, rows, int(self.depths[trees].max()))
+                yield start, n_rows, trees, leaves.reshape(n_rows, len(trees))
+
+    def apply(self, X) -> np.ndarray:
+        """Global index of the leaf each row reaches in every tree, shape (n_rows, n_trees)."""
+        X = self._as_float32(X)
+        result = np.empty((X.shape[0], self.n_estimators), dtype=np.intp)
+        for start, n_rows, trees, leaves in self._tiles(X):
+            result[start:start + n_rows, trees] = leaves
+        return result
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities averaged over the trees, bit-identical to RandomForestClassifier."""
+        X = self._as_float32(X)
+        out = np.zeros((X.shape[0], self.n_classes_), dtype=np.float64)
+        for start, n_rows, trees, leaves in self._tiles(X):
+            total = out[start:start + n_rows]
+            # Trees are added one after another onto the running total, in the same
+            # order (and so with the same rounding) as sklearn's per-tree accumulation
+            if len(trees) == 1:
+                total += self.proba.take(leaves[:, 0], axis=0)
+            else:
+                stacked = np.concatenate([total[:, np.newaxis], self.proba.take(leaves, axis=0)], axis=1)
+                total[:] = np.cumsum(stacked, axis=1)[:, -1]
+        out /= self.n_estimators
+        return out
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def save_forest(model, path: str) -> str:
+    """
+    Write a fitted forest (or ArrayForest) to `path` in the mappable array format.
+
+    The file is written under a temporary name and renamed into place, so a model
+    registry watching the directory never sees a partial file.
+    """
+    forest = model if isinstance(model, ArrayForest) else ArrayForest.from_model(model)
+    names = getattr(forest, "feature_names_in_", None)
+    header = {
+        'format_version': FORMAT_VERSION,
+        'classes': forest.classes_.tolist(),
+        'classes_dtype': forest.classes_.dtype.str,
+        'feature_names': None if names is None else [str(name) for name in names],
+        'arrays': {},
+    }
+
+    offset = 0
+    for name, array in forest.arrays.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in forest.arrays.items():
+            f.seek(data_start + header['arrays'][name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_forest(path: str, mmap_mode: Optional[str] = 'r') -> ArrayForest:
+    """
+    Load a forest written by save_forest.
+    Args:
+        path (str): The .forest file.
+        mmap_mode (str): 'r' to map the node arrays read-only (shared between
+            processes), or None to read them into private memory.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a forest file")
+        (header_length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_length))
+    if header.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported forest format version: {header.get('format_version')}")
+
+    data_start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+        if mmap_mode:
+            arrays[name] = np.memmap(path, dtype=dtype, mode=mmap_mode, offset=data_start + spec['offset'], shape=shape)
+        else:
+            arrays[name] = np.fromfile(path, dtype=dtype, count=int(np.prod(shape)),
+                                       offset=data_start + spec['offset']).reshape(shape)
+
+    classes = np.asarray(header['classes'], dtype=np.dtype(header['classes_dtype']))
+    return ArrayForest(arrays, classes, header['feature_names'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a pickled RandomForest to the mappable .forest format.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert = subparsers.add_parser("convert", help="Write <model>.forest next to a pickled model")
+    convert.add_argument("model", help="Pickled model (.pkl)")
+    convert.add_argument("-o", "--output", help="Output file (default: model path with .forest suffix)")
+    args = parser.parse_args(argv)
+
+    import joblib
+
+    output = args.output or os.path.splitext(args.model)[0] + FOREST_SUFFIX
+    model = joblib.load(args.model)
+    save_forest(model, output)
+    forest = load_forest(output)
+    print(f"Wrote {forest.n_estimators} trees ({forest.node_count} nodes) to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+This module serves the app over ASGI, with the I/O-bound auth routes as coroutines.
+
+POST /login spends its time waiting on the identity provider to verify the
+form's ID token. Under a sync WSGI worker each login holds the worker (or one
+of its threads) for the whole round trip. Here it is handled on the event loop
+by AsyncIdentityService, so one worker keeps many verifications in flight at
+once; POST /register, which only updates the identity caches, runs there too.
+The handlers run inside a Flask request context and reuse the views' helpers in
+app.py, so the session cookie, flashes and Flask-Login state are exactly what
+the WSGI views produce.
+
+Every other request (pages, Dash callbacks, prediction and job APIs) goes to the
+Flask app through a2wsgi, which runs it on a pool of ASGI_WSGI_THREADS threads;
+CPU-bound scoring never runs on the event loop.
+
+    uvicorn asgi:application --app-dir src --host 0.0.0.0 --port 8050 --workers 2
+"""
+import io
+import os
+import logging
+from typing import Awaitable, Callable, Dict, Tuple
+
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import redirect, request
+from flask_login import current_user
+
+from app import complete_login, complete_registration, login_error, server
+from async_identity import close_async_identity_service, get_async_identity_service
+from identity import InvalidToken, get_identity_service
+
+logger = logging.getLogger(__name__)
+
+# Threads running the WSGI (non-async) requests of one worker
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "10"))
+
+wsgi_app = WSGIMiddleware(server, workers=ASGI_WSGI_THREADS)
+
+
+async def login():
+    if current_user.is_authenticated:
+        return redirect("/dashboard")
+    id_token = request.form.get("id_token")
+    try:
+        if not id_token:
+            raise InvalidToken("The login form has no ID token")
+        claims = await get_async_identity_service().verify_id_token(id_token)
+    except Exception as e:
+        return login_error(e)
+    return complete_login(claims)
+
+
+async def register():
+    if current_user.is_authenticated:
+        return redirect("/dashboard")
+    email = request.form.get("email")
+    if email:
+        # The sync service answers the WSGI-served routes (user loading, per-user
+        # models), so its cached "no such user" must go too
+        for service in (get_async_identity_service, get_identity_service):
+            try:
+                service().invalidate(email=email)
+            except Exception as e:
+                logger.warning(f"Identity cache not updated at registration: {str(e)}")
+    return complete_registration()
+
+
+# (method, path) -> coroutine view; everything else is served by the WSGI app
+ASYNC_ROUTES: Dict[Tuple[str, str], Callable[[], Awaitable]] = {
+    ("POST", "/login"): login,
+    ("POST", "/register"): register,
+}
+
+
+async def read_body(receive) -> bytes:
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            break
+    return bytes(body)
+
+
+async def serve_async_view(view, scope, receive, send) -> None:
+    """Run a coroutine view in a Flask request context, with the app's before/after request hooks."""
+    environ = build_environ(scope, io.BytesIO(await read_body(receive)))
+    # Flask's context lives in contextvars, which are per task, so it can be held across awaits
+    with server.request_context(environ):
+        try:
+            rv = server.preprocess_request()
+            if rv is None:
+                rv = await view()
+            response = server.process_response(server.make_response(rv))
+        except Exception as e:
+            response = server.make_response(server.handle_exception(e))
+    await send({
+        "type": "http.response.start",
+        "status": response.status_code,
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in response.headers.items()],
+    })
+    await send({"type": "http.response.body", "body": response.get_data()})
+
+
+async def lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await close_async_identity_service()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send) -> None:
+    """The ASGI entry point."""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] == "http":
+        view = ASYNC_ROUTES.get((scope["method"], scope["path"]))
+        if view is not None:
+            await serve_async_view(view, scope, receive, send)
+            return
+    await wsgi_app(scope, receive, send)
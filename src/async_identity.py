@@ -0,0 +1,270 @@
+"""
+This module is the asyncio counterpart of identity.IdentityService.
+
+AsyncIdentityService caches users exactly like IdentityService (both build on
+identity.IdentityCache), but its lookups are coroutines: a request waiting on
+the identity provider yields the event loop instead of holding a worker
+thread. Concurrent lookups of one key share a single task, and stale entries
+are refreshed in a background task.
+
+FirebaseRestBackend calls the Identity Toolkit REST API, the API behind the
+Firebase Admin SDK, over one pooled httpx.AsyncClient. The service account
+token is refreshed, and ID tokens are verified, in a thread, since google-auth
+only does blocking certificate fetches. Verified tokens are cached like in
+IdentityService. IDENTITY_BACKEND=fake selects AsyncFakeIdentityBackend.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Set, Tuple
+
+from identity import (FAKE_IDENTITY_LATENCY, FIREBASE_CREDENTIALS, IDENTITY_BACKEND, FakeIdentityBackend, Identity,
+                      IdentityCache, InvalidToken, UserNotFound, identity_toolkit_url)
+
+logger = logging.getLogger(__name__)
+
+# Connections kept open to the identity provider by one event loop
+ASYNC_IDENTITY_CONNECTIONS = int(os.getenv("ASYNC_IDENTITY_CONNECTIONS", "100"))
+IDENTITY_TIMEOUT = 30.0
+FIREBASE_SCOPES = [
+    "https://www.googleapis.com/auth/cloud-platform",
+    "https://www.googleapis.com/auth/identitytoolkit",
+]
+
+
+class FirebaseRestBackend:
+    """Identity Toolkit REST calls over a shared httpx.AsyncClient; every method is one request."""
+
+    def __init__(self, credentials_path: str = FIREBASE_CREDENTIALS, project_id: Optional[str] = None,
+                 max_connections: int = ASYNC_IDENTITY_CONNECTIONS):
+        import httpx
+        import requests
+        import cachecontrol
+        from google.auth.transport.requests import Request
+
+        self._credentials = None
+        if os.getenv("FIREBASE_AUTH_EMULATOR_HOST"):
+            # The emulator accepts any project and the "owner" token
+            self.project_id = project_id or os.getenv("FIREBASE_PROJECT_ID", "demo-project")
+        else:
+            from google.oauth2 import service_account
+
+            self._credentials = service_account.Credentials.from_service_account_file(
+                credentials_path, scopes=FIREBASE_SCOPES)
+            self.project_id = project_id or self._credentials.project_id
+        # Google's signing certificates, fetched again only when their Cache-Control expires
+        self._certificates = Request(cachecontrol.CacheControl(requests.Session()))
+        self._token_lock = asyncio.Lock()
+        self._client = httpx.AsyncClient(
+            base_url=identity_toolkit_url(), timeout=IDENTITY_TIMEOUT,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections))
+
+    async def _authorization(self) -> str:
+        if self._credentials is None:
+            return "Bearer owner"
+        if not self._credentials.valid:
+            async with self._token_lock:
+                if not self._credentials.valid:
+                    from google.auth.transport.requests import Request
+                    await asyncio.to_thread(self._credentials.refresh, Request())
+        return f"Bearer {self._credentials.token}"
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        response = await self._client.post(f"projects/{self.project_id}/{path}", json=payload,
+                                           headers={'Authorization': await self._authorization()})
+        body = response.json()
+        if response.status_code != 200:
+            message = (body.get('error') or {}).get('message', 'error')
+            raise RuntimeError(f"Identity Toolkit {path} failed ({response.status_code} {message})")
+        return body
+
+    @staticmethod
+    def _identity(record: dict) -> Identity:
+        return Identity(record['localId'], record.get('email'), record.get('displayName'),
+                        bool(record.get('emailVerified')))
+
+    async def _lookup(self, field: str, value: str) -> Identity:
+        users = (await self._post("accounts:lookup", {field: [value]})).get('users')
+        if not users:
+            raise UserNotFound(value)
+        return self._identity(users[0])
+
+    async def get_user(self, uid: str) -> Identity:
+        return await self._lookup('localId', uid)
+
+    async def get_user_by_email(self, email: str) -> Identity:
+        return await self._lookup('email', email)
+
+    async def create_user(self, email: str, display_name: Optional[str] = None,
+                          email_verified: bool = False) -> Identity:
+        payload = {'email': email, 'emailVerified': email_verified}
+        if display_name:
+            payload['displayName'] = display_name
+        record = await self._post("accounts", payload)
+        return Identity(record['localId'], record.get('email', email), record.get('displayName', display_name),
+                        email_verified)
+
+    def _verify(self, token: str) -> dict:
+        from google.auth import exceptions, jwt
+        from google.oauth2 import id_token
+
+        try:
+            if self._credentials is None:
+                # The emulator's tokens are unsigned, so only their claims are checked
+                claims = jwt.decode(token, verify=False)
+                if float(claims.get('exp', 0)) <= time.time():
+                    raise ValueError("Token expired")
+            else:
+                claims = id_token.verify_firebase_token(token, self._certificates, audience=self.project_id)
+        except (ValueError, exceptions.GoogleAuthError) as e:
+            raise InvalidToken(str(e))
+        if claims.get('iss') != f"https://securetoken.google.com/{self.project_id}" or not claims.get('sub'):
+            raise InvalidToken("Token was not issued for this project")
+        return dict(claims, uid=claims['sub'])
+
+    async def verify_id_token(self, token: str) -> dict:
+        return await asyncio.to_thread(self._verify, token)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class AsyncFakeIdentityBackend:
+    """FakeIdentityBackend with coroutine methods; each call awaits `latency` seconds instead of sleeping."""
+
+    def __init__(self, latency: float = 0.0, directory: Optional[FakeIdentityBackend] = None):
+        self.latency = latency
+        # The users and call counts live in a latency-free FakeIdentityBackend
+        self.directory = directory or FakeIdentityBackend()
+
+    async def _wait(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_user(self, uid: str) -> Identity:
+        await self._wait()
+        return self.directory.get_user(uid)
+
+    async def get_user_by_email(self, email: str) -> Identity:
+        await self._wait()
+        return self.directory.get_user_by_email(email)
+
+    async def create_user(self, email: str, display_name: Optional[str] = None,
+                          email_verified: bool = False) -> Identity:
+        await self._wait()
+        return self.directory.create_user(email, display_name=display_name, email_verified=email_verified)
+
+    async def verify_id_token(self, token: str) -> dict:
+        await self._wait()
+        return self.directory.verify_id_token(token)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class AsyncIdentityService(IdentityCache):
+    """Cached user lookups in front of an async identity backend; use from one event loop."""
+
+    def __init__(self, backend, **kwargs):
+        super().__init__(backend, **kwargs)
+        # One remote lookup per key at a time; other callers await the same task
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        # Background refreshes, referenced until they finish
+        self._refreshes: Set[asyncio.Task] = set()
+
+    async def _fetch(self, key: Tuple[str, str]) -> Optional[Identity]:
+        kind, value = key
+        self._count('remote_calls')
+        try:
+            if kind == 'uid':
+                identity = await self.backend.get_user(value)
+            else:
+                identity = await self.backend.get_user_by_email(value)
+        except UserNotFound:
+            identity = None
+        self._store(key, identity)
+        return identity
+
+    async def _refresh(self, key: Tuple[str, str]) -> None:
+        try:
+            await self._fetch(key)
+        except Exception as e:
+            self._refresh_done(key, e)
+        else:
+            self._refresh_done(key, None)
+
+    def _schedule_refresh(self, key: Tuple[str, str]) -> None:
+        task = asyncio.get_running_loop().create_task(self._refresh(key))
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def _lookup(self, kind: str, value: str) -> Optional[Identity]:
+        key = self._key(kind, value)
+        with self._lock:
+            cached, identity = self._cached(key)
+        if cached:
+            return identity
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._fetch(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A caller that goes away (client disconnect) must not cancel the lookup others wait on
+        return await asyncio.shield(task)
+
+    async def get_user(self, uid: str) -> Optional[Identity]:
+        """The user with this uid, or None if there is none."""
+        return await self._lookup('uid', uid)
+
+    async def get_user_by_email(self, email: str) -> Optional[Identity]:
+        """The user with this email (case-insensitive), or None if there is none."""
+        return await self._lookup('email', email)
+
+    async def create_user(self, email: str, display_name: Optional[str] = None,
+                          email_verified: bool = False) -> Identity:
+        """Create a user and cache it, replacing any cached "not found" for its email."""
+        self._count('remote_calls')
+        identity = await self.backend.create_user(email, display_name=display_name, email_verified=email_verified)
+        self._store(self._key('uid', identity.uid), identity)
+        return identity
+
+    async def verify_id_token(self, token: str) -> dict:
+        """Claims of a valid ID token, cached like IdentityService's; raises InvalidToken otherwise."""
+        key = self._token_key(token)
+        claims = self._cached_claims(key)
+        if claims is None:
+            self._count('remote_calls')
+            claims = await self.backend.verify_id_token(token)
+            self._store_claims(key, claims)
+        return claims
+
+    async def aclose(self) -> None:
+        """Wait for background refreshes and close the backend's connections."""
+        if self._refreshes:
+            await asyncio.gather(*self._refreshes, return_exceptions=True)
+        await self.backend.aclose()
+
+
+_default_service: Optional[AsyncIdentityService] = None
+
+
+def get_async_identity_service() -> AsyncIdentityService:
+    """Process-wide async identity service with the backend chosen by IDENTITY_BACKEND."""
+    global _default_service
+    if _default_service is None:
+        if IDENTITY_BACKEND == "fake":
+            backend = AsyncFakeIdentityBackend(latency=FAKE_IDENTITY_LATENCY)
+        else:
+            backend = FirebaseRestBackend()
+        _default_service = AsyncIdentityService(backend)
+        logger.info(f"Async identity lookups cached in front of {type(backend).__name__}")
+    return _default_service
+
+
+async def close_async_identity_service() -> None:
+    """Close the process-wide service, if one was created (on ASGI lifespan shutdown)."""
+    global _default_service
+    if _default_service is not None:
+        await _default_service.aclose()
+        _default_service = None
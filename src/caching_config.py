@@ -1,27 +1,46 @@
 """
 This module configures caching for the application.
+
+The profile is picked from the APP_ENV environment variable:
+- development (default): templates reload on change, static files are never cached
+  and no bytecode is written, so edits show up immediately.
+- production: templates are compiled once (with a Jinja bytecode cache on disk),
+  static files are served with long-lived cache headers behind fingerprinted URLs,
+  Python bytecode is cached and GET responses carry ETags.
 """
+import os
+import sys
+import hashlib
+import logging
+import tempfile
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILES = ('development', 'production')
+DEFAULT_PROFILE = 'development'
+
+# Fingerprinted static URLs change whenever the file does, so they can be cached for a year
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+TEMPLATE_BYTECODE_DIR = os.getenv(
+    "TEMPLATE_BYTECODE_CACHE", os.path.join(tempfile.gettempdir(), "outbreak-jinja-cache")
+)
+
+
+def get_profile(name: Optional[str] = None) -> str:
+    """Resolve the caching profile from the argument or the APP_ENV environment variable."""
+    profile = (name or os.getenv("APP_ENV") or DEFAULT_PROFILE).strip().lower()
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown APP_ENV profile: {profile!r} (expected one of {', '.join(PROFILES)})")
+    return profile
+
 
 def disable_caches():
     """Disable all caching mechanisms in the app."""
-    import sys
-    
-    # Force reload all modules
-    for module in list(sys.modules.keys()):
-        if module not in sys.builtin_module_names and not module.startswith('_'):
-            try:
-                if sys.modules[module]:
-                    try:
-                        if hasattr(sys.modules[module], '__cached__'):
-                            del sys.modules[module].__cached__
-                    except (AttributeError, TypeError):
-                        pass
-            except KeyError:
-                pass
-    
-    # Disable Python's import cache
+    # Don't leave stale .pyc files behind while editing
     sys.dont_write_bytecode = True
-    
+
     return {
         'SEND_FILE_MAX_AGE_DEFAULT': 0,
         'TEMPLATES_AUTO_RELOAD': True,
@@ -29,4 +48,86 @@ def disable_caches():
         'ENV': 'development',
         'EXPLAIN_TEMPLATE_LOADING': True,
         'TESTING': True,  # This disables some internal caching
-    } 
\ No newline at end of file
+    }
+
+
+def production_caches():
+    """Enable template, static file and bytecode caching."""
+    sys.dont_write_bytecode = False
+
+    return {
+        'SEND_FILE_MAX_AGE_DEFAULT': STATIC_MAX_AGE,
+        'TEMPLATES_AUTO_RELOAD': False,
+        'DEBUG': False,
+        'ENV': 'production',
+        'EXPLAIN_TEMPLATE_LOADING': False,
+        'TESTING': False,
+    }
+
+
+def _file_fingerprint(path: str, cache: Dict[str, str]) -> Optional[str]:
+    if path not in cache:
+        try:
+            with open(path, 'rb') as f:
+                cache[path] = hashlib.md5(f.read()).hexdigest()[:12]
+        except OSError:
+            return None
+    return cache[path]
+
+
+def _install_static_fingerprints(server) -> None:
+    """Add ?v=<content hash> to url_for('static', ...) so cached assets are busted on change."""
+    fingerprints: Dict[str, str] = {}
+
+    @server.url_defaults
+    def _fingerprint_static(endpoint, values):
+        if endpoint != 'static' or 'v' in values or not server.static_folder:
+            return
+        filename = values.get('filename')
+        if filename:
+            fingerprint = _file_fingerprint(os.path.join(server.static_folder, filename), fingerprints)
+            if fingerprint:
+                values['v'] = fingerprint
+
+
+def _install_etags(server) -> None:
+    """Tag successful GET responses so clients can revalidate with If-None-Match."""
+    from flask import request
+
+    @server.after_request
+    def _add_etag(response):
+        if (request.method in ('GET', 'HEAD') and response.status_code == 200
+                and not response.direct_passthrough and not response.is_streamed
+                and 'ETag' not in response.headers):
+            response.add_etag()
+            response.make_conditional(request)
+        return response
+
+
+def configure_caching(server, profile: Optional[str] = None) -> str:
+    """
+    Apply a caching profile to a Flask server.
+    Args:
+        server (Flask): The Flask application; must not have rendered a template yet.
+        profile (str): 'development' or 'production'; read from APP_ENV if omitted.
+    Returns:
+        str: The profile that was applied.
+    """
+    profile = get_profile(profile)
+    if profile == 'production':
+        from jinja2 import FileSystemBytecodeCache
+
+        server.config.update(production_caches())
+        os.makedirs(TEMPLATE_BYTECODE_DIR, exist_ok=True)
+        server.jinja_options = {
+            **server.jinja_options,
+            'bytecode_cache': FileSystemBytecodeCache(TEMPLATE_BYTECODE_DIR),
+            'auto_reload': False,
+        }
+        _install_static_fingerprints(server)
+        _install_etags(server)
+    else:
+        server.config.update(disable_caches())
+
+    logger.info(f"Using the {profile} caching profile")
+    return profile
@@ -1,13 +1,17 @@
 import dash
 from dash import dcc, html, Input, Output, State
 import dash_bootstrap_components as dbc
-import joblib
 import pandas as pd
 from dash.exceptions import PreventUpdate
-from flask_caching import Cache
 import plotly.graph_objs as go
 import plotly.express as px
 
+from model_registry import get_registry
+from prediction_cache import PredictionCache
+from trends import NATIONAL, TrendStore
+
+FEATURES = ['NewCases', 'Humidity_x', 'PopulationDensity', 'Temperature', 'Rainfall']
+
 # Initialize Dash app with Bootstrap theme
 app = dash.Dash(
     __name__,
@@ -15,16 +19,24 @@ app = dash.Dash(
     meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}]
 )
 
-# Initialize cache
-cache = Cache(app.server, config={'CACHE_TYPE': 'filesystem', 'CACHE_DIR': 'cache'})
+# In-memory cache of model outputs, keyed on the quantized inputs only
+prediction_cache = PredictionCache(FEATURES)
+
+# The model is loaded by the registry on the first prediction
+trend_store = TrendStore()
 
-# Load model and data
-try:
-    model = joblib.load('../models/outbreak_model.pkl')
-    data = pd.read_csv('../data/processed/merged_data.csv')
-except FileNotFoundError as e:
-    print(f"Error loading files: {e}")
-    raise PreventUpdate
+def recent_trend_figure():
+    """Daily national case totals from the precomputed trend aggregates; empty before any data."""
+    recent_trend = trend_store.lookup(NATIONAL, days=30)
+    return px.line(
+        recent_trend,
+        x='Date',
+        y='cases',
+        title='Recent Disease Cases Trend'
+    ).update_layout(
+        plot_bgcolor='white',
+        paper_bgcolor='white'
+    )
 
 # Custom CSS
 app.index_string = '''
@@ -98,127 +110,129 @@ app.index_string = '''
 '''
 
 # App layout
-app.layout = dbc.Container([
-    dbc.Row([
-        dbc.Col([
-            html.H1(
-                "Disease Outbreak Prediction Dashboard",
-                className="text-center mb-4 mt-4",
-                style={'color': '#2c3e50', 'font-weight': '600'}
-            )
-        ])
-    ]),
+def serve_layout():
+    """Built per page load, so the trend chart shows the current aggregates."""
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col([
+                html.H1(
+                    "Disease Outbreak Prediction Dashboard",
+                    className="text-center mb-4 mt-4",
+                    style={'color': '#2c3e50', 'font-weight': '600'}
+                )
+            ])
+        ]),
     
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H4("Input Parameters", className="card-title mb-4"),
-                    dbc.Row([
-                        dbc.Col([
-                            dbc.Label("New Cases", html_for="new-cases"),
-                            dbc.Input(
-                                id="new-cases",
-                                type="number",
-                                value=120,
-                                className="custom-input mb-3"
-                            )
-                        ], md=6),
-                        dbc.Col([
-                            dbc.Label("Humidity (%)", html_for="humidity"),
-                            dbc.Input(
-                                id="humidity",
-                                type="number",
-                                value=85,
-                                className="custom-input mb-3"
-                            )
-                        ], md=6)
-                    ]),
-                    dbc.Row([
-                        dbc.Col([
-                            dbc.Label("Temperature (°C)", html_for="temperature"),
-                            dbc.Input(
-                                id="temperature",
-                                type="number",
-                                value=28,
-                                className="custom-input mb-3"
-                            )
-                        ], md=6),
-                        dbc.Col([
-                            dbc.Label("Rainfall (mm)", html_for="rainfall"),
-                            dbc.Input(
-                                id="rainfall",
-                                type="number",
-                                value=12.5,
-                                className="custom-input mb-3"
-                            )
-                        ], md=6)
-                    ]),
-                    dbc.Row([
-                        dbc.Col([
-                            dbc.Label("Population Density", html_for="population-density"),
-                            dbc.Input(
-                                id="population-density",
-                                type="number",
-                                value=20000,
-                                className="custom-input mb-4"
-                            )
-                        ])
-                    ]),
-                    dbc.Row([
-                        dbc.Col([
-                            dbc.Button(
-                                "Predict Outbreak Risk",
-                                id="predict-button",
-                                className="predict-button w-100"
-                            )
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Input Parameters", className="card-title mb-4"),
+                        dbc.Row([
+                            dbc.Col([
+                                dbc.Label("New Cases", html_for="new-cases"),
+                                dbc.Input(
+                                    id="new-cases",
+                                    type="number",
+                                    value=120,
+                                    className="custom-input mb-3"
+                                )
+                            ], md=6),
+                            dbc.Col([
+                                dbc.Label("Humidity (%)", html_for="humidity"),
+                                dbc.Input(
+                                    id="humidity",
+                                    type="number",
+                                    value=85,
+                                    className="custom-input mb-3"
+                                )
+                            ], md=6)
+                        ]),
+                        dbc.Row([
+                            dbc.Col([
+                                dbc.Label("Temperature (°C)", html_for="temperature"),
+                                dbc.Input(
+                                    id="temperature",
+                                    type="number",
+                                    value=28,
+                                    className="custom-input mb-3"
+                                )
+                            ], md=6),
+                            dbc.Col([
+                                dbc.Label("Rainfall (mm)", html_for="rainfall"),
+                                dbc.Input(
+                                    id="rainfall",
+                                    type="number",
+                                    value=12.5,
+                                    className="custom-input mb-3"
+                                )
+                            ], md=6)
+                        ]),
+                        dbc.Row([
+                            dbc.Col([
+                                dbc.Label("Population Density", html_for="population-density"),
+                                dbc.Input(
+                                    id="population-density",
+                                    type="number",
+                                    value=20000,
+                                    className="custom-input mb-4"
+                                )
+                            ])
+                        ]),
+                        dbc.Row([
+                            dbc.Col([
+                                dbc.Button(
+                                    "Predict Outbreak Risk",
+                                    id="predict-button",
+                                    className="predict-button w-100"
+                                )
+                            ])
                         ])
                     ])
-                ])
-            ], className="input-card mb-4")
-        ], md=6),
+                ], className="input-card mb-4")
+            ], md=6),
         
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H4("Prediction Results", className="card-title mb-4"),
-                    html.Div([
-                        html.H3(
-                            id="prediction-output",
-                            className="text-center mb-4"
-                        ),
-                        dcc.Graph(
-                            id="prediction-graph",
-                            config={'displayModeBar': False}
-                        )
-                    ], className="prediction-results")
-                ])
-            ], className="prediction-card")
-        ], md=6)
-    ]),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Prediction Results", className="card-title mb-4"),
+                        html.Div([
+                            html.H3(
+                                id="prediction-output",
+                                className="text-center mb-4"
+                            ),
+                            dcc.Graph(
+                                id="prediction-graph",
+                                config={'displayModeBar': False}
+                            )
+                        ], className="prediction-results")
+                    ])
+                ], className="prediction-card")
+            ], md=6)
+        ]),
     
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H4("Historical Data Trends", className="card-title mb-4"),
-                    dcc.Graph(
-                        id="historical-trend",
-                        figure=px.line(
-                            data.tail(30),
-                            x=data.index[-30:],
-                            y='NewCases',
-                            title='Recent Disease Cases Trend'
-                        ).update_layout(
-                            plot_bgcolor='white',
-                            paper_bgcolor='white'
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Historical Data Trends", className="card-title mb-4"),
+                        dcc.Graph(
+                            id="historical-trend",
+                            figure=recent_trend_figure()
                         )
-                    )
-                ])
-            ], className="mb-4")
+                    ])
+                ], className="mb-4")
+            ])
         ])
-    ])
-], fluid=True, className="px-4")
+    ], fluid=True, className="px-4")
+
+app.layout = serve_layout
+
+def score_features(model, features):
+    input_df = pd.DataFrame([features], columns=FEATURES)
+    prediction = model.predict(input_df)[0]
+    prediction_proba = model.predict_proba(input_df)[0]
+    return prediction, prediction_proba
 
 @app.callback(
     [Output('prediction-output', 'children'),
@@ -232,23 +246,17 @@ app.layout = dbc.Container([
      State('rainfall', 'value')],
     prevent_initial_call=True
 )
-@cache.memoize(timeout=300)
 def predict_outbreak(n_clicks, new_cases, humidity, population_density, temperature, rainfall):
     if None in [new_cases, humidity, population_density, temperature, rainfall]:
         raise PreventUpdate
     
-    input_data = {
-        'NewCases': new_cases,
-        'Humidity_x': humidity,
-        'PopulationDensity': population_density,
-        'Temperature': temperature,
-        'Rainfall': rainfall
-    }
-    input_df = pd.DataFrame([input_data])
-    
     try:
-        prediction = model.predict(input_df)[0]
-        prediction_proba = model.predict_proba(input_df)[0]
+        active = get_registry().current()
+        prediction, prediction_proba = prediction_cache.get_or_compute(
+            [new_cases, humidity, population_density, temperature, rainfall],
+            lambda features: score_features(active.model, features),
+            version=active.version
+        )
         
         # Create gauge chart for risk probability
         fig = go.Figure(go.Indicator(
@@ -283,7 +291,7 @@ def predict_outbreak(n_clicks, new_cases, humidity, population_density, temperat
         }
         
         result_text = "High Risk" if prediction == 1 else "Low Risk"
-        return f"Prediction: {result_text}", fig, style
+        return f"Prediction: {result_text} (model {active.version})", fig, style
         
     except Exception as e:
         return f"Error: {str(e)}", {}, {'color': 'red'}
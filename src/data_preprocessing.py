@@ -1,22 +1,305 @@
+import io
+import os
+import json
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 
-def preprocess_health_data():
-    # Load mock data instead of covid_global.csv
-    health_data = pd.read_csv('data/raw/health/mock_outbreak_data.csv')
-    climate_data = pd.read_csv('data/raw/climate/mock_climate_data.csv')
+from storage import dataset_exists, write_processed
+from trends import build_trend_aggregates, update_trend_aggregates
 
-    # Merge datasets on 'Region' and 'Date'
-    merged_data = pd.merge(
+logger = logging.getLogger(__name__)
+
+HEALTH_PATH = 'data/raw/health/mock_outbreak_data.csv'
+CLIMATE_PATH = 'data/raw/climate/mock_climate_data.csv'
+PROCESSED_PATH = 'data/processed/merged_data.csv'
+
+# Per-region high-water marks and raw file read positions for incremental runs
+STATE_PATH = 'data/processed/merge_state.json'
+
+MERGE_KEYS = ['Region', 'Date']
+
+def merge_health_climate(health_data, climate_data, tolerance=None, workers=1):
+    """
+    Inner-join health and climate rows on 'Region' and 'Date'.
+
+    Exact matches are a plain pd.merge. With a tolerance each health row is joined to
+    the nearest climate reading instead; see merge_sorted.
+    """
+    if tolerance is not None:
+        return merge_sorted(health_data, climate_data, tolerance, workers=workers)
+    return pd.merge(
         health_data,
         climate_data,
-        on=['Region', 'Date'],
+        on=MERGE_KEYS,
         how='inner'
     )
-    
-    # Save processed data
-    merged_data.to_csv('data/processed/merged_data.csv', index=False)
-    return merged_data
+
+def _parse_dates(dates):
+    """Date column as int64 nanoseconds, parsing each distinct string once."""
+    if pd.api.types.is_datetime64_dtype(dates):
+        return dates.to_numpy(dtype='datetime64[ns]').view('i8')
+    codes, uniques = pd.factorize(dates)
+    parsed = pd.to_datetime(uniques, format='ISO8601').to_numpy(dtype='datetime64[ns]').view('i8')
+    return parsed[codes]
+
+def _encode_regions(health_regions, climate_regions):
+    """Integer codes for Region shared by both sides, plus the region names."""
+    health_codes, regions = pd.factorize(health_regions)
+    climate_codes, climate_uniques = pd.factorize(climate_regions)
+    # Plain object indexes: a categorical column factorizes to Categorical uniques
+    regions, climate_uniques = pd.Index(np.asarray(regions)), pd.Index(np.asarray(climate_uniques))
+    regions = regions.append(climate_uniques.difference(regions, sort=False))
+    climate_codes = regions.get_indexer(climate_uniques)[climate_codes]
+    return health_codes, climate_codes, regions
+
+def _group_by_region(codes, dates, n_regions):
+    """
+    Order rows by region, then date.
+    Returns:
+        tuple: (row order, dates in that order, start offset of each region).
+    """
+    # Stable radix sort on small integer codes keeps each region's rows in file order,
+    # which is already date order for the raw files
+    order = np.argsort(codes.astype(np.int16 if n_regions < 2 ** 15 else np.int64), kind='stable')
+    sorted_codes, sorted_dates = codes[order], dates[order]
+    if np.any((np.diff(sorted_dates) < 0) & (np.diff(sorted_codes) == 0)):
+        order = np.lexsort((dates, codes))
+        sorted_codes, sorted_dates = codes[order], dates[order]
+    bounds = np.searchsorted(sorted_codes, np.arange(n_regions + 1))
+    return order, sorted_dates, bounds
+
+def _join_positions(health_dates, climate_dates, tolerance):
+    """Match one region's sorted dates; returns (health positions, climate positions)."""
+    if not len(health_dates) or not len(climate_dates):
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    # Nearest reading within the tolerance, preferring the earlier one on ties
+    position = np.searchsorted(climate_dates, health_dates)
+    before = np.maximum(position - 1, 0)
+    after = np.minimum(position, len(climate_dates) - 1)
+    gap_before = np.abs(health_dates - climate_dates[before])
+    gap_after = np.abs(climate_dates[after] - health_dates)
+    candidate = np.where(gap_before <= gap_after, before, after)
+    matched = np.minimum(gap_before, gap_after) <= tolerance
+    return np.flatnonzero(matched), candidate[matched]
+
+def merge_sorted(health_data, climate_data, tolerance, workers=1):
+    """
+    Join each health row to the nearest climate reading of its region within a tolerance.
+
+    A sorted merge-join per region, for misaligned sensor timestamps. The columns are
+    those of merge_health_climate, in health row order, with Date parsed to datetime64
+    and Region as a categorical.
+    Args:
+        health_data (pd.DataFrame): Raw health rows.
+        climate_data (pd.DataFrame): Raw climate rows.
+        tolerance: Largest distance between matched dates, e.g. '12h'.
+        workers (int): Threads used to join regions in parallel.
+    Returns:
+        pd.DataFrame: The merged rows.
+    """
+    health_codes, climate_codes, regions = _encode_regions(health_data['Region'], climate_data['Region'])
+    health_dates = _parse_dates(health_data['Date'])
+    climate_dates = _parse_dates(climate_data['Date'])
+    tolerance = pd.Timedelta(tolerance).value
+
+    n_regions = len(regions)
+    health_order, health_sorted, health_bounds = _group_by_region(health_codes, health_dates, n_regions)
+    climate_order, climate_sorted, climate_bounds = _group_by_region(climate_codes, climate_dates, n_regions)
+
+    def join_regions(codes):
+        pairs = []
+        for code in codes:
+            h0, h1 = health_bounds[code], health_bounds[code + 1]
+            c0, c1 = climate_bounds[code], climate_bounds[code + 1]
+            left, right = _join_positions(health_sorted[h0:h1], climate_sorted[c0:c1], tolerance)
+            pairs.append((health_order[left + h0], climate_order[right + c0]))
+        return pairs
+
+    if workers > 1 and n_regions > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            batches = executor.map(join_regions, np.array_split(np.arange(n_regions), workers))
+            pairs = [pair for batch in batches for pair in batch]
+    else:
+        pairs = join_regions(range(n_regions))
+
+    # Each health row matches at most once, so scattering the matches back by
+    # row number restores health row order
+    match = np.full(len(health_data), -1, dtype=np.intp)
+    for left, right in pairs:
+        match[left] = right
+    left = np.flatnonzero(match >= 0)
+    right = match[left]
+
+    value_columns = [c for c in climate_data.columns if c not in MERGE_KEYS]
+    overlap = set(value_columns) & set(health_data.columns)
+    merged = health_data.take(left).rename(columns={c: f"{c}_x" for c in overlap}).reset_index(drop=True)
+    merged['Region'] = pd.Categorical.from_codes(health_codes[left], categories=regions)
+    merged['Date'] = health_dates[left].view('datetime64[ns]')
+    for column in value_columns:
+        name = f"{column}_y" if column in overlap else column
+        merged[name] = climate_data[column].to_numpy()[right]
+    return merged
+
+def _read_new_rows(path, offset):
+    """
+    Read the rows appended to a raw CSV after a byte offset.
+    Returns:
+        tuple: (rows with a '_offset' column holding each line's byte offset,
+                header line, offset just past the last complete line).
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        start = max(offset, len(header))
+        f.seek(start)
+        data = f.read()
+
+    # A partially written last line is left for the next run
+    data = data[:data.rfind(b'\n') + 1]
+    end = start + len(data)
+
+    newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n'))
+    line_starts = np.concatenate(([0], newlines[:-1] + 1)) if len(newlines) else newlines
+    # read_csv skips blank lines, so their offsets have to be dropped as well
+    blank = (newlines - line_starts == 0) | ((newlines - line_starts == 1) & (
+        np.frombuffer(data, dtype=np.uint8)[np.maximum(newlines - 1, 0)] == ord('\r')))
+    line_starts = line_starts[~blank]
+
+    rows = pd.read_csv(io.BytesIO(header + data))
+    rows['_offset'] = start + line_starts
+    return rows, header.decode('utf-8').strip(), end
+
+def _load_state():
+    if not os.path.exists(STATE_PATH) or not os.path.exists(PROCESSED_PATH):
+        return None
+    if not dataset_exists():
+        # Appending only the new rows would leave the store missing everything merged before
+        logger.warning(f"Ignoring merge state {STATE_PATH}: the processed dataset is missing, rebuilding it")
+        return None
+    try:
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable merge state {STATE_PATH}: {e}")
+        return None
+
+def _raw_file_rewritten(state, name, path):
+    """A raw file that shrank or changed its header was rewritten rather than appended to."""
+    with open(path, 'rb') as f:
+        header = f.readline().decode('utf-8').strip()
+    return os.path.getsize(path) < state['offsets'][name] or header != state['headers'][name]
+
+def _latest_date(dates, stored):
+    candidates = [d for d in (dates.max(), pd.Timestamp(stored) if stored else pd.NaT) if pd.notna(d)]
+    return max(candidates) if candidates else pd.NaT
+
+def _not_yet_merged(rows, high_water_marks):
+    """Keep rows dated after their region's high-water mark."""
+    marks = pd.to_datetime(rows['Region'].map(high_water_marks))
+    return rows[marks.isna() | (rows['_date'] > marks)]
+
+def preprocess_health_data(full_rebuild=False, tolerance=None, workers=1):
+    """
+    Merge new raw health and climate rows into the processed dataset.
+
+    Only rows appended to the raw CSVs since the last run are read. Rows dated at or
+    before their region's high-water mark are skipped, and the newly merged rows are
+    appended to PROCESSED_PATH. Rows whose counterpart in the other file has not
+    arrived yet are re-read on the next run.
+    Args:
+        full_rebuild (bool): Re-read both raw files from the start and rewrite the
+            processed dataset, e.g. after backfilling older dates.
+        tolerance: Join each health row to the nearest climate reading within this
+            distance instead of the same date; see merge_sorted.
+        workers (int): Threads used to join regions in parallel when a tolerance is set.
+    Returns:
+        pd.DataFrame: The merged rows written by this run.
+    """
+    state = None if full_rebuild else _load_state()
+    if state is not None and (_raw_file_rewritten(state, 'health', HEALTH_PATH) or
+                              _raw_file_rewritten(state, 'climate', CLIMATE_PATH)):
+        logger.info("Raw data was rewritten; rebuilding the processed dataset")
+        state = None
+    incremental = state is not None
+    if not incremental:
+        state = {'offsets': {'health': 0, 'climate': 0}, 'max_dates': {}, 'high_water_marks': {}}
+
+    health_data, health_header, health_end = _read_new_rows(HEALTH_PATH, state['offsets']['health'])
+    climate_data, climate_header, climate_end = _read_new_rows(CLIMATE_PATH, state['offsets']['climate'])
+
+    for rows in (health_data, climate_data):
+        rows['_date'] = pd.to_datetime(rows['Date'])
+    health_max = _latest_date(health_data['_date'], state['max_dates'].get('health'))
+    climate_max = _latest_date(climate_data['_date'], state['max_dates'].get('climate'))
+
+    high_water_marks = state['high_water_marks']
+    new_health = _not_yet_merged(health_data, high_water_marks)
+    new_climate = _not_yet_merged(climate_data, high_water_marks)
+    skipped = len(health_data) - len(new_health)
+    if incremental and skipped:
+        logger.info(f"Skipped {skipped} health rows at or before their region's high-water mark; "
+                    "use full_rebuild=True to backfill older dates")
+
+    # Merge datasets on 'Region' and 'Date'
+    merged = merge_health_climate(
+        new_health.drop(columns='_date').rename(columns={'_offset': '_health_offset'}),
+        new_climate.drop(columns='_date').rename(columns={'_offset': '_climate_offset'}),
+        tolerance=tolerance,
+        workers=workers
+    )
+    merged['Date'] = pd.to_datetime(merged['Date'])
+
+    # Unmatched rows dated on or after the other file's latest date may still get a
+    # counterpart, so the next run resumes reading at the first of them.
+    offsets = {}
+    for name, rows, matched, other_max, end in (
+        ('health', new_health, merged['_health_offset'], climate_max, health_end),
+        ('climate', new_climate, merged['_climate_offset'], health_max, climate_end),
+    ):
+        pending = rows[~rows['_offset'].isin(matched)]
+        if pd.notna(other_max):
+            pending = pending[pending['_date'] >= other_max]
+        offsets[name] = int(pending['_offset'].min()) if len(pending) else end
+
+    for region, last_date in merged['Date'].groupby(merged['Region'], observed=True).max().items():
+        high_water_marks[region] = last_date.strftime('%Y-%m-%d')
+    merged = merged.drop(columns=['_health_offset', '_climate_offset'])
+
+    # Save processed data to the Parquet store, keeping the CSV export in step
+    write_processed(merged, append=incremental)
+    if incremental:
+        update_trend_aggregates(merged)
+    else:
+        build_trend_aggregates(merged)
+    if incremental:
+        merged.to_csv(PROCESSED_PATH, mode='a', header=False, index=False)
+    else:
+        merged.to_csv(PROCESSED_PATH, index=False)
+
+    state = {
+        'offsets': offsets,
+        'headers': {'health': health_header, 'climate': climate_header},
+        'max_dates': {
+            name: value.strftime('%Y-%m-%d')
+            for name, value in (('health', health_max), ('climate', climate_max)) if pd.notna(value)
+        },
+        'high_water_marks': high_water_marks,
+    }
+    with open(STATE_PATH, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+    logger.info(f"{'Appended' if incremental else 'Wrote'} {len(merged)} merged rows to {PROCESSED_PATH}")
+    return merged
 
 if __name__ == "__main__":
-    preprocess_health_data()
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Merge raw health and climate data into the processed dataset.")
+    parser.add_argument("--full-rebuild", action="store_true",
+                        help="Re-read all raw data and rewrite the processed dataset (for backfills)")
+    parser.add_argument("--tolerance", help="Match climate readings within this distance, e.g. '12h'")
+    parser.add_argument("--workers", type=int, default=1, help="Threads used to join regions in parallel (with --tolerance)")
+    args = parser.parse_args()
+    preprocess_health_data(full_rebuild=args.full_rebuild, tolerance=args.tolerance, workers=args.workers)
@@ -0,0 +1,370 @@
+"""
+This module builds the dashboard's risk gauge and trend chart from cached templates.
+
+Everything about the figures that does not depend on the request (layout, fonts,
+colors, shapes, trace styles) is built once with Plotly and kept as a plain
+figure dict. A request only supplies the values that change, either:
+
+- as a full figure: the template with those values filled in (copying only the
+  containers on the way to them), or
+- as a Dash Patch holding just those values, for a graph already on the page.
+
+Both paths share one list of (path, value) updates per figure, so they always
+render the same figure.
+"""
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+from dash import Patch, dcc
+from plotly.subplots import make_subplots
+
+GAUGE_THRESHOLD = 70
+PROJECTION_DAYS = 7
+
+GAUGE_CONFIG = {'displayModeBar': False}
+TREND_CONFIG = {
+    'displayModeBar': True,
+    'displaylogo': False,
+    'modeBarButtonsToRemove': ['lasso2d', 'select2d']
+}
+
+FONT_FAMILY = "'Poppins', sans-serif"
+
+
+def risk_band(risk_probability: float) -> Tuple[str, str]:
+    """Gauge label and color for a probability."""
+    if risk_probability < 0.3:
+        return "LOW", "#10B981"
+    if risk_probability < 0.7:
+        return "MODERATE", "#F59E0B"
+    return "CRITICAL", "#EF4444"
+
+
+def build_risk_gauge(risk_probability: float) -> go.Figure:
+    """The risk gauge built from scratch with Plotly (used for the template)."""
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number+delta",
+        value=risk_probability * 100,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        delta={'reference': GAUGE_THRESHOLD, 'increasing': {'color': "#EF4444"}, 'decreasing': {'color': "#10B981"}},
+        gauge={
+            'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "#E5E7EB", 'visible': True},
+            'bar': {'color': "rgba(255, 255, 255, 0)"},
+            'bgcolor': "#F9FAFB",
+            'borderwidth': 2,
+            'bordercolor': "#E5E7EB",
+            'steps': [
+                {'range': [0, 30], 'color': 'rgba(16, 185, 129, 0.7)'},  # Green
+                {'range': [30, 70], 'color': 'rgba(249, 115, 22, 0.7)'},  # Orange
+                {'range': [70, 100], 'color': 'rgba(239, 68, 68, 0.7)'}   # Red
+            ],
+            'threshold': {
+                'line': {'color': "#6366F1", 'width': 4},
+                'thickness': 0.75,
+                'value': GAUGE_THRESHOLD
+            }
+        },
+        title={
+            'text': "Outbreak Risk Assessment",
+            'font': {'size': 24, 'color': '#4F46E5', 'family': FONT_FAMILY}
+        },
+        number={'font': {'size': 40, 'color': '#4F46E5', 'family': FONT_FAMILY}, 'suffix': '%'}
+    ))
+
+    # Add custom shapes to make it more visually appealing
+    fig.add_shape(
+        type="circle",
+        xref="paper", yref="paper",
+        x0=0.485, y0=0.485, x1=0.515, y1=0.515,
+        fillcolor="#6366F1",
+        line_color="#6366F1",
+    )
+
+    risk_level, risk_color = risk_band(risk_probability)
+    fig.add_annotation(
+        xref="paper", yref="paper", x=0.5, y=0.25,
+        text=f"Risk Level: <b>{risk_level}</b>",
+        showarrow=False,
+        font=dict(family=FONT_FAMILY, size=18, color=risk_color)
+    )
+
+    fig.update_layout(
+        height=350,
+        margin=dict(l=20, r=20, t=80, b=20),
+        paper_bgcolor='white',
+        plot_bgcolor='white',
+    )
+    return fig
+
+
+def build_trend_chart(historical_data: pd.DataFrame) -> go.Figure:
+    """
+    The trend chart built from scratch with Plotly (used for the template).
+
+    Uses the precomputed 'risk_ma3' and 'risk_projection' columns from the trend
+    aggregates when present, otherwise derives them from 'risk_level'.
+    """
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    values = _trend_data(historical_data)
+
+    # Add risk level area
+    fig.add_trace(
+        go.Scatter(
+            x=values['dates'],
+            y=values['risk'],
+            name="Risk Level",
+            line=dict(color='rgba(99, 102, 241, 0.9)', width=3, shape='spline'),
+            fill='tozeroy',
+            fillcolor='rgba(99, 102, 241, 0.1)'
+        ),
+        secondary_y=False
+    )
+
+    # Add cases bar chart
+    fig.add_trace(
+        go.Bar(
+            x=values['dates'],
+            y=values['cases'],
+            name="New Cases",
+            marker_color='rgba(129, 140, 248, 0.7)',
+            opacity=0.8
+        ),
+        secondary_y=True
+    )
+
+    # Add moving average of risk level
+    fig.add_trace(
+        go.Scatter(
+            x=values['dates'],
+            y=values['moving_avg'],
+            name="Risk Trend (3-day MA)",
+            line=dict(color='rgba(139, 92, 246, 0.9)', width=2, dash='dot'),
+            visible='legendonly'  # Hidden by default
+        ),
+        secondary_y=False
+    )
+
+    # Add projections
+    fig.add_trace(
+        go.Scatter(
+            x=values['forecast_dates'],
+            y=values['forecast'],
+            name=f"Risk Projection ({PROJECTION_DAYS} days)",
+            line=dict(color='rgba(167, 139, 250, 0.7)', width=2, dash='dash'),
+            mode='lines',
+            fill='tozeroy',
+            fillcolor='rgba(167, 139, 250, 0.1)'
+        ),
+        secondary_y=False
+    )
+
+    fig.update_layout(
+        title={
+            'text': 'Historical Trend Analysis',
+            'font': {'family': FONT_FAMILY, 'size': 24, 'color': '#4F46E5'},
+            'y': 0.95
+        },
+        legend={
+            'orientation': 'h',
+            'yanchor': 'bottom',
+            'y': 1.02,
+            'xanchor': 'center',
+            'x': 0.5,
+            'bgcolor': 'rgba(255, 255, 255, 0.8)',
+            'bordercolor': 'rgba(0, 0, 0, 0.1)',
+            'borderwidth': 1
+        },
+        hovermode='x unified',
+        hoverlabel=dict(bgcolor='rgba(255, 255, 255, 0.9)', font_size=12, font_family=FONT_FAMILY),
+        height=500,
+        margin=dict(l=20, r=20, t=100, b=20),
+        paper_bgcolor='white',
+        plot_bgcolor='white',
+        xaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(0, 0, 0, 0.03)',
+            title='Date',
+            titlefont=dict(family=FONT_FAMILY, size=14)
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(0, 0, 0, 0.03)',
+            title='Risk Level',
+            titlefont=dict(family=FONT_FAMILY, size=14),
+            tickformat='.0%'
+        ),
+        yaxis2=dict(
+            showgrid=False,
+            title='New Cases',
+            titlefont=dict(family=FONT_FAMILY, size=14)
+        )
+    )
+
+    # Add annotation for projection zone
+    fig.add_shape(
+        type="rect",
+        xref="x",
+        yref="paper",
+        x0=values['zone_start'],
+        y0=0,
+        x1=values['zone_end'],
+        y1=1,
+        fillcolor="rgba(200, 200, 200, 0.05)",
+        line=dict(width=0),
+        layer="below"
+    )
+
+    fig.add_annotation(
+        xref="x",
+        yref="paper",
+        x=values['zone_middle'],
+        y=0.95,
+        text="Projection Zone",
+        showarrow=False,
+        font=dict(family=FONT_FAMILY, size=12, color="rgba(79, 70, 229, 0.7)")
+    )
+    return fig
+
+
+def _trend_data(historical_data: pd.DataFrame) -> Dict[str, list]:
+    """The per-request values of the trend chart, as JSON-ready lists."""
+    if historical_data.empty:
+        # No trend data yet: empty traces and no projection zone
+        return {
+            'dates': [], 'risk': [], 'cases': [], 'moving_avg': [], 'forecast_dates': [], 'forecast': [],
+            'zone_start': None, 'zone_end': None, 'zone_middle': None,
+        }
+    dates = pd.to_datetime(historical_data['date'])
+    if 'risk_ma3' in historical_data:
+        moving_avg = historical_data['risk_ma3']
+    else:
+        moving_avg = historical_data['risk_level'].rolling(window=3).mean()
+
+    last_date = dates.iloc[-1]
+    forecast_dates = pd.date_range(start=last_date + pd.Timedelta(days=1), periods=PROJECTION_DAYS)
+    if 'risk_projection' in historical_data:
+        forecast_risk = historical_data['risk_projection'].iloc[-1] * np.ones(PROJECTION_DAYS)
+    else:
+        forecast_risk = historical_data['risk_level'].iloc[-7:].mean() * np.ones(PROJECTION_DAYS) * 1.1  # Simple projection
+        forecast_risk = np.clip(forecast_risk, 0, 1)  # Ensure values are between 0 and 1
+
+    def _floats(values):
+        # NaN (the start of a rolling mean) becomes null, as Plotly would send it
+        return [None if np.isnan(v) else round(float(v), 6) for v in np.asarray(values, dtype=np.float64)]
+
+    return {
+        'dates': dates.dt.strftime('%Y-%m-%d').tolist(),
+        'risk': _floats(historical_data['risk_level']),
+        'cases': _floats(historical_data['new_cases']),
+        'moving_avg': _floats(moving_avg),
+        'forecast_dates': forecast_dates.strftime('%Y-%m-%d').tolist(),
+        'forecast': _floats(forecast_risk),
+        'zone_start': last_date.strftime('%Y-%m-%d'),
+        'zone_end': forecast_dates[-1].strftime('%Y-%m-%d'),
+        'zone_middle': (last_date + (forecast_dates[-1] - last_date) / 2).isoformat(),
+    }
+
+
+@lru_cache(maxsize=None)
+def _gauge_template() -> dict:
+    return build_risk_gauge(0.0).to_plotly_json()
+
+
+@lru_cache(maxsize=None)
+def _trend_template() -> dict:
+    placeholder = pd.DataFrame({'date': [pd.Timestamp("2000-01-01")], 'risk_level': [0.0], 'new_cases': [0.0]})
+    return build_trend_chart(placeholder).to_plotly_json()
+
+
+def gauge_updates(risk_probability: float) -> Dict[tuple, object]:
+    """(path, value) pairs that turn the gauge template into the gauge for a probability."""
+    risk_level, risk_color = risk_band(risk_probability)
+    return {
+        ('data', 0, 'value'): risk_probability * 100,
+        ('layout', 'annotations', 0, 'text'): f"Risk Level: <b>{risk_level}</b>",
+        ('layout', 'annotations', 0, 'font', 'color'): risk_color,
+    }
+
+
+def trend_updates(historical_data: pd.DataFrame) -> Dict[tuple, object]:
+    """(path, value) pairs that turn the trend template into the chart for `historical_data`."""
+    values = _trend_data(historical_data)
+    return {
+        ('data', 0, 'x'): values['dates'],
+        ('data', 0, 'y'): values['risk'],
+        ('data', 1, 'x'): values['dates'],
+        ('data', 1, 'y'): values['cases'],
+        ('data', 2, 'x'): values['dates'],
+        ('data', 2, 'y'): values['moving_avg'],
+        ('data', 3, 'x'): values['forecast_dates'],
+        ('data', 3, 'y'): values['forecast'],
+        ('layout', 'shapes', 0, 'x0'): values['zone_start'],
+        ('layout', 'shapes', 0, 'x1'): values['zone_end'],
+        ('layout', 'annotations', 0, 'x'): values['zone_middle'],
+    }
+
+
+def fill_template(template: dict, updates: Dict[tuple, object]) -> dict:
+    """
+    A figure dict with `updates` applied to `template`.
+
+    Only the containers on the path to an updated value are copied; everything
+    else is shared with the template, which must therefore never be modified.
+    """
+    figure = dict(template)
+    for path, value in updates.items():
+        node = figure
+        for key in path[:-1]:
+            child = node[key]
+            node[key] = child = list(child) if isinstance(child, list) else dict(child)
+            node = child
+        node[path[-1]] = value
+    return figure
+
+
+def to_patch(updates: Dict[tuple, object]) -> Patch:
+    """A Dash Patch that applies `updates` to a figure already on the page."""
+    patch = Patch()
+    for path, value in updates.items():
+        target = patch
+        for key in path[:-1]:
+            target = target[key]
+        target[path[-1]] = value
+    return patch
+
+
+def risk_gauge_template() -> dict:
+    return _gauge_template()
+
+
+def trend_chart_template() -> dict:
+    return _trend_template()
+
+
+def risk_gauge_figure(risk_probability: float) -> dict:
+    return fill_template(_gauge_template(), gauge_updates(risk_probability))
+
+
+def trend_chart_figure(historical_data: pd.DataFrame) -> dict:
+    return fill_template(_trend_template(), trend_updates(historical_data))
+
+
+def risk_gauge_patch(risk_probability: float) -> Patch:
+    return to_patch(gauge_updates(risk_probability))
+
+
+def trend_chart_patch(historical_data: pd.DataFrame) -> Patch:
+    return to_patch(trend_updates(historical_data))
+
+
+def create_risk_gauge(risk_probability: float) -> dcc.Graph:
+    """Create a modern gauge chart for risk probability visualization."""
+    return dcc.Graph(figure=risk_gauge_figure(risk_probability), config=GAUGE_CONFIG)
+
+
+def create_trend_chart(historical_data: pd.DataFrame) -> dcc.Graph:
+    """Create a modern line chart for historical trend visualization."""
+    return dcc.Graph(figure=trend_chart_figure(historical_data), config=TREND_CONFIG)
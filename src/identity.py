@@ -0,0 +1,574 @@
+"""
+This module caches identity provider (Firebase Auth) lookups.
+
+User records are cached by uid and by email for IDENTITY_CACHE_TTL seconds.
+Lookups of users that do not exist are cached too, for the shorter
+IDENTITY_NEGATIVE_TTL, so repeated lookups of an unknown email don't each go
+to the network. After the TTL an entry is still served for IDENTITY_STALE_TTL
+more seconds while one background thread refreshes it, so a request only waits
+on the identity provider for a user it has never seen. Verified ID tokens are
+cached until shortly before they expire.
+
+Bulk lookups (get_users, get_users_by_email) fetch only the users missing from
+the cache, in batches of up to 100 per request (Firebase's auth.get_users limit).
+Batches, and user creation in ensure_users, run at most IDENTITY_MAX_CONCURRENCY
+at a time, over a connection pool of the same size.
+
+The backend is Firebase Admin by default (it honors FIREBASE_AUTH_EMULATOR_HOST,
+so it can run against the local Auth emulator). IDENTITY_BACKEND=fake selects
+FakeIdentityBackend, an in-memory stand-in for tests and benchmarks.
+
+async_identity.AsyncIdentityService shares the cache logic (IdentityCache) for
+the asyncio routes served by asgi.py.
+"""
+import os
+import json
+import time
+import uuid
+import base64
+import hashlib
+import logging
+import binascii
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IDENTITY_BACKEND = os.getenv("IDENTITY_BACKEND", "firebase")
+FIREBASE_CREDENTIALS = os.getenv("FIREBASE_CREDENTIALS", os.path.join(BASE_DIR, "firebase-key.json"))
+
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", "300"))
+IDENTITY_NEGATIVE_TTL = float(os.getenv("IDENTITY_NEGATIVE_TTL", "30"))
+# How long past its TTL an entry is still served while it is refreshed in the background
+IDENTITY_STALE_TTL = float(os.getenv("IDENTITY_STALE_TTL", "3600"))
+# Verified tokens are dropped this many seconds before they expire
+TOKEN_EXPIRY_MARGIN = 30.0
+# Most identifiers Firebase accepts in one auth.get_users call
+GET_USERS_BATCH_SIZE = 100
+# Requests to the identity provider in flight at once for bulk operations
+IDENTITY_MAX_CONCURRENCY = int(os.getenv("IDENTITY_MAX_CONCURRENCY", "8"))
+# Seconds FakeIdentityBackend waits per call when it is the configured backend
+FAKE_IDENTITY_LATENCY = float(os.getenv("FAKE_IDENTITY_LATENCY", "0"))
+IDENTITY_TOOLKIT_URL = "https://identitytoolkit.googleapis.com/v1"
+
+
+class UserNotFound(KeyError):
+    """Raised by backends for a uid or email with no user."""
+
+
+class InvalidToken(ValueError):
+    """Raised for an ID token that is malformed, expired or revoked."""
+
+
+def identity_toolkit_url() -> str:
+    """Base URL of the Identity Toolkit REST API, or of the Auth emulator when one is set."""
+    emulator = os.getenv("FIREBASE_AUTH_EMULATOR_HOST")
+    return f"http://{emulator}/identitytoolkit.googleapis.com/v1" if emulator else IDENTITY_TOOLKIT_URL
+
+
+def fake_id_token(uid: str, email: Optional[str] = None, name: Optional[str] = None,
+                  expires_in: float = 3600.0) -> str:
+    """
+    An unsigned ID token for FakeIdentityBackend, which checks only its expiry.
+
+    Like the Auth emulator's tokens, it carries its claims in the clear, so a
+    client (a benchmark in another process) can mint one without sharing the
+    backend's state.
+    """
+    now = time.time()
+    claims = {'uid': uid, 'sub': uid, 'email': email, 'iat': int(now), 'exp': now + expires_in}
+    if name:
+        claims['name'] = name
+    return "fake." + base64.urlsafe_b64encode(json.dumps(claims).encode("utf-8")).decode("ascii")
+
+
+class Identity(NamedTuple):
+    uid: str
+    email: Optional[str]
+    display_name: Optional[str]
+    email_verified: bool = False
+
+    @property
+    def username(self) -> str:
+        return self.display_name or (self.email or "").split('@')[0] or "User"
+
+
+class FirebaseIdentityBackend:
+    """Firebase Admin SDK calls; every method is one request to the identity provider."""
+
+    def __init__(self, credentials_path: str = FIREBASE_CREDENTIALS, pool_size: int = IDENTITY_MAX_CONCURRENCY):
+        import firebase_admin
+        from firebase_admin import auth, credentials
+
+        if not firebase_admin._apps:
+            if os.getenv("FIREBASE_AUTH_EMULATOR_HOST"):
+                # The emulator accepts any project; no service account is needed
+                firebase_admin.initialize_app(options={'projectId': os.getenv("FIREBASE_PROJECT_ID", "demo-project")})
+            else:
+                firebase_admin.initialize_app(credentials.Certificate(credentials_path))
+        self._auth = auth
+        self._size_pool(pool_size)
+
+    def _size_pool(self, pool_size: int) -> None:
+        """
+        Keep up to pool_size connections open to the Auth API.
+
+        firebase_admin sends every call through one requests session per app, whose
+        adapters keep 10 connections. Concurrent bulk work beyond that would open and
+        close connections, so the adapters are replaced with larger ones that keep the
+        SDK's retry policy.
+
+        The SDK has no public setting for this, so the session is found through its
+        internals; requirements.txt pins firebase-admin to a version that has them. If
+        they change, the SDK's own pool is left as is and a warning is logged; lookups
+        still work, only with more connection churn.
+        """
+        import requests
+
+        try:
+            session = self._auth._get_client(None)._user_manager.http_client.session
+            if not isinstance(session, requests.Session):
+                raise TypeError(f"expected a requests.Session, found {type(session).__name__}")
+            adapters = {prefix: session.get_adapter(prefix) for prefix in ('http://', 'https://')}
+        except Exception as e:
+            logger.warning(f"Could not size the Firebase connection pool, keeping the SDK default ({e})")
+            return
+        for prefix, adapter in adapters.items():
+            session.mount(prefix, requests.adapters.HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size, max_retries=adapter.max_retries))
+
+    @staticmethod
+    def _identity(record) -> Identity:
+        return Identity(record.uid, record.email, record.display_name, bool(record.email_verified))
+
+    def get_user(self, uid: str) -> Identity:
+        try:
+            return self._identity(self._auth.get_user(uid))
+        except self._auth.UserNotFoundError:
+            raise UserNotFound(uid)
+
+    def get_user_by_email(self, email: str) -> Identity:
+        try:
+            return self._identity(self._auth.get_user_by_email(email))
+        except self._auth.UserNotFoundError:
+            raise UserNotFound(email)
+
+    def get_users(self, keys: Sequence[Tuple[str, str]]) -> Dict[Tuple[str, str], Identity]:
+        """Users for up to GET_USERS_BATCH_SIZE ('uid' | 'email', value) keys in one request; missing keys are left out."""
+        identifiers = [self._auth.UidIdentifier(value) if kind == 'uid' else self._auth.EmailIdentifier(value)
+                       for kind, value in keys]
+        wanted = set(keys)
+        found = {}
+        for record in self._auth.get_users(identifiers).users:
+            identity = self._identity(record)
+            for key in (('uid', record.uid), ('email', (record.email or '').lower())):
+                if key in wanted:
+                    found[key] = identity
+        return found
+
+    def create_user(self, email: str, display_name: Optional[str] = None, email_verified: bool = False) -> Identity:
+        return self._identity(self._auth.create_user(email=email, display_name=display_name,
+                                                     email_verified=email_verified))
+
+    def verify_id_token(self, token: str, check_revoked: bool = False) -> dict:
+        try:
+            return self._auth.verify_id_token(token, check_revoked=check_revoked)
+        except (ValueError, self._auth.InvalidIdTokenError, self._auth.ExpiredIdTokenError,
+                self._auth.RevokedIdTokenError) as e:
+            raise InvalidToken(str(e))
+
+
+class FakeIdentityBackend:
+    """
+    In-memory stand-in for the identity provider.
+
+    Users are added with add_user() (or create_user()), ID tokens are issued with
+    issue_token() (see fake_id_token). Every call sleeps `latency` seconds, to stand
+    in for the network, and is counted in `calls`.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._users: Dict[str, Identity] = {}
+        self._lock = threading.Lock()
+
+    def _call(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def add_user(self, uid: str, email: Optional[str] = None, display_name: Optional[str] = None,
+                 email_verified: bool = False) -> Identity:
+        identity = Identity(uid, email, display_name, email_verified)
+        with self._lock:
+            self._users[uid] = identity
+        return identity
+
+    def issue_token(self, uid: str, expires_in: float = 3600.0) -> str:
+        with self._lock:
+            identity = self._users[uid]
+        return fake_id_token(uid, identity.email, identity.display_name, expires_in)
+
+    def get_user(self, uid: str) -> Identity:
+        self._call('get_user')
+        with self._lock:
+            if uid not in self._users:
+                raise UserNotFound(uid)
+            return self._users[uid]
+
+    def get_user_by_email(self, email: str) -> Identity:
+        self._call('get_user_by_email')
+        with self._lock:
+            for identity in self._users.values():
+                if identity.email and identity.email.lower() == email.lower():
+                    return identity
+        raise UserNotFound(email)
+
+    def get_users(self, keys: Sequence[Tuple[str, str]]) -> Dict[Tuple[str, str], Identity]:
+        if len(keys) > GET_USERS_BATCH_SIZE:
+            raise ValueError(f"At most {GET_USERS_BATCH_SIZE} identifiers per call")
+        self._call('get_users')
+        with self._lock:
+            by_email = {identity.email.lower(): identity for identity in self._users.values() if identity.email}
+            return {(kind, value): identity for kind, value in keys
+                    for identity in [self._users.get(value) if kind == 'uid' else by_email.get(value.lower())]
+                    if identity is not None}
+
+    def create_user(self, email: str, display_name: Optional[str] = None, email_verified: bool = False) -> Identity:
+        self._call('create_user')
+        return self.add_user(uuid.uuid4().hex[:28], email, display_name, email_verified)
+
+    def verify_id_token(self, token: str, check_revoked: bool = False) -> dict:
+        self._call('verify_id_token')
+        try:
+            claims = json.loads(base64.urlsafe_b64decode(token.split("fake.", 1)[1]))
+        except (IndexError, ValueError, binascii.Error):
+            raise InvalidToken("Token is malformed")
+        if not isinstance(claims, dict) or not claims.get('sub') or claims.get('exp', 0) <= time.time():
+            raise InvalidToken("Token is invalid or expired")
+        if check_revoked:
+            with self._lock:
+                if claims['sub'] not in self._users:
+                    raise InvalidToken("Token's user no longer exists")
+        return claims
+
+
+class _Entry(NamedTuple):
+    identity: Optional[Identity]  # None caches "no such user"
+    expires_at: float
+    stale_until: float
+
+
+class IdentityCache(ABC):
+    """
+    The user and token caches shared by IdentityService and the asyncio AsyncIdentityService.
+
+    Subclasses fetch from the backend and decide how a stale entry is refreshed.
+    """
+
+    def __init__(self, backend, maxsize: int = IDENTITY_CACHE_SIZE, ttl: float = IDENTITY_CACHE_TTL,
+                 negative_ttl: float = IDENTITY_NEGATIVE_TTL, stale_ttl: float = IDENTITY_STALE_TTL,
+                 max_concurrency: int = IDENTITY_MAX_CONCURRENCY):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._tokens: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+        self.counts: Counter = Counter()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    @staticmethod
+    def _key(kind: str, value: str) -> Tuple[str, str]:
+        return kind, value.strip().lower() if kind == 'email' else value
+
+    def _store(self, key: Tuple[str, str], identity: Optional[Identity]) -> None:
+        now = time.monotonic()
+        ttl = self.ttl if identity is not None else self.negative_ttl
+        entry = _Entry(identity, now + ttl, now + ttl + (self.stale_ttl if identity is not None else 0))
+        with self._lock:
+            keys = [key]
+            if identity is not None:
+                # A user found by email is also cached by uid, and the other way round
+                keys = [self._key('uid', identity.uid)] + ([self._key('email', identity.email)] if identity.email else [])
+            for cache_key in keys:
+                self._entries[cache_key] = entry
+                self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.counts['evictions'] += 1
+
+    def _cached(self, key: Tuple[str, str]) -> Tuple[bool, Optional[Identity]]:
+        """(True, identity or None) when the cache can answer for key, else (False, None); caller holds _lock."""
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is None or now >= entry.stale_until:
+            self.counts['misses'] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        if now < entry.expires_at:
+            self.counts['negative_hits' if entry.identity is None else 'hits'] += 1
+            return True, entry.identity
+        # Past its TTL: answer from the cache and refresh in the background
+        self.counts['stale_hits'] += 1
+        if key not in self._refreshing:
+            self._refreshing.add(key)
+            self._schedule_refresh(key)
+        return True, entry.identity
+
+    @abstractmethod
+    def _schedule_refresh(self, key: Tuple[str, str]) -> None:
+        """Start refetching a stale entry without waiting for it; call _refresh_done when finished."""
+
+    def _refresh_done(self, key: Tuple[str, str], error: Optional[Exception]) -> None:
+        if error is not None:
+            # The stale entry stays in place until it runs out
+            logger.warning(f"Could not refresh identity {key[0]} ({error})")
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def invalidate(self, uid: Optional[str] = None, email: Optional[str] = None) -> None:
+        """Drop cached entries for a user after it changed in the identity provider."""
+        with self._lock:
+            entry = self._entries.pop(self._key('uid', uid), None) if uid else None
+            if entry is not None and entry.identity is not None and entry.identity.email:
+                self._entries.pop(self._key('email', entry.identity.email), None)
+            if email:
+                self._entries.pop(self._key('email', email), None)
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _cached_claims(self, key: str) -> Optional[dict]:
+        """Claims of a verified token still in the cache, or None."""
+        with self._lock:
+            cached = self._tokens.get(key)
+            if cached is not None and time.time() < cached[0]:
+                self._tokens.move_to_end(key)
+                self.counts['token_hits'] += 1
+                return dict(cached[1])
+            self.counts['token_misses'] += 1
+        return None
+
+    def _store_claims(self, key: str, claims: dict) -> None:
+        valid_until = float(claims.get('exp', 0)) - TOKEN_EXPIRY_MARGIN
+        with self._lock:
+            if valid_until > time.time():
+                self._tokens[key] = (valid_until, dict(claims))
+                self._tokens.move_to_end(key)
+                while len(self._tokens) > self.maxsize:
+                    self._tokens.popitem(last=False)
+            else:
+                self._tokens.pop(key, None)
+
+    def _drop_negative(self, emails: Iterable[str]) -> None:
+        with self._lock:
+            for email in emails:
+                key = self._key('email', email)
+                entry = self._entries.get(key)
+                if entry is not None and entry.identity is None:
+                    del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens.clear()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counts = dict(self.counts)
+            users, tokens = len(self._entries), len(self._tokens)
+        lookups = sum(counts.get(name, 0) for name in ('hits', 'negative_hits', 'stale_hits', 'misses'))
+        token_lookups = counts.get('token_hits', 0) + counts.get('token_misses', 0)
+        cached = lookups - counts.get('misses', 0)
+        return {
+            'backend': type(self.backend).__name__,
+            'size': users,
+            'maxsize': self.maxsize,
+            'tokens': tokens,
+            'hits': counts.get('hits', 0),
+            'negative_hits': counts.get('negative_hits', 0),
+            'stale_hits': counts.get('stale_hits', 0),
+            'misses': counts.get('misses', 0),
+            'hit_rate': cached / lookups if lookups else None,
+            'token_hits': counts.get('token_hits', 0),
+            'token_misses': counts.get('token_misses', 0),
+            'token_hit_rate': counts.get('token_hits', 0) / token_lookups if token_lookups else None,
+            'remote_calls': counts.get('remote_calls', 0),
+            'evictions': counts.get('evictions', 0),
+        }
+
+
+class IdentityService(IdentityCache):
+    """Cached user lookups and token verification in front of an identity backend."""
+
+    def __init__(self, backend, **kwargs):
+        super().__init__(backend, **kwargs)
+        # One remote lookup per key at a time; other callers wait for its result
+        self._fetch_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+    def _fetch(self, key: Tuple[str, str]) -> Optional[Identity]:
+        kind, value = key
+        self._count('remote_calls')
+        try:
+            identity = self.backend.get_user(value) if kind == 'uid' else self.backend.get_user_by_email(value)
+        except UserNotFound:
+            identity = None
+        self._store(key, identity)
+        return identity
+
+    def _refresh(self, key: Tuple[str, str]) -> None:
+        try:
+            self._fetch(key)
+        except Exception as e:
+            self._refresh_done(key, e)
+        else:
+            self._refresh_done(key, None)
+
+    def _schedule_refresh(self, key: Tuple[str, str]) -> None:
+        threading.Thread(target=self._refresh, args=(key,), daemon=True).start()
+
+    def _lookup(self, kind: str, value: str) -> Optional[Identity]:
+        key = self._key(kind, value)
+        with self._lock:
+            cached, identity = self._cached(key)
+            if cached:
+                return identity
+            fetch_lock = self._fetch_locks.setdefault(key, threading.Lock())
+        try:
+            with fetch_lock:
+                with self._lock:
+                    entry = self._entries.get(key)
+                if entry is not None and time.monotonic() < entry.expires_at:
+                    return entry.identity
+                return self._fetch(key)
+        finally:
+            with self._lock:
+                self._fetch_locks.pop(key, None)
+
+    def _map(self, function: Callable, items: List) -> List:
+        """function(item) for every item, at most max_concurrency at a time."""
+        if len(items) <= 1 or self.max_concurrency <= 1:
+            return [function(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(items))) as executor:
+            return list(executor.map(function, items))
+
+    def _fetch_batch(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[Identity]]:
+        self._count('remote_calls')
+        found = self.backend.get_users(keys)
+        for key in keys:
+            self._store(key, found.get(key))
+        return {key: found.get(key) for key in keys}
+
+    def _lookup_many(self, kind: str, values: Iterable[str]) -> Dict[str, Optional[Identity]]:
+        keys = {value: self._key(kind, value) for value in values}
+        results, missing = {}, []
+        with self._lock:
+            for key in dict.fromkeys(keys.values()):
+                cached, identity = self._cached(key)
+                if cached:
+                    results[key] = identity
+                else:
+                    missing.append(key)
+        batches = [missing[i:i + GET_USERS_BATCH_SIZE] for i in range(0, len(missing), GET_USERS_BATCH_SIZE)]
+        for found in self._map(self._fetch_batch, batches):
+            results.update(found)
+        return {value: results[key] for value, key in keys.items()}
+
+    def get_user(self, uid: str) -> Optional[Identity]:
+        """The user with this uid, or None if there is none."""
+        return self._lookup('uid', uid)
+
+    def get_users(self, uids: Iterable[str]) -> Dict[str, Optional[Identity]]:
+        """Users by uid (None for missing ones), fetching cache misses in batches."""
+        return self._lookup_many('uid', uids)
+
+    def get_users_by_email(self, emails: Iterable[str]) -> Dict[str, Optional[Identity]]:
+        """Users by email (None for missing ones), fetching cache misses in batches."""
+        return self._lookup_many('email', emails)
+
+    def get_user_by_email(self, email: str) -> Optional[Identity]:
+        """The user with this email (case-insensitive), or None if there is none."""
+        return self._lookup('email', email)
+
+    def create_user(self, email: str, display_name: Optional[str] = None, email_verified: bool = False) -> Identity:
+        """Create a user and cache it, replacing any cached "not found" for its email."""
+        self._count('remote_calls')
+        identity = self.backend.create_user(email, display_name=display_name, email_verified=email_verified)
+        self._store(self._key('uid', identity.uid), identity)
+        return identity
+
+    def ensure_users(self, users: Iterable[Tuple[str, Optional[str]]],
+                     email_verified: bool = False) -> Dict[str, Identity]:
+        """
+        Look up (email, display name) pairs, such as an organization's user list, and
+        create the users that don't exist yet.
+
+        Lookups are batched; creations (one request each) run at most max_concurrency
+        at a time.
+        Returns:
+            dict: email -> Identity for every user, existing or created.
+        """
+        names = dict(users)
+        # A cached "not found" may predate users created elsewhere, so it is not trusted here
+        self._drop_negative(names)
+        identities = self.get_users_by_email(names)
+        to_create = [email for email, identity in identities.items() if identity is None]
+        created = self._map(lambda email: self.create_user(email, display_name=names[email],
+                                                           email_verified=email_verified), to_create)
+        identities.update(zip(to_create, created))
+        logger.info(f"Ensured {len(identities)} users, {len(created)} created")
+        return identities
+
+    def verify_id_token(self, token: str, check_revoked: bool = False) -> dict:
+        """
+        Claims of a valid ID token; raises InvalidToken otherwise.
+
+        Verified tokens are cached until TOKEN_EXPIRY_MARGIN seconds before their
+        'exp' claim. check_revoked=True always asks the backend.
+        """
+        key = self._token_key(token)
+        if not check_revoked:
+            claims = self._cached_claims(key)
+            if claims is not None:
+                return claims
+        self._count('remote_calls')
+        claims = self.backend.verify_id_token(token, check_revoked=check_revoked)
+        self._store_claims(key, claims)
+        return claims
+
+
+_default_service: Optional[IdentityService] = None
+_default_lock = threading.Lock()
+
+
+def get_identity_service() -> IdentityService:
+    """Process-wide identity service with the backend chosen by IDENTITY_BACKEND."""
+    global _default_service
+    if _default_service is None:
+        with _default_lock:
+            if _default_service is None:
+                if IDENTITY_BACKEND == "fake":
+                    backend = FakeIdentityBackend(latency=FAKE_IDENTITY_LATENCY)
+                else:
+                    backend = FirebaseIdentityBackend()
+                _default_service = IdentityService(backend)
+                logger.info(f"Identity lookups cached in front of {type(backend).__name__}")
+    return _default_service
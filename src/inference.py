@@ -0,0 +1,166 @@
+"""
+This module provides vectorized batch scoring for the outbreak model.
+"""
+import io
+import os
+import json
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from array_forest import ArrayForest
+
+logger = logging.getLogger(__name__)
+
+# Feature order the model was trained with (see model_training.py)
+FEATURE_COLUMNS = ['NewCases', 'Humidity_x', 'PopulationDensity', 'Temperature', 'Rainfall']
+
+# Rows scored per predict_proba call; bounds the memory used by one batch
+DEFAULT_CHUNK_SIZE = int(os.getenv("PREDICT_CHUNK_SIZE", "10000"))
+
+PARQUET_MAGIC = b"PAR1"
+
+
+class BatchInputError(ValueError):
+    """Raised when a batch request body cannot be turned into feature rows."""
+
+
+def read_batch_body(body: bytes, content_type: Optional[str] = None) -> pd.DataFrame:
+    """
+    Parse a JSON, CSV or Parquet request body into a DataFrame.
+    Args:
+        body (bytes): Raw request body.
+        content_type (str): Request MIME type, used to pick the parser.
+    Returns:
+        pd.DataFrame: One row per record in the body.
+    """
+    if not body:
+        raise BatchInputError("Request body is empty")
+
+    content_type = (content_type or "").split(";")[0].strip().lower()
+
+    if content_type.endswith("parquet") or body[:4] == PARQUET_MAGIC:
+        try:
+            return pd.read_parquet(io.BytesIO(body))
+        except ImportError as e:
+            raise BatchInputError(f"Parquet input is not supported: {e}")
+        except Exception as e:
+            raise BatchInputError(f"Invalid Parquet body: {e}")
+
+    if content_type in ("text/csv", "application/csv"):
+        try:
+            return pd.read_csv(io.BytesIO(body))
+        except Exception as e:
+            raise BatchInputError(f"Invalid CSV body: {e}")
+
+    try:
+        records = json.loads(body)
+    except ValueError as e:
+        raise BatchInputError(f"Invalid JSON body: {e}")
+
+    if isinstance(records, dict):
+        records = records.get("rows")
+    if not isinstance(records, list):
+        raise BatchInputError("JSON body must be an array of feature rows")
+    if records and not isinstance(records[0], dict):
+        # Positional rows, e.g. [[120, 85, 20000, 28, 12.5], ...]
+        try:
+            return pd.DataFrame(records, columns=FEATURE_COLUMNS)
+        except ValueError as e:
+            raise BatchInputError(f"Each row must have {len(FEATURE_COLUMNS)} values: {e}")
+    return pd.DataFrame.from_records(records)
+
+
+def to_feature_matrix(frame: pd.DataFrame) -> np.ndarray:
+    """Select the model features from a frame as a contiguous float64 matrix."""
+    missing = [column for column in FEATURE_COLUMNS if column not in frame.columns]
+    if missing:
+        raise BatchInputError(f"Missing feature columns: {', '.join(missing)}")
+
+    try:
+        X = np.ascontiguousarray(frame[FEATURE_COLUMNS].to_numpy(dtype=np.float64))
+    except (TypeError, ValueError) as e:
+        raise BatchInputError(f"Feature values must be numeric: {e}")
+
+    if np.isnan(X).any():
+        bad_rows = np.flatnonzero(np.isnan(X).any(axis=1))[:10].tolist()
+        raise BatchInputError(f"Missing feature values in rows: {bad_rows}")
+    return X
+
+
+def check_feature_order(model) -> None:
+    """Make sure the model expects features in FEATURE_COLUMNS order."""
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None and list(names) != FEATURE_COLUMNS:
+        raise ValueError(f"Model feature order {list(names)} does not match {FEATURE_COLUMNS}")
+
+
+def predict_proba(model, X: np.ndarray) -> np.ndarray:
+    """
+    model.predict_proba on a matrix in FEATURE_COLUMNS order.
+
+    sklearn estimators fitted on a DataFrame are given the rows with the column names
+    they were fitted on, so sklearn still checks them. ArrayForest and estimators
+    fitted on plain arrays take the matrix as is.
+    """
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None and not isinstance(model, ArrayForest):
+        X = pd.DataFrame(X, columns=names, copy=False)
+    return model.predict_proba(X)
+
+
+def score_matrix(model, X: np.ndarray, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score a feature matrix in chunks with one predict_proba call per chunk.
+    Args:
+        model: Fitted classifier exposing predict_proba and classes_.
+        X (np.ndarray): Matrix of shape (n_rows, len(FEATURE_COLUMNS)).
+        chunk_size (int): Maximum number of rows per predict_proba call.
+    Returns:
+        tuple: (labels, outbreak probabilities), both of length n_rows.
+    """
+    if chunk_size < 1:
+        raise BatchInputError("chunk_size must be a positive integer")
+    check_feature_order(model)
+
+    n_rows = X.shape[0]
+    labels = np.empty(n_rows, dtype=model.classes_.dtype)
+    probabilities = np.empty(n_rows, dtype=np.float64)
+    positive = int(np.flatnonzero(model.classes_ == 1)[0]) if 1 in model.classes_ else len(model.classes_) - 1
+
+    for start in range(0, n_rows, chunk_size):
+        stop = min(start + chunk_size, n_rows)
+        proba = predict_proba(model, X[start:stop])
+        # Same label rule as RandomForestClassifier.predict, without a second pass
+        labels[start:stop] = model.classes_.take(np.argmax(proba, axis=1))
+        probabilities[start:stop] = proba[:, positive]
+
+    return labels, probabilities
+
+
+def score_frame(model, frame: pd.DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """Score every row of a feature frame; see score_matrix."""
+    return score_matrix(model, to_feature_matrix(frame), chunk_size=chunk_size)
+
+
+def tree_probabilities(model, X: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Outbreak probability given by every tree of a forest.
+    Returns:
+        np.ndarray: Shape (n_rows, n_trees), or None for models that are not tree ensembles.
+    """
+    positive = int(np.flatnonzero(model.classes_ == 1)[0]) if 1 in model.classes_ else len(model.classes_) - 1
+    if hasattr(model, "proba") and hasattr(model, "apply"):
+        # ArrayForest: leaf probabilities of the leaf each row reaches in every tree
+        return model.proba[:, positive].take(model.apply(X))
+    if hasattr(model, "estimators_"):
+        return np.column_stack([estimator.predict_proba(X)[:, positive] for estimator in model.estimators_])
+    return None
+
+
+def vote_agreement(votes: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """Share of trees voting for each row's label; a tree on exactly 0.5 counts half."""
+    for_outbreak = np.mean((votes > 0.5) + 0.5 * (votes == 0.5), axis=1)
+    return np.where(labels == 1, for_outbreak, 1 - for_outbreak)
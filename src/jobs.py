@@ -0,0 +1,293 @@
+"""
+This module runs heavy prediction work as background jobs.
+
+Jobs are stored in a SQLite database, so no broker is needed. Every web worker
+process that submits or polls jobs also runs a small pool of worker threads that
+claim queued jobs from the shared database, so any process can answer status
+requests for any job. A job's input and result files live next to the database.
+
+Job kinds are registered with a handler that receives the Job (its params,
+input file and a progress callback) and returns a JSON-serializable summary.
+Handlers may also write a result file through job.result_path.
+
+Workers update a heartbeat from a timer thread for as long as a job's handler
+runs, whether or not it reports progress. A running job whose heartbeat is older
+than STALE_AFTER (its process died) is put back in the queue.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(BASE_DIR, "..", "data", "jobs"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Seconds without a heartbeat after which a running job is considered orphaned
+STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "120"))
+# Seconds between heartbeats of a running job, well inside STALE_AFTER
+HEARTBEAT_INTERVAL = STALE_AFTER / 4
+# Finished jobs (and their files) are deleted after this many seconds
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(24 * 3600)))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobNotFound(KeyError):
+    """Raised for an unknown (or expired) job id."""
+
+
+class Job:
+    """A claimed job as seen by its handler."""
+
+    def __init__(self, queue: "JobQueue", job_id: str, kind: str, params: dict):
+        self.queue = queue
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+
+    @property
+    def input_path(self) -> str:
+        return self.queue.input_path(self.id)
+
+    @property
+    def result_path(self) -> str:
+        return self.queue.result_path(self.id)
+
+    def report_progress(self, fraction: float, message: Optional[str] = None) -> None:
+        self.queue._update(self.id, progress=min(max(float(fraction), 0.0), 1.0), message=message,
+                           heartbeat=time.time())
+
+
+class JobQueue:
+    """SQLite-backed job queue with an in-process pool of worker threads."""
+
+    def __init__(self, jobs_dir: str = JOBS_DIR, workers: int = JOB_WORKERS, poll_interval: float = 0.5):
+        self.jobs_dir = jobs_dir
+        self.db_path = os.path.join(jobs_dir, "jobs.db")
+        self.workers = workers
+        self.poll_interval = poll_interval
+
+        self._handlers: Dict[str, Callable[[Job], dict]] = {}
+        self._threads: List[threading.Thread] = []
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+
+        os.makedirs(jobs_dir, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            yield db
+        finally:
+            db.close()
+
+    def _update(self, job_id: str, **fields) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def register(self, kind: str, handler: Callable[[Job], dict]) -> None:
+        """Run jobs of `kind` with handler(job) -> JSON-serializable summary."""
+        self._handlers[kind] = handler
+
+    def input_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.input")
+
+    def result_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.result")
+
+    def submit(self, kind: str, params: Optional[dict] = None, payload: Optional[bytes] = None) -> str:
+        """Queue a job (with an optional input payload) and return its id."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        if payload is not None:
+            with open(self.input_path(job_id), "wb") as f:
+                f.write(payload)
+        with self._connect() as db:
+            db.execute("INSERT INTO jobs (id, kind, status, params, created_at) VALUES (?, ?, ?, ?, ?)",
+                       (job_id, kind, QUEUED, json.dumps(params or {}), time.time()))
+        self.start()
+        self._wakeup.set()
+        logger.info(f"Queued {kind} job {job_id}")
+        return job_id
+
+    def get(self, job_id: str) -> dict:
+        """Status, progress and (once done) result summary of a job."""
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise JobNotFound(job_id)
+        job = {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'progress': row['progress'],
+            'message': row['message'],
+            'params': json.loads(row['params']),
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'has_result_file': os.path.exists(self.result_path(job_id)),
+        }
+        for name in ('created_at', 'started_at', 'finished_at'):
+            job[name] = datetime.fromtimestamp(row[name]).isoformat() if row[name] else None
+        return job
+
+    def wait(self, job_id: str, timeout: float = 30.0, progress: Optional[float] = None) -> dict:
+        """
+        Long-poll a job: return once it finishes, its progress moves past `progress`,
+        or `timeout` seconds pass.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if (job['status'] in FINISHED or (progress is not None and job['progress'] > progress)
+                    or time.monotonic() >= deadline):
+                return job
+            time.sleep(min(self.poll_interval, max(deadline - time.monotonic(), 0)))
+
+    def start(self) -> None:
+        """Start this process's worker threads (again after a fork)."""
+        if self._started_pid == os.getpid() or self.workers < 1:
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._requeue_stale()
+            self._threads = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                             for i in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+            self._started_pid = os.getpid()
+            logger.info(f"Started {self.workers} job workers in process {os.getpid()}")
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _requeue_stale(self) -> None:
+        cutoff = time.time() - STALE_AFTER
+        with self._connect() as db:
+            requeued = db.execute("UPDATE jobs SET status = ?, progress = 0, message = 'requeued' "
+                                  "WHERE status = ? AND heartbeat < ?", (QUEUED, RUNNING, cutoff)).rowcount
+            expired = db.execute("SELECT id FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                                 (DONE, FAILED, time.time() - JOB_RETENTION)).fetchall()
+            db.executemany("DELETE FROM jobs WHERE id = ?", [(row['id'],) for row in expired])
+        for row in expired:
+            for path in (self.input_path(row['id']), self.result_path(row['id'])):
+                if os.path.exists(path):
+                    os.remove(path)
+        if requeued:
+            logger.warning(f"Requeued {requeued} jobs left running by a dead worker")
+
+    def _claim(self) -> Optional[Job]:
+        kinds = list(self._handlers)
+        if not kinds:
+            return None
+        now = time.time()
+        with self._connect() as db:
+            # BEGIN IMMEDIATE takes the write lock, so two workers never claim the same job
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    f"SELECT id, kind, params FROM jobs WHERE status = ? AND kind IN ({', '.join('?' * len(kinds))}) "
+                    "ORDER BY created_at LIMIT 1", (QUEUED, *kinds)).fetchone()
+                if row is not None:
+                    db.execute("UPDATE jobs SET status = ?, started_at = ?, heartbeat = ? WHERE id = ?",
+                               (RUNNING, now, now, row['id']))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return None if row is None else Job(self, row['id'], row['kind'], json.loads(row['params']))
+
+    def _heartbeat(self, job_id: str, done: threading.Event) -> None:
+        while not done.wait(HEARTBEAT_INTERVAL):
+            try:
+                self._update(job_id, heartbeat=time.time())
+            except sqlite3.Error as e:
+                logger.error(f"Could not update the heartbeat of job {job_id} ({e})")
+
+    def _run(self, job: Job) -> None:
+        start = time.perf_counter()
+        # The heartbeat keeps moving during long steps that report no progress
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job.id, done), name=f"job-heartbeat-{job.id}",
+                                daemon=True)
+        beat.start()
+        try:
+            result = self._handlers[job.kind](job)
+        except Exception as e:
+            logger.exception(f"{job.kind} job {job.id} failed")
+            self._update(job.id, status=FAILED, error=str(e), finished_at=time.time())
+            return
+        finally:
+            done.set()
+            beat.join()
+        self._update(job.id, status=DONE, progress=1.0, result=json.dumps(result, default=str),
+                     finished_at=time.time())
+        logger.info(f"{job.kind} job {job.id} finished in {time.perf_counter() - start:.2f}s")
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                logger.error(f"Could not claim a job ({e})")
+                job = None
+            if job is None:
+                # Jobs submitted by other processes are picked up on the next poll
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+
+_default_queue: Optional[JobQueue] = None
+_default_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide job queue in JOBS_DIR."""
+    global _default_queue
+    if _default_queue is None:
+        with _default_lock:
+            if _default_queue is None:
+                _default_queue = JobQueue()
+    return _default_queue
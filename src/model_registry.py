@@ -0,0 +1,180 @@
+"""
+This module keeps the outbreak model(s) loaded by the application.
+
+Models are loaded lazily on first use and identified by a short hash of the model
+file, so a version id always names the exact bytes it was loaded from. The model
+file is re-checked at most every poll interval; when it changes the new version
+is loaded next to the old one and swapped in atomically. Requests that already
+hold a version keep using it until they finish.
+
+Pickled models (.pkl) are unpickled. With MODEL_ENGINE=array, forests are then
+compiled into an ArrayForest (see array_forest.py), which gives the same predictions
+with far less per-call overhead for single rows and small batches; sklearn stays the
+default because it is faster on large batches of deep trees. .forest files are
+memory-mapped ArrayForests, so processes loading the same file share it.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import joblib
+
+from array_forest import FOREST_SUFFIX, ArrayForest, load_forest
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.join(BASE_DIR, "models"))
+MODEL_FILENAME = os.getenv("MODEL_FILENAME", "outbreak_model.pkl")
+
+# Number of loaded versions kept in memory (the active one plus rollback targets)
+MAX_VERSIONS = 3
+POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", "2.0"))
+# 'sklearn' serves the unpickled estimator, 'array' (opt-in, for serving) compiles forests to ArrayForest
+MODEL_ENGINE = os.getenv("MODEL_ENGINE", "sklearn")
+
+
+def file_version(path: str) -> str:
+    """Version id of a model file: the first 12 hex digits of its SHA-256."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def load_model(path: str, engine: str = MODEL_ENGINE):
+    """Load a model file: memory-mapped for .forest files, unpickled otherwise."""
+    if path.endswith(FOREST_SUFFIX):
+        return load_forest(path, mmap_mode='r')
+    model = joblib.load(path)
+    if engine == 'array' and hasattr(model, 'estimators_') and hasattr(model, 'predict_proba'):
+        return ArrayForest.from_model(model)
+    return model
+
+
+class ModelVersion:
+    """A loaded model together with the file version it came from."""
+
+    __slots__ = ('version', 'path', 'model', 'loaded_at')
+
+    def __init__(self, version: str, path: str, model, loaded_at: datetime):
+        self.version = version
+        self.path = path
+        self.model = model
+        self.loaded_at = loaded_at
+
+    def describe(self) -> Dict[str, str]:
+        return {'version': self.version, 'path': self.path, 'loaded_at': self.loaded_at.isoformat()}
+
+
+class ModelRegistry:
+    """Lazily loaded, hash-versioned models with hot swapping when the model file changes."""
+
+    def __init__(self, model_dir: str = MODEL_DIR, filename: str = MODEL_FILENAME,
+                 max_versions: int = MAX_VERSIONS, poll_interval: float = POLL_INTERVAL):
+        self.model_dir = model_dir
+        self.path = os.path.join(model_dir, filename)
+        self.max_versions = max_versions
+        self.poll_interval = poll_interval
+
+        self._versions: "OrderedDict[str, ModelVersion]" = OrderedDict()
+        self._active: Optional[ModelVersion] = None
+        self._file_signature = None
+        self._next_check = 0.0
+        # Serializes loads; readers never take it once a version is active
+        self._load_lock = threading.Lock()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, signature) -> ModelVersion:
+        version = file_version(self.path)
+        loaded = self._versions.get(version)
+        if loaded is None:
+            start = time.perf_counter()
+            loaded = ModelVersion(version, self.path, load_model(self.path), datetime.now())
+            logger.info(f"Loaded model version {version} from {self.path} in {time.perf_counter() - start:.2f}s")
+        self._versions[version] = loaded
+        self._versions.move_to_end(version)
+        while len(self._versions) > self.max_versions:
+            self._versions.popitem(last=False)
+        self._file_signature = signature
+        return loaded
+
+    def refresh(self, force: bool = False) -> ModelVersion:
+        """
+        Load the model file if it changed since the last check and make it active.
+
+        A file that fails to load (for example while it is still being copied) is
+        logged and the current version stays active; it is retried on the next check.
+        """
+        with self._load_lock:
+            signature = self._signature()
+            if self._active is not None and not force and signature == self._file_signature:
+                return self._active
+            if signature is None:
+                if self._active is None:
+                    raise FileNotFoundError(f"Model file not found at: {self.path}")
+                logger.warning(f"Model file {self.path} disappeared; keeping version {self._active.version}")
+                return self._active
+            try:
+                loaded = self._load(signature)
+            except Exception as e:
+                if self._active is None:
+                    raise
+                logger.error(f"Could not load {self.path} ({e}); keeping version {self._active.version}")
+                return self._active
+            if self._active is None or loaded.version != self._active.version:
+                previous = self._active.version if self._active else None
+                # Single reference assignment: readers see either the old or the new version
+                self._active = loaded
+                if previous:
+                    logger.info(f"Swapped model version {previous} -> {loaded.version}")
+            return self._active
+
+    def current(self) -> ModelVersion:
+        """The active model version, loading it on first use and picking up file changes."""
+        active = self._active
+        now = time.monotonic()
+        if active is None or now >= self._next_check:
+            self._next_check = now + self.poll_interval
+            active = self.refresh()
+        return active
+
+    def activate(self, version: str) -> ModelVersion:
+        """Switch back to a version that is still loaded (for example to roll back)."""
+        with self._load_lock:
+            if version not in self._versions:
+                raise KeyError(f"Model version {version} is not loaded")
+            self._active = self._versions[version]
+            logger.info(f"Activated model version {version}")
+            return self._active
+
+    def versions(self) -> List[Dict[str, str]]:
+        active = self._active.version if self._active else None
+        return [dict(loaded.describe(), active=loaded.version == active)
+                for loaded in list(self._versions.values())]
+
+
+_default_registry: Optional[ModelRegistry] = None
+_default_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """Process-wide registry for the default model file."""
+    global _default_registry
+    if _default_registry is None:
+        with _default_lock:
+            if _default_registry is None:
+                _default_registry = ModelRegistry()
+    return _default_registry
@@ -0,0 +1,187 @@
+"""
+This module routes predictions to per-region models, falling back to the global model.
+
+Region models are trained by model_training.train_regions() into a directory
+(models/regions/ by default) with a manifest.json that maps every region to the
+model serving it. Several regions may share one cluster model. A region missing
+from the manifest, or the national view, is served by the global model from the
+model registry.
+
+Region models are loaded on first use and kept in a bounded LRU, so serving
+hundreds of districts only holds the most recently used models in memory. The
+manifest is re-read when it changes on disk; models whose file changed are
+dropped and reloaded on their next request.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from inference import DEFAULT_CHUNK_SIZE, score_matrix, to_feature_matrix
+from model_registry import MODEL_DIR, ModelRegistry, ModelVersion, load_model
+
+logger = logging.getLogger(__name__)
+
+REGION_MODEL_DIR = os.getenv("REGION_MODEL_DIR", os.path.join(MODEL_DIR, "regions"))
+REGION_MANIFEST_FILENAME = "manifest.json"
+# Region models kept loaded at once; the least recently used one is evicted beyond this
+MAX_LOADED_REGIONS = int(os.getenv("MAX_LOADED_REGIONS", "32"))
+
+
+class ModelRouter:
+    """Picks the model for a region: its own (or its cluster's) model if one is trained, else the global one."""
+
+    def __init__(self, registry: ModelRegistry, region_dir: str = REGION_MODEL_DIR,
+                 max_loaded: int = MAX_LOADED_REGIONS, poll_interval: Optional[float] = None):
+        self.registry = registry
+        self.region_dir = region_dir
+        self.manifest_path = os.path.join(region_dir, REGION_MANIFEST_FILENAME)
+        self.max_loaded = max_loaded
+        self.poll_interval = registry.poll_interval if poll_interval is None else poll_interval
+
+        self._routes: Dict[str, str] = {}
+        self._models: Dict[str, dict] = {}
+        self._manifest_signature = None
+        self._next_check = 0.0
+        self._loaded: "OrderedDict[str, ModelVersion]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Loads happen outside _lock so one slow load doesn't block routing to loaded models
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+        self.loads = 0
+        self.evictions = 0
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.manifest_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _check_manifest(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.poll_interval
+        signature = self._signature()
+        if signature == self._manifest_signature:
+            return
+        routes, models = {}, {}
+        if signature is not None:
+            try:
+                with open(self.manifest_path) as f:
+                    manifest = json.load(f)
+                routes, models = manifest['routes'], manifest['models']
+            except (OSError, ValueError, KeyError) as e:
+                # Keep routing with the previous manifest; it is retried on the next check
+                logger.error(f"Could not read region manifest {self.manifest_path} ({e})")
+                return
+        with self._lock:
+            for name in list(self._loaded):
+                if models.get(name, {}).get('version') != self._loaded[name].version:
+                    del self._loaded[name]
+            self._routes, self._models = routes, models
+            self._manifest_signature = signature
+        logger.info(f"Region manifest: {len(models)} models serving {len(routes)} regions")
+
+    def model_name(self, region: Optional[str]) -> Optional[str]:
+        """Name of the region (or cluster) model serving a region, or None for the global model."""
+        self._check_manifest()
+        return self._routes.get(region) if region else None
+
+    def _load(self, name: str) -> ModelVersion:
+        entry = self._models[name]
+        path = os.path.join(self.region_dir, entry['file'])
+        start = time.perf_counter()
+        loaded = ModelVersion(entry['version'], path, load_model(path), datetime.now())
+        logger.info(f"Loaded region model {name} ({loaded.version}) in {time.perf_counter() - start:.2f}s")
+        return loaded
+
+    def _get(self, name: str) -> ModelVersion:
+        with self._lock:
+            loaded = self._loaded.get(name)
+            if loaded is not None:
+                self._loaded.move_to_end(name)
+                return loaded
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            with self._lock:
+                loaded = self._loaded.get(name)
+            if loaded is None:
+                loaded = self._load(name)
+                with self._lock:
+                    self.loads += 1
+            with self._lock:
+                self._loaded[name] = loaded
+                self._loaded.move_to_end(name)
+                while len(self._loaded) > self.max_loaded:
+                    evicted, _ = self._loaded.popitem(last=False)
+                    self.evictions += 1
+                    logger.debug(f"Evicted region model {evicted}")
+        return loaded
+
+    def route(self, region: Optional[str]) -> Tuple[Optional[str], ModelVersion]:
+        """
+        The model serving a region.
+        Returns:
+            tuple: (region model name or None for the global model, loaded model version).
+                A region model that fails to load falls back to the global model.
+        """
+        name = self.model_name(region)
+        if name is not None:
+            try:
+                return name, self._get(name)
+            except Exception as e:
+                logger.error(f"Could not load region model {name} for {region} ({e}); using the global model")
+        return None, self.registry.current()
+
+    def score_frame(self, frame: pd.DataFrame, region: Optional[str] = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[np.ndarray, np.ndarray, Dict[str, str]]:
+        """
+        Score feature rows, each with the model of its 'Region' column (or of `region`).
+        Returns:
+            tuple: (labels, outbreak probabilities, model name -> version used), where
+                the global model is listed as 'global'.
+        """
+        X = to_feature_matrix(frame)
+        if 'Region' in frame.columns:
+            regions = frame['Region'].astype(object).where(frame['Region'].notna(), region).to_numpy()
+        else:
+            regions = np.full(len(frame), region, dtype=object)
+
+        labels = probabilities = None
+        used = {}
+        for value in pd.unique(regions):
+            rows = np.flatnonzero(regions == value) if value is not None else np.flatnonzero(pd.isna(regions))
+            name, active = self.route(value)
+            group_labels, group_probabilities = score_matrix(active.model, X[rows], chunk_size=chunk_size)
+            if labels is None:
+                labels = np.empty(len(frame), dtype=group_labels.dtype)
+                probabilities = np.empty(len(frame), dtype=np.float64)
+            labels[rows] = group_labels
+            probabilities[rows] = group_probabilities
+            used[name or 'global'] = active.version
+        if labels is None:
+            active = self.registry.current()
+            labels, probabilities = score_matrix(active.model, X, chunk_size=chunk_size)
+            used['global'] = active.version
+        return labels, probabilities, used
+
+    def stats(self) -> Dict[str, object]:
+        self._check_manifest()
+        with self._lock:
+            return {
+                'regions': len(self._routes),
+                'models': len(self._models),
+                'loaded': list(self._loaded),
+                'max_loaded': self.max_loaded,
+                'loads': self.loads,
+                'evictions': self.evictions,
+            }
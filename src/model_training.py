@@ -1,29 +1,600 @@
+"""
+This module trains the outbreak model.
+
+A cross-validated hyperparameter search runs its (parameters, fold) fits in a
+process pool across all cores. Every finished fold is cached on disk, keyed on the
+training data, the CV setup and the parameters, so an interrupted search picks up
+where it stopped. The best parameters are refit on the training split and saved as
+a versioned artifact with a metrics JSON; publishing copies it over the model file
+the app serves, which the model registry then hot-swaps in.
+
+Incremental mode grows a few extra trees (warm_start) on only the rows that arrived
+since the served model was trained, and publishes the result only if it scores at
+least as well on a holdout. Its cost depends on the new data, not on the history.
+
+Holdout rows are chosen by hashing each row, so the same rows are held out by every
+full and incremental run and never leak into training.
+
+Region mode trains one model per region (or per cluster of regions) in parallel
+and writes them with a routing manifest for model_router.py. A region keeps its
+own model only if it beats the global model on that region's holdout rows.
+
+    python src/model_training.py --workers 8
+    python src/model_training.py --grid '{"n_estimators": [100, 300], "max_depth": [null, 12]}'
+    python src/model_training.py --incremental
+    python src/model_training.py --regions --clusters clusters.json
+"""
+import os
+import sys
+import copy
+import json
+import time
+import re
+import shutil
+import hashlib
+import logging
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, classification_report
-import joblib
-import os
+from sklearn.metrics import accuracy_score, classification_report, get_scorer
+from sklearn.model_selection import StratifiedKFold
+
+from array_forest import ArrayForest, save_forest
+from inference import predict_proba
+from model_registry import MODEL_DIR, MODEL_FILENAME, file_version, load_model
+from model_router import REGION_MANIFEST_FILENAME, REGION_MODEL_DIR
+from storage import PROCESSED_DATASET_DIR, read_processed
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ['NewCases', 'Humidity_x', 'PopulationDensity', 'Temperature', 'Rainfall']
+TARGET = 'OutbreakRisk'
+
+SEARCH_CACHE_DIR = os.path.join(MODEL_DIR, "search_cache")
+TRAINING_STATE_FILENAME = "training_state.json"
+
+DEFAULT_PARAM_GRID = {
+    'n_estimators': [100, 200],
+    'max_depth': [None, 10, 20],
+    'min_samples_leaf': [1, 5],
+}
+DEFAULT_CV = 5
+DEFAULT_SCORING = 'accuracy'
+RANDOM_STATE = 42
+HOLDOUT_FRACTION = 0.2
+
+# Incremental retraining: trees grown per update, cap on the forest size (the oldest
+# trees are dropped beyond it) and how many recent days of holdout rows to score on
+DEFAULT_TREES_PER_UPDATE = 10
+DEFAULT_MAX_TREES = 300
+DEFAULT_HOLDOUT_DAYS = 14
+
+# Region models: parameters used when no global training run is recorded, and the
+# fewest training rows a region (or cluster) needs to get a model of its own
+DEFAULT_REGION_PARAMS = {'n_estimators': 100}
+MIN_REGION_ROWS = 50
+
+# Training data shared with the search workers, set once per process
+_worker_data = None
+
+
+def load_training_data(start=None, root: str = PROCESSED_DATASET_DIR, extra_columns=()) -> pd.DataFrame:
+    """Load the feature, target and Date columns (plus `extra_columns`) from the processed store."""
+    return read_processed(columns=FEATURES + [TARGET, 'Date'] + list(extra_columns), start=start, root=root)
+
+
+def holdout_mask(data: pd.DataFrame, fraction: float = HOLDOUT_FRACTION) -> np.ndarray:
+    """Deterministic per-row holdout selection, stable across runs and data appends."""
+    columns = [column for column in FEATURES + [TARGET, 'Date'] if column in data.columns]
+    hashes = pd.util.hash_pandas_object(data[columns], index=False).to_numpy()
+    return (hashes % 1000) < int(round(fraction * 1000))
+
+
+def load_training_state(model_dir: str = MODEL_DIR) -> Optional[dict]:
+    """What the served model was trained on, as recorded by the last published run."""
+    path = os.path.join(model_dir, TRAINING_STATE_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_training_state(metrics: dict, data: pd.DataFrame, model_dir: str) -> None:
+    trained_through = pd.to_datetime(data['Date']).max() if 'Date' in data.columns and len(data) else None
+    _write_json(os.path.join(model_dir, TRAINING_STATE_FILENAME), {
+        'version': metrics['version'],
+        'model_path': metrics['model_path'],
+        'trained_through': None if trained_through is None else trained_through.date().isoformat(),
+        'params': metrics['params'],
+        'n_estimators': metrics['n_estimators'],
+        'holdout_fraction': metrics['holdout_fraction'],
+        'updated_at': datetime.now().isoformat(),
+    })
+
+
+def expand_grid(param_grid: Dict[str, list]) -> List[dict]:
+    """Every combination of a parameter grid, in a stable order."""
+    names = sorted(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+
+
+def _fingerprint(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _write_json(path: str, payload: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def _init_worker(X, y):
+    global _worker_data
+    _worker_data = (X, y)
+
+
+def _fit_fold(params, train_index, test_index, scoring):
+    X, y = _worker_data
+    start = time.perf_counter()
+    model = RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=1, **params)
+    model.fit(X[train_index], y[train_index])
+    fit_time = time.perf_counter() - start
+    score = get_scorer(scoring)(model, X[test_index], y[test_index])
+    return {'score': float(score), 'fit_time': fit_time}
+
+
+def search(X: np.ndarray, y: np.ndarray, param_grid: Optional[Dict[str, list]] = None, cv: int = DEFAULT_CV,
+           scoring: str = DEFAULT_SCORING, workers: Optional[int] = None,
+           cache_dir: str = SEARCH_CACHE_DIR) -> List[dict]:
+    """
+    Cross-validate every parameter combination, resuming from cached fold results.
+    Args:
+        X (np.ndarray): Training features.
+        y (np.ndarray): Training labels.
+        param_grid (dict): Parameter name -> candidate values (DEFAULT_PARAM_GRID if omitted).
+        cv (int): Number of stratified folds.
+        scoring (str): sklearn scorer name.
+        workers (int): Processes fitting folds in parallel (all cores if omitted).
+        cache_dir (str): Where fold results are cached.
+    Returns:
+        list: One dict per parameter combination (params, mean_score, std_score,
+            mean_fit_time), best first.
+    """
+    candidates = expand_grid(param_grid or DEFAULT_PARAM_GRID)
+    folds = list(StratifiedKFold(n_splits=cv, shuffle=True, random_state=RANDOM_STATE).split(X, y))
+
+    # Cached folds are only reused for the same data, folds and scorer
+    run_dir = os.path.join(cache_dir, _fingerprint(X, y, cv, scoring, RANDOM_STATE))
+    os.makedirs(run_dir, exist_ok=True)
+
+    results = {}
+    pending = []
+    for params in candidates:
+        for fold, (train_index, test_index) in enumerate(folds):
+            path = os.path.join(run_dir, f"{_fingerprint(params)}-fold{fold}.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    results[path] = json.load(f)
+            else:
+                pending.append((path, params, fold, train_index, test_index))
+
+    total = len(candidates) * len(folds)
+    if results:
+        logger.info(f"Resuming search: {len(results)} of {total} fold fits cached in {run_dir}")
+    if pending:
+        logger.info(f"Fitting {len(pending)} folds for {len(candidates)} parameter sets "
+                    f"with {workers or os.cpu_count()} workers")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y)) as executor:
+            futures = {
+                executor.submit(_fit_fold, params, train_index, test_index, scoring): (path, params, fold)
+                for path, params, fold, train_index, test_index in pending
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                path, params, fold = futures[future]
+                result = dict(future.result(), params=params, fold=fold)
+                # Written as each fold finishes, so an interrupted search loses at most the running fits
+                _write_json(path, result)
+                results[path] = result
+                logger.info(f"[{done}/{len(pending)}] {params} fold {fold}: {scoring}={result['score']:.4f}")
+
+    summary = []
+    for params in candidates:
+        folds_done = [r for r in results.values() if r['params'] == params]
+        scores = [r['score'] for r in folds_done]
+        summary.append({
+            'params': params,
+            'mean_score': float(np.mean(scores)),
+            'std_score': float(np.std(scores)),
+            'mean_fit_time': float(np.mean([r['fit_time'] for r in folds_done])),
+        })
+    summary.sort(key=lambda r: (-r['mean_score'], r['mean_fit_time']))
+    return summary
+
+
+def predict_latency(model, X: np.ndarray, repeats: int = 200) -> Dict[str, float]:
+    """Median single-row and per-row batch latency in milliseconds, for sklearn and ArrayForest."""
+    latency = {}
+    rows = X[:1000]
+    for engine, scorer in (('sklearn', model), ('array', ArrayForest.from_model(model))):
+        single = []
+        for i in range(repeats):
+            start = time.perf_counter()
+            predict_proba(scorer, rows[i % len(rows):i % len(rows) + 1])
+            single.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        predict_proba(scorer, rows)
+        latency[f'{engine}_single_row_ms'] = float(np.median(single) * 1000)
+        latency[f'{engine}_batch_per_row_ms'] = (time.perf_counter() - start) * 1000 / len(rows)
+    return latency
+
+
+def save_artifact(model, metrics: dict, publish: bool = True, model_dir: str = MODEL_DIR) -> dict:
+    """
+    Save a trained model under versions/ with its metrics, and optionally publish it.
+
+    Publishing replaces the served model file atomically (and its .forest export, if
+    one is deployed), so the running app swaps to the new version without a restart.
+    Returns:
+        dict: The metrics, including version and artifact paths.
+    """
+    versions_dir = os.path.join(model_dir, "versions")
+    os.makedirs(versions_dir, exist_ok=True)
+    tmp_path = os.path.join(versions_dir, f".training-{os.getpid()}.pkl")
+    joblib.dump(model, tmp_path)
+    version = file_version(tmp_path)
+
+    model_path = os.path.join(versions_dir, f"outbreak_model-{version}.pkl")
+    os.replace(tmp_path, model_path)
+    metrics = dict(metrics, version=version, model_path=model_path,
+                   metrics_path=os.path.join(versions_dir, f"outbreak_model-{version}.metrics.json"))
+
+    if publish:
+        served_path = os.path.join(model_dir, MODEL_FILENAME)
+        if served_path.endswith(".pkl"):
+            shutil.copyfile(model_path, f"{served_path}.tmp")
+            os.replace(f"{served_path}.tmp", served_path)
+        forest_path = os.path.join(model_dir, os.path.splitext(MODEL_FILENAME)[0] + ".forest")
+        if os.path.exists(forest_path) or served_path.endswith(".forest"):
+            save_forest(model, forest_path)
+        metrics['published_to'] = served_path
+        logger.info(f"Published model version {version} to {served_path}")
+
+    _write_json(metrics['metrics_path'], metrics)
+    return metrics
+
+
+def train(data: Optional[pd.DataFrame] = None, param_grid: Optional[Dict[str, list]] = None,
+          cv: int = DEFAULT_CV, scoring: str = DEFAULT_SCORING, workers: Optional[int] = None,
+          test_size: float = 0.2, publish: bool = True, cache_dir: str = SEARCH_CACHE_DIR,
+          model_dir: str = MODEL_DIR) -> dict:
+    """
+    Run the search, refit the best parameters on all cores and save the model.
+    Args:
+        data (pd.DataFrame): Rows with FEATURES and TARGET; the processed store if omitted.
+        param_grid (dict): Search space (DEFAULT_PARAM_GRID if omitted).
+        cv (int): Cross-validation folds.
+        scoring (str): sklearn scorer used to pick the parameters.
+        workers (int): Processes for the search (all cores if omitted).
+        test_size (float): Holdout fraction used for the reported accuracy.
+        publish (bool): Replace the served model with the result.
+    Returns:
+        dict: The metrics written next to the model artifact.
+    """
+    if data is None:
+        data = load_training_data()
+    X = data[FEATURES].to_numpy(dtype=np.float64)
+    y = data[TARGET].to_numpy()
+    held_out = holdout_mask(data, test_size)
+    X_train, X_test, y_train, y_test = X[~held_out], X[held_out], y[~held_out], y[held_out]
+
+    search_start = time.perf_counter()
+    results = search(X_train, y_train, param_grid, cv=cv, scoring=scoring, workers=workers, cache_dir=cache_dir)
+    search_time = time.perf_counter() - search_start
+    best = results[0]
+    logger.info(f"Best parameters {best['params']}: {scoring}={best['mean_score']:.4f} ± {best['std_score']:.4f}")
+
+    # Refit with a DataFrame so the model keeps its feature names
+    start = time.perf_counter()
+    model = RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=-1, **best['params'])
+    model.fit(pd.DataFrame(X_train, columns=FEATURES), y_train)
+    fit_time = time.perf_counter() - start
+    # Serve single-threaded: joblib's thread pool costs more than it saves per request
+    model.set_params(n_jobs=None)
+
+    y_pred = model.predict(pd.DataFrame(X_test, columns=FEATURES))
+    metrics = {
+        'trained_at': datetime.now().isoformat(),
+        'features': FEATURES,
+        'n_train': int(len(X_train)),
+        'n_test': int(len(X_test)),
+        'params': best['params'],
+        'n_estimators': len(model.estimators_),
+        'holdout_fraction': test_size,
+        'cv_folds': cv,
+        'scoring': scoring,
+        'cv_score': best['mean_score'],
+        'cv_score_std': best['std_score'],
+        'search_time_s': search_time,
+        'fit_time_s': fit_time,
+        'accuracy': float(accuracy_score(y_test, y_pred)),
+        'classification_report': classification_report(y_test, y_pred, output_dict=True, zero_division=0),
+        'predict_latency': predict_latency(model, X_test),
+        'search_results': results,
+    }
+    metrics = save_artifact(model, metrics, publish=publish, model_dir=model_dir)
+    if publish:
+        _save_training_state(metrics, data, model_dir)
+    return metrics
+
+
+def retrain_incremental(trees_per_update: int = DEFAULT_TREES_PER_UPDATE, max_trees: int = DEFAULT_MAX_TREES,
+                        holdout_days: int = DEFAULT_HOLDOUT_DAYS, tolerance: float = 0.0,
+                        publish: bool = True, model_dir: str = MODEL_DIR,
+                        root: str = PROCESSED_DATASET_DIR, workers: Optional[int] = None) -> dict:
+    """
+    Grow extra trees on the rows that arrived since the served model was trained.
+
+    The candidate is the served forest plus `trees_per_update` trees fitted with
+    warm_start on only the new (non-holdout) rows. It is scored against the served
+    model on the holdout rows of the last `holdout_days` days and published only if
+    its accuracy is at most `tolerance` below the served model's. Without a recorded
+    training state this falls back to a full train().
+    Args:
+        workers (int): Parallel jobs growing the new trees (all cores if omitted).
+    Returns:
+        dict: The run's metrics, with 'status' one of published, rejected, up_to_date
+            or waiting (new rows do not contain every class yet).
+    """
+    state = load_training_state(model_dir)
+    if state is None or not state.get('trained_through') or not os.path.exists(state['model_path']):
+        logger.info("No training state recorded; running a full training instead")
+        return dict(train(data=load_training_data(root=root), workers=workers, publish=publish,
+                          model_dir=model_dir),
+                    status='published' if publish else 'trained')
+
+    trained_through = pd.Timestamp(state['trained_through'])
+    # Only the partitions since the last training (plus the holdout window) are read
+    recent = load_training_data(start=trained_through - timedelta(days=holdout_days - 1), root=root)
+    new_rows = recent[recent['Date'] > trained_through]
+    if new_rows.empty:
+        logger.info(f"No rows after {trained_through.date()}; model version {state['version']} is up to date")
+        return {'status': 'up_to_date', 'version': state['version'], 'trained_through': state['trained_through']}
+
+    fraction = state.get('holdout_fraction', HOLDOUT_FRACTION)
+    current = joblib.load(state['model_path'])
+    new_train = new_rows[~holdout_mask(new_rows, fraction)]
+    if not np.array_equal(np.unique(new_train[TARGET]), current.classes_):
+        # warm_start refits classes_ from y, so every class must be present in the new rows
+        logger.info(f"{len(new_train)} new rows do not cover every class yet; waiting for more data")
+        return {'status': 'waiting', 'version': state['version'], 'n_new_rows': int(len(new_rows))}
+
+    start = time.perf_counter()
+    # The served forest is kept for the comparison; the candidate grows on a copy
+    candidate = copy.deepcopy(current)
+    candidate.set_params(warm_start=True, n_jobs=workers or -1,
+                         n_estimators=len(candidate.estimators_) + trees_per_update)
+    candidate.fit(new_train[FEATURES], new_train[TARGET])
+    if len(candidate.estimators_) > max_trees:
+        candidate.estimators_ = candidate.estimators_[-max_trees:]
+    candidate.set_params(warm_start=False, n_jobs=None, n_estimators=len(candidate.estimators_))
+    fit_time = time.perf_counter() - start
+
+    holdout = recent[holdout_mask(recent, fraction)]
+    X_holdout, y_holdout = holdout[FEATURES], holdout[TARGET].to_numpy()
+    current_accuracy = float(accuracy_score(y_holdout, current.predict(X_holdout)))
+    candidate_accuracy = float(accuracy_score(y_holdout, candidate.predict(X_holdout)))
+    accepted = candidate_accuracy >= current_accuracy - tolerance
+
+    metrics = {
+        'trained_at': datetime.now().isoformat(),
+        'mode': 'incremental',
+        'features': FEATURES,
+        'base_version': state['version'],
+        'params': state['params'],
+        'n_estimators': len(candidate.estimators_),
+        'holdout_fraction': fraction,
+        'n_new_rows': int(len(new_rows)),
+        'n_train': int(len(new_train)),
+        'n_holdout': int(len(holdout)),
+        'fit_time_s': fit_time,
+        'holdout_accuracy': candidate_accuracy,
+        'base_holdout_accuracy': current_accuracy,
+        'accuracy': candidate_accuracy,
+    }
+    logger.info(f"Grew {trees_per_update} trees on {len(new_train)} new rows in {fit_time:.2f}s; "
+                f"holdout accuracy {current_accuracy:.4f} -> {candidate_accuracy:.4f}")
+
+    if not accepted:
+        # The new rows stay untrained on; the next run retries with them included
+        logger.warning(f"Candidate is worse on the holdout; keeping model version {state['version']}")
+        return dict(metrics, status='rejected', version=state['version'])
+
+    metrics['predict_latency'] = predict_latency(candidate, X_holdout.to_numpy(dtype=np.float64))
+    metrics = save_artifact(candidate, metrics, publish=publish, model_dir=model_dir)
+    if publish:
+        _save_training_state(metrics, new_rows, model_dir)
+    return dict(metrics, status='published' if publish else 'trained')
+
+
+def _slug(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'region'
+
+
+def _fit_region(name, params, X_train, y_train, X_test, y_test, region_dir):
+    start = time.perf_counter()
+    model = RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=1, **params)
+    model.fit(pd.DataFrame(X_train, columns=FEATURES), y_train)
+    fit_time = time.perf_counter() - start
+    X_test = pd.DataFrame(X_test, columns=FEATURES)
+    accuracy = float(accuracy_score(y_test, model.predict(X_test))) if len(y_test) else None
+
+    tmp_path = os.path.join(region_dir, f".training-{_slug(name)}-{os.getpid()}.pkl")
+    joblib.dump(model, tmp_path)
+    version = file_version(tmp_path)
+    filename = f"{_slug(name)}-{version}.pkl"
+    os.replace(tmp_path, os.path.join(region_dir, filename))
+    return {'file': filename, 'version': version, 'accuracy': accuracy, 'fit_time_s': fit_time}
+
+
+def train_regions(data: Optional[pd.DataFrame] = None, clusters: Optional[Dict[str, List[str]]] = None,
+                  params: Optional[dict] = None, min_rows: int = MIN_REGION_ROWS, tolerance: float = 0.0,
+                  workers: Optional[int] = None, test_size: Optional[float] = None,
+                  model_dir: str = MODEL_DIR, region_dir: str = REGION_MODEL_DIR) -> dict:
+    """
+    Train one model per region (or per cluster of regions) in parallel and write the routing manifest.
+    Args:
+        data (pd.DataFrame): Rows with Region, FEATURES and TARGET; the processed store if omitted.
+        clusters (dict): Cluster name -> regions sharing one model; other regions get their own.
+        params (dict): Forest parameters; those of the last global training run if omitted.
+        min_rows (int): Fewest training rows for a region (or cluster) model.
+        tolerance (float): Accuracy a region model may lose against the global model and still be kept.
+        workers (int): Processes fitting models in parallel (all cores if omitted).
+        test_size (float): Holdout fraction; that of the global model if omitted, so both
+            are scored on the same rows.
+    Returns:
+        dict: The manifest, with routes (region -> model name) and models (name -> file,
+            version and holdout accuracy of the region and global model).
+    """
+    state = load_training_state(model_dir) or {}
+    params = params or state.get('params') or DEFAULT_REGION_PARAMS
+    test_size = test_size if test_size is not None else state.get('holdout_fraction', HOLDOUT_FRACTION)
+    if data is None:
+        data = load_training_data(extra_columns=['Region'])
+    data = data.reset_index(drop=True)
+
+    region_to_group = {region: name for name, regions in (clusters or {}).items() for region in regions}
+    groups = data['Region'].astype(str).map(lambda region: region_to_group.get(region, region))
+    held_out = holdout_mask(data, test_size)
+    X = data[FEATURES].to_numpy(dtype=np.float64)
+    y = data[TARGET].to_numpy()
+    global_model = load_model(os.path.join(model_dir, MODEL_FILENAME), engine='sklearn')
+
+    os.makedirs(region_dir, exist_ok=True)
+    models, skipped = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for name, rows in groups.groupby(groups, sort=True).groups.items():
+            rows = rows.to_numpy()
+            train_rows, test_rows = rows[~held_out[rows]], rows[held_out[rows]]
+            if len(train_rows) < min_rows or len(np.unique(y[train_rows])) < 2:
+                skipped[name] = f"{len(train_rows)} training rows"
+                continue
+            futures[executor.submit(_fit_region, name, params, X[train_rows], y[train_rows],
+                                    X[test_rows], y[test_rows], region_dir)] = (name, train_rows, test_rows)
+        for future in as_completed(futures):
+            name, train_rows, test_rows = futures[future]
+            result = future.result()
+            global_accuracy = (float(accuracy_score(y[test_rows], global_model.predict(X[test_rows])))
+                               if len(test_rows) else None)
+            result.update(n_train=int(len(train_rows)), n_test=int(len(test_rows)), global_accuracy=global_accuracy)
+            if (result['accuracy'] is None or global_accuracy is None
+                    or result['accuracy'] < global_accuracy - tolerance):
+                # Not better than the global model here; the region keeps routing to it
+                os.remove(os.path.join(region_dir, result['file']))
+                skipped[name] = f"holdout accuracy {result['accuracy']} vs global {global_accuracy}"
+                continue
+            models[name] = result
+            logger.info(f"Region model {name}: accuracy {result['accuracy']:.4f} "
+                        f"(global {global_accuracy:.4f}) on {len(test_rows)} holdout rows")
+
+    routes = {region: group for region, group in zip(data['Region'].astype(str), groups) if group in models}
+    manifest = {
+        'trained_at': datetime.now().isoformat(),
+        'base_version': state.get('version'),
+        'params': params,
+        'holdout_fraction': test_size,
+        'routes': dict(sorted(routes.items())),
+        'models': dict(sorted(models.items())),
+        'skipped': dict(sorted(skipped.items())),
+    }
+    _write_json(os.path.join(region_dir, REGION_MANIFEST_FILENAME), manifest)
+
+    # Model files no longer in the manifest are removed once the new manifest is in place
+    referenced = {entry['file'] for entry in models.values()} | {REGION_MANIFEST_FILENAME}
+    for filename in os.listdir(region_dir):
+        if filename not in referenced and not filename.startswith('.'):
+            os.remove(os.path.join(region_dir, filename))
+    logger.info(f"Trained {len(models)} region models serving {len(routes)} regions; "
+                f"{len(skipped)} fall back to the global model")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the outbreak model with a cross-validated parameter search.")
+    parser.add_argument("--grid", type=json.loads, help="JSON object of parameter name -> list of values")
+    parser.add_argument("--cv", type=int, default=DEFAULT_CV, help="Cross-validation folds")
+    parser.add_argument("--scoring", default=DEFAULT_SCORING, help="sklearn scorer used to pick parameters")
+    parser.add_argument("--workers", type=int,
+                        help="Processes used for the search, or jobs growing trees with --incremental "
+                             "(default: all cores)")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Holdout fraction for the reported accuracy")
+    parser.add_argument("--no-publish", action="store_true", help="Save the versioned artifact only")
+    parser.add_argument("--clear-cache", action="store_true", help="Discard cached fold results first")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Grow trees on rows added since the last training instead of a full search")
+    parser.add_argument("--trees-per-update", type=int, default=DEFAULT_TREES_PER_UPDATE,
+                        help="Trees grown per incremental update")
+    parser.add_argument("--max-trees", type=int, default=DEFAULT_MAX_TREES,
+                        help="Forest size cap for incremental updates (oldest trees are dropped)")
+    parser.add_argument("--holdout-days", type=int, default=DEFAULT_HOLDOUT_DAYS,
+                        help="Recent days of holdout rows an incremental update is validated on")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="Accuracy drop allowed before an incremental update or region model is rejected")
+    parser.add_argument("--regions", action="store_true",
+                        help="Train per-region models for the router instead of the global model")
+    parser.add_argument("--clusters", help="JSON file of cluster name -> regions sharing one model")
+    parser.add_argument("--min-region-rows", type=int, default=MIN_REGION_ROWS,
+                        help="Fewest training rows for a region (or cluster) model")
+    args = parser.parse_args(argv)
+
+    if args.clear_cache:
+        shutil.rmtree(SEARCH_CACHE_DIR, ignore_errors=True)
 
-# Load data
-data = pd.read_csv('data/processed/merged_data.csv')
+    if args.regions:
+        clusters = None
+        if args.clusters:
+            with open(args.clusters) as f:
+                clusters = json.load(f)
+        manifest = train_regions(clusters=clusters, min_rows=args.min_region_rows, tolerance=args.tolerance,
+                                 workers=args.workers)
+        print(f"{len(manifest['models'])} region models serving {len(manifest['routes'])} regions "
+              f"written to {REGION_MODEL_DIR}")
+        return 0
 
-# Define features and target
-X = data[['NewCases', 'Humidity_x', 'PopulationDensity', 'Temperature', 'Rainfall']]
-y = data['OutbreakRisk']
+    if args.incremental:
+        metrics = retrain_incremental(trees_per_update=args.trees_per_update, max_trees=args.max_trees,
+                                      holdout_days=args.holdout_days, tolerance=args.tolerance,
+                                      publish=not args.no_publish, workers=args.workers)
+        print(f"Incremental retraining: {metrics['status']} (model version {metrics['version']})")
+        return 0
 
-# Split data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    try:
+        metrics = train(param_grid=args.grid, cv=args.cv, scoring=args.scoring, workers=args.workers,
+                        test_size=args.test_size, publish=not args.no_publish)
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; finished folds are cached and the next run resumes from them")
+        return 130
 
-# Train model
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X_train, y_train)
+    print(f"Accuracy: {metrics['accuracy']:.2f}")
+    print(f"Model version {metrics['version']} saved to {metrics['model_path']}")
+    print(f"Metrics written to {metrics['metrics_path']}")
+    return 0
 
-# Evaluate
-y_pred = model.predict(X_test)
-print(f"Accuracy: {accuracy_score(y_test, y_pred):.2f}")
 
-# Save model
-os.makedirs('models', exist_ok=True)  # Create folder if missing
-joblib.dump(model, 'models/outbreak_model.pkl')
-print("Model saved successfully!")
\ No newline at end of file
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
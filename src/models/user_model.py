@@ -1,12 +1,12 @@
 from flask_login import UserMixin
-import firebase_admin
-from firebase_admin import credentials, auth
 import logging
 
+from identity import get_identity_service
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Initialize Firebase Admin SDK (will be done in the app.py file)
+# Lookups go through the identity cache (identity.py), which talks to Firebase
 # db = SQLAlchemy() - removed for Firebase implementation
 
 class User(UserMixin):
@@ -18,15 +18,15 @@ class User(UserMixin):
     @staticmethod
     def get_by_email(email):
         try:
-            user = auth.get_user_by_email(email)
+            user = get_identity_service().get_user_by_email(email)
+            if user is None:
+                return None
             
             return User(
                 uid=user.uid,
-                username=user.display_name or email.split('@')[0],
+                username=user.username,
                 email=user.email
             )
-        except auth.UserNotFoundError:
-            return None
         except Exception as e:
             logger.error(f"Error getting user by email: {str(e)}")
             return None
@@ -34,19 +34,45 @@ class User(UserMixin):
     @staticmethod
     def get_by_id(uid):
         try:
-            user = auth.get_user(uid)
+            user = get_identity_service().get_user(uid)
+            if user is None:
+                return None
             
             return User(
                 uid=user.uid,
-                username=user.display_name or user.email.split('@')[0],
+                username=user.username,
                 email=user.email
             )
-        except auth.UserNotFoundError:
-            return None
         except Exception as e:
             logger.error(f"Error getting user by ID: {str(e)}")
             return None
 
+    @staticmethod
+    def get_many_by_email(emails):
+        """Users for many emails in batched lookups; emails with no user are left out."""
+        try:
+            found = get_identity_service().get_users_by_email(emails)
+        except Exception as e:
+            logger.error(f"Error getting users by email: {str(e)}")
+            return {}
+        return {
+            email: User(uid=user.uid, username=user.username, email=user.email)
+            for email, user in found.items() if user is not None
+        }
+
+    @staticmethod
+    def get_many_by_id(uids):
+        """Users for many uids in batched lookups; uids with no user are left out."""
+        try:
+            found = get_identity_service().get_users(uids)
+        except Exception as e:
+            logger.error(f"Error getting users by ID: {str(e)}")
+            return {}
+        return {
+            uid: User(uid=user.uid, username=user.username, email=user.email)
+            for uid, user in found.items() if user is not None
+        }
+
     # This method is no longer needed since we're using client-side Firebase SDK
     # for user creation, but we'll keep it for compatibility
     @staticmethod
@@ -54,20 +80,22 @@ class User(UserMixin):
         # Simply fetch the user that was created by the client-side SDK
         # We don't need to create the user again on the server side
         try:
-            try:
-                # Check if the user exists by email
-                user_record = auth.get_user_by_email(email)
-                
-                # User exists, return a User object
-                return User(
-                    uid=user_record.uid,
-                    username=username or user_record.display_name or email.split('@')[0],
-                    email=email
-                )
-            except auth.UserNotFoundError:
+            # Check if the user exists by email; the client has just created it, so a
+            # cached "not found" from before is dropped first
+            identity = get_identity_service()
+            identity.invalidate(email=email)
+            user_record = identity.get_user_by_email(email)
+            if user_record is None:
                 # If user doesn't exist in Firebase, it means there was an issue with client-side creation
                 logger.warning(f"User with email {email} not found in Firebase after client-side creation")
                 return None
+            
+            # User exists, return a User object
+            return User(
+                uid=user_record.uid,
+                username=username or user_record.username,
+                email=email
+            )
         except Exception as e:
             logger.error(f"Error creating user: {str(e)}")
             return None
\ No newline at end of file
@@ -1,8 +1,20 @@
-import joblib
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 
-# Load the trained model
-model = joblib.load('models/outbreak_model.pkl')
+from inference import DEFAULT_CHUNK_SIZE, BatchInputError, score_frame
+from model_registry import get_registry, load_model
+
+# Same model file the web app serves, loaded on first use
+MODEL_PATH = get_registry().path
+
+# Model used by process pool workers, loaded once per worker
+_worker_model = None
 
 def predict_outbreak(new_data):
     """
@@ -14,22 +26,148 @@ def predict_outbreak(new_data):
     """
     # Convert input to DataFrame
     input_df = pd.DataFrame([new_data])
-    
+
     # Predict
-    prediction = model.predict(input_df)
+    prediction = get_registry().current().model.predict(input_df)
     return prediction[0]
 
-# Example usage
+def _init_worker(model_path):
+    global _worker_model
+    _worker_model = load_model(model_path, engine='sklearn')
+
+def _score_chunk(chunk):
+    return score_frame(_worker_model, chunk, chunk_size=len(chunk) or 1)
+
+def _add_predictions(chunk, labels, probabilities):
+    chunk = chunk.copy()
+    chunk['Prediction'] = labels
+    chunk['OutbreakProbability'] = probabilities
+    return chunk
+
+class ChunkWriter:
+    """Append scored chunks to a CSV or Parquet file as they arrive."""
+
+    def __init__(self, path, output_format):
+        self.path = path
+        self.output_format = output_format
+        self._parquet_writer = None
+        self._wrote_header = False
+
+    def write(self, chunk):
+        if self.output_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._parquet_writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=self._parquet_writer.schema, preserve_index=False)
+            self._parquet_writer.write_table(table)
+        else:
+            chunk.to_csv(self.path, mode='a' if self._wrote_header else 'w',
+                         header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+def score_file(input_path, output_path, model_path=MODEL_PATH, chunksize=DEFAULT_CHUNK_SIZE,
+               workers=1, output_format=None):
+    """
+    Stream a merged_data.csv-shaped file through the model chunk by chunk.
+    Args:
+        input_path (str): CSV file with the model feature columns.
+        output_path (str): Destination for the input rows plus predictions.
+        model_path (str): Model to score with.
+        chunksize (int): Rows read and scored per chunk.
+        workers (int): Number of processes scoring chunks in parallel.
+        output_format (str): 'csv' or 'parquet'; inferred from output_path if omitted.
+    Returns:
+        tuple: (rows scored, elapsed seconds).
+    """
+    if output_format is None:
+        output_format = 'parquet' if output_path.endswith(('.parquet', '.pq')) else 'csv'
+
+    start = time.perf_counter()
+    n_rows = 0
+    writer = ChunkWriter(output_path, output_format)
+    reader = pd.read_csv(input_path, chunksize=chunksize)
+
+    try:
+        if workers <= 1:
+            scoring_model = (load_model(model_path, engine='sklearn') if model_path != MODEL_PATH
+                             else get_registry().current().model)
+            for chunk in reader:
+                labels, probabilities = score_frame(scoring_model, chunk, chunk_size=chunksize)
+                writer.write(_add_predictions(chunk, labels, probabilities))
+                n_rows += len(chunk)
+        else:
+            # Keep at most two chunks per worker in flight so memory stays bounded,
+            # and write results back in input order.
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(model_path,)) as executor:
+                pending = deque()
+                for chunk in reader:
+                    pending.append((chunk, executor.submit(_score_chunk, chunk)))
+                    if len(pending) >= workers * 2:
+                        done_chunk, future = pending.popleft()
+                        writer.write(_add_predictions(done_chunk, *future.result()))
+                        n_rows += len(done_chunk)
+                while pending:
+                    done_chunk, future = pending.popleft()
+                    writer.write(_add_predictions(done_chunk, *future.result()))
+                    n_rows += len(done_chunk)
+    finally:
+        writer.close()
+
+    return n_rows, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a merged_data.csv-shaped file with the outbreak model.")
+    parser.add_argument("input", nargs="?", help="CSV file to score (omit to run the single-row example)")
+    parser.add_argument("-o", "--output", help="Output file (.csv or .parquet)")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Output format (default: from extension)")
+    parser.add_argument("--model", default=MODEL_PATH, help=f"Model file (default: {MODEL_PATH})")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to score chunks")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.chunksize < 1:
+        parser.error("--chunksize must be at least 1")
+
+    if args.input is None:
+        # Example input
+        new_data = {
+            'NewCases': 120,
+            'Humidity_x': 85,
+            'PopulationDensity': 20000,
+            'Temperature': 28,
+            'Rainfall': 12.5
+        }
+
+        # Make prediction
+        result = predict_outbreak(new_data)
+        print(f"Outbreak Risk: {result} (0 = No, 1 = Yes)")
+        return 0
+
+    if not args.output:
+        root, _ = os.path.splitext(args.input)
+        args.output = f"{root}_predictions.{args.format or 'csv'}"
+
+    try:
+        n_rows, elapsed = score_file(args.input, args.output, model_path=args.model,
+                                     chunksize=args.chunksize, workers=args.workers,
+                                     output_format=args.format)
+    except BatchInputError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    rate = n_rows / elapsed if elapsed > 0 else float('inf')
+    print(f"Scored {n_rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec) -> {args.output}")
+    return 0
+
 if __name__ == "__main__":
-    # Example input
-    new_data = {
-        'NewCases': 120,
-        'Humidity_x': 85,
-        'PopulationDensity': 20000,
-        'Temperature': 28,
-        'Rainfall': 12.5
-    }
-    
-    # Make prediction
-    result = predict_outbreak(new_data)
-    print(f"Outbreak Risk: {result} (0 = No, 1 = Yes)")
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+This module provides an in-process cache in front of model inference.
+
+Entries are keyed on the feature vector after snapping each feature to a
+configurable grid, so UI-only state (such as button click counts) never takes
+part in the key. Callers serving several models (such as per-region models) pass
+a namespace that is added to the key. The cache is a bounded LRU with a TTL and drops every entry
+when the model changes, either because the caller passes a new model version or
+because the watched model file changes on disk.
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Grid step per model feature; inputs are snapped to the nearest multiple before
+# they are looked up or scored, so every request in a bucket gets the same answer.
+DEFAULT_QUANTA = {
+    'NewCases': 1.0,
+    'Humidity_x': 0.1,
+    'PopulationDensity': 1.0,
+    'Temperature': 0.1,
+    'Rainfall': 0.1,
+}
+
+DEFAULT_MAXSIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+DEFAULT_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+
+
+class PredictionCache:
+    """Bounded, thread-safe LRU/TTL cache for model outputs."""
+
+    def __init__(self, feature_names: Sequence[str], quanta: Optional[Dict[str, float]] = None,
+                 maxsize: int = DEFAULT_MAXSIZE, ttl: Optional[float] = DEFAULT_TTL,
+                 model_path: Optional[str] = None, check_interval: float = 1.0):
+        self.feature_names = list(feature_names)
+        quanta = {**DEFAULT_QUANTA, **(quanta or {})}
+        self.quanta = [float(quanta.get(name, 0) or 0) for name in self.feature_names]
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.model_path = model_path
+        self.check_interval = check_interval
+
+        self._entries: "OrderedDict[Tuple, Tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_signature = self._read_model_signature()
+        self._model_version = None
+        self._next_check = time.monotonic() + check_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def quantize(self, features: Sequence[float]) -> Tuple[float, ...]:
+        """Snap each feature to its grid step (features with step 0 are kept as-is)."""
+        if len(features) != len(self.feature_names):
+            raise ValueError(f"Expected {len(self.feature_names)} features, got {len(features)}")
+        return tuple(
+            round(round(float(value) / step) * step, 10) if step else float(value)
+            for value, step in zip(features, self.quanta)
+        )
+
+    def _read_model_signature(self):
+        if not self.model_path:
+            return None
+        try:
+            stat = os.stat(self.model_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _check_model(self) -> None:
+        now = time.monotonic()
+        if self.model_path is None or now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        signature = self._read_model_signature()
+        if signature != self._model_signature:
+            logger.info(f"Model file {self.model_path} changed; clearing prediction cache")
+            self._model_signature = signature
+            self._entries.clear()
+            self.invalidations += 1
+
+    def get_or_compute(self, features: Sequence[float], compute: Callable[[Tuple[float, ...]], object],
+                       version: Optional[str] = None, namespace: Optional[str] = None):
+        """
+        Return the cached result for a feature vector, computing it on a miss.
+        Args:
+            features: Raw feature values in feature_names order.
+            compute: Called with the quantized features to produce the result.
+            version: Version of the model compute uses; a new version clears the cache.
+            namespace: Kept apart from other namespaces, e.g. the region model and its version.
+        Returns:
+            The result for the quantized feature vector.
+        """
+        quantized = self.quantize(features)
+        key = quantized if namespace is None else (namespace,) + quantized
+        now = time.monotonic()
+        with self._lock:
+            self._check_model()
+            if version is not None and version != self._model_version:
+                if self._model_version is not None:
+                    logger.info(f"Model version changed to {version}; clearing prediction cache")
+                    self._entries.clear()
+                    self.invalidations += 1
+                self._model_version = version
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self.ttl is None or now - entry[0] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+
+        # Compute outside the lock so slow inference does not serialize requests
+        result = compute(quantized)
+
+        with self._lock:
+            if version is not None and version != self._model_version:
+                # The model was swapped while computing; don't cache a stale answer
+                return result
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'model_version': self._model_version,
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,183 @@
+"""
+This module stores the processed (merged) dataset as partitioned Parquet.
+
+Rows are partitioned by Region and calendar month with explicit compact dtypes,
+so readers can load only the columns and partitions they need. CSV remains the
+import/export format.
+"""
+import os
+import uuid
+import shutil
+import logging
+import argparse
+from typing import Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROCESSED_DIR = os.path.join(BASE_DIR, "..", "data", "processed")
+PROCESSED_CSV_PATH = os.path.join(PROCESSED_DIR, "merged_data.csv")
+PROCESSED_DATASET_DIR = os.path.join(PROCESSED_DIR, "merged")
+
+# Model features are cast to float32 by the tree estimators anyway, so storing
+# them as float32 loses nothing the model can see.
+PROCESSED_SCHEMA = pa.schema([
+    ('Date', pa.date32()),
+    ('NewCases', pa.int32()),
+    ('Humidity_x', pa.float32()),
+    ('PopulationDensity', pa.int32()),
+    ('OutbreakRisk', pa.int8()),
+    ('Temperature', pa.float32()),
+    ('Humidity_y', pa.float32()),
+    ('Rainfall', pa.float32()),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([('Region', pa.string()), ('Month', pa.string())]), flavor="hive")
+
+# Partitions holding more files than this are rewritten into one file after appends
+MAX_FILES_PER_PARTITION = 8
+# Region x Month partitions one write may touch (pyarrow refuses more than 1024 by default)
+MAX_PARTITIONS_PER_WRITE = 1 << 16
+
+
+def dataset_exists(root: str = PROCESSED_DATASET_DIR) -> bool:
+    """Check whether a Parquet dataset has been written under root."""
+    return os.path.isdir(root) and any(
+        name.endswith(".parquet") for _, _, files in os.walk(root) for name in files
+    )
+
+
+def _to_table(frame: pd.DataFrame) -> pa.Table:
+    frame = frame.copy()
+    frame['Date'] = pd.to_datetime(frame['Date'])
+    frame['Month'] = frame['Date'].dt.strftime('%Y-%m')
+    frame['Region'] = frame['Region'].astype(str)
+    table = pa.Table.from_pandas(frame[['Region', 'Month'] + PROCESSED_SCHEMA.names], preserve_index=False)
+    return table.cast(pa.schema([('Region', pa.string()), ('Month', pa.string())] + list(PROCESSED_SCHEMA)))
+
+
+def write_processed(frame: pd.DataFrame, root: str = PROCESSED_DATASET_DIR, append: bool = False) -> None:
+    """
+    Write merged rows to the partitioned Parquet dataset.
+    Args:
+        frame (pd.DataFrame): Rows with the merged_data.csv columns.
+        root (str): Dataset directory.
+        append (bool): Add the rows as new files instead of replacing the dataset.
+    """
+    if not append and os.path.isdir(root):
+        shutil.rmtree(root)
+    if frame.empty:
+        os.makedirs(root, exist_ok=True)
+        return
+
+    ds.write_dataset(
+        _to_table(frame),
+        root,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_partitions=MAX_PARTITIONS_PER_WRITE,
+    )
+
+    if append:
+        compact_partitions(root)
+
+
+def compact_partitions(root: str = PROCESSED_DATASET_DIR, max_files: int = MAX_FILES_PER_PARTITION) -> int:
+    """Rewrite partitions that accumulated many small append files into one file each."""
+    compacted = 0
+    for directory, _, files in os.walk(root):
+        parts = sorted(name for name in files if name.endswith(".parquet"))
+        if len(parts) <= max_files:
+            continue
+        table = pa.concat_tables([pq.read_table(os.path.join(directory, name)) for name in parts])
+        pq.write_table(table, os.path.join(directory, f"part-{uuid.uuid4().hex}-0.parquet"))
+        for name in parts:
+            os.remove(os.path.join(directory, name))
+        compacted += 1
+    return compacted
+
+
+def _build_filter(regions: Optional[Iterable[str]], start, end):
+    expression = None
+
+    def _and(condition):
+        return condition if expression is None else expression & condition
+
+    if regions is not None:
+        expression = _and(ds.field('Region').isin(list(regions)))
+    # Month bounds prune whole partitions; Date bounds filter inside them
+    if start is not None:
+        start = pd.Timestamp(start)
+        expression = _and(ds.field('Month') >= start.strftime('%Y-%m'))
+        expression = _and(ds.field('Date') >= pa.scalar(start.date(), type=pa.date32()))
+    if end is not None:
+        end = pd.Timestamp(end)
+        expression = _and(ds.field('Month') <= end.strftime('%Y-%m'))
+        expression = _and(ds.field('Date') <= pa.scalar(end.date(), type=pa.date32()))
+    return expression
+
+
+def read_processed(columns: Optional[List[str]] = None, regions: Optional[Iterable[str]] = None,
+                   start=None, end=None, root: str = PROCESSED_DATASET_DIR) -> pd.DataFrame:
+    """
+    Load processed rows, reading only the requested columns and partitions.
+
+    Reading never writes: a missing dataset raises FileNotFoundError. Build it with
+    data_preprocessing.py or import merged_data.csv with `storage.py import`.
+    Args:
+        columns (list): Columns to load; all merged_data.csv columns if omitted.
+        regions (iterable): Only load these regions.
+        start, end: Inclusive Date bounds.
+        root (str): Dataset directory.
+    Returns:
+        pd.DataFrame: Region as a categorical, Date as datetime64.
+    """
+    if not dataset_exists(root):
+        raise FileNotFoundError(f"No processed dataset at {root}; "
+                                f"run `python src/storage.py import --csv {os.path.normpath(PROCESSED_CSV_PATH)}` to create it")
+
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+    if columns is None:
+        columns = ['Region'] + PROCESSED_SCHEMA.names
+    table = dataset.to_table(columns=columns, filter=_build_filter(regions, start, end))
+    frame = table.to_pandas(date_as_object=False)
+    if 'Region' in frame.columns:
+        frame['Region'] = frame['Region'].astype('category')
+    return frame
+
+
+def import_csv(csv_path: str = PROCESSED_CSV_PATH, root: str = PROCESSED_DATASET_DIR, append: bool = False) -> int:
+    """Load a merged_data.csv-shaped file into the Parquet dataset; returns the row count."""
+    frame = pd.read_csv(csv_path)
+    write_processed(frame, root, append=append)
+    return len(frame)
+
+
+def export_csv(csv_path: str = PROCESSED_CSV_PATH, root: str = PROCESSED_DATASET_DIR, **read_kwargs) -> int:
+    """Write the Parquet dataset (or a filtered part of it) out as CSV; returns the row count."""
+    frame = read_processed(root=root, **read_kwargs).sort_values(['Date', 'Region'], kind='stable')
+    frame.to_csv(csv_path, index=False)
+    return len(frame)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Import or export the processed Parquet dataset.")
+    parser.add_argument("command", choices=["import", "export", "compact"])
+    parser.add_argument("--csv", default=PROCESSED_CSV_PATH, help="CSV file to import from or export to")
+    parser.add_argument("--root", default=PROCESSED_DATASET_DIR, help="Parquet dataset directory")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        logger.info(f"Imported {import_csv(args.csv, args.root)} rows into {args.root}")
+    elif args.command == "export":
+        logger.info(f"Exported {export_csv(args.csv, args.root)} rows to {args.csv}")
+    else:
+        logger.info(f"Compacted {compact_partitions(args.root)} partitions in {args.root}")
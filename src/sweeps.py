@@ -0,0 +1,278 @@
+"""
+This module runs scenario sweeps: the model scored over a grid of feature values.
+
+A sweep spec gives a range (start, stop, steps) for any subset of the model
+features and fixed values for the rest. The Cartesian grid is never built in
+full; rows are generated chunk by chunk from their flat grid index and scored in
+vectorized predict_proba calls, so only the outbreak probabilities (4 bytes per
+point) are held in memory. For forests, grid values that fall between the same
+two split thresholds are scored once (see score_grid).
+
+The result summarizes the grid as a 2-D heatmap over two chosen axes and a
+partial-dependence curve per swept feature (the mean probability over every other
+swept feature). Results are cached in memory by spec and model version.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from array_forest import ArrayForest
+from inference import FEATURE_COLUMNS, check_feature_order, predict_proba
+
+logger = logging.getLogger(__name__)
+
+# Largest grid a sweep may cover, and most steps along one feature
+MAX_SWEEP_POINTS = int(os.getenv("MAX_SWEEP_POINTS", str(5_000_000)))
+MAX_STEPS_PER_FEATURE = 1000
+# Grid points per predict_proba call
+SWEEP_CHUNK_SIZE = int(os.getenv("SWEEP_CHUNK_SIZE", "65536"))
+# Sweeps that score up to this many distinct points (see scored_points) are answered
+# inline, about a second on a deep 100-tree forest; larger ones run as background jobs
+SYNC_SWEEP_POINTS = int(os.getenv("SYNC_SWEEP_POINTS", "20000"))
+SWEEP_CACHE_SIZE = int(os.getenv("SWEEP_CACHE_SIZE", "32"))
+
+# Value of each feature that is not swept, unless the spec fixes it
+DEFAULT_BASE = {
+    'NewCases': 100.0,
+    'Humidity_x': 60.0,
+    'PopulationDensity': 5000.0,
+    'Temperature': 25.0,
+    'Rainfall': 10.0,
+}
+
+# Range offered for each feature when the dashboard sweeps it
+FEATURE_RANGES = {
+    'NewCases': (0.0, 500.0),
+    'Humidity_x': (20.0, 100.0),
+    'PopulationDensity': (100.0, 30000.0),
+    'Temperature': (-5.0, 45.0),
+    'Rainfall': (0.0, 50.0),
+}
+
+
+class SweepSpecError(ValueError):
+    """Raised for a sweep spec that cannot be run."""
+
+
+def normalize_spec(spec: dict) -> dict:
+    """
+    Validate a sweep spec and fill in defaults.
+
+    Spec format::
+
+        {"ranges": {"NewCases": {"start": 0, "stop": 500, "steps": 51}, ...},
+         "base": {"PopulationDensity": 8000, ...},   # optional fixed values
+         "axes": ["NewCases", "Temperature"],         # optional heatmap axes
+         "region": "Mumbai"}                          # optional region model
+    Returns:
+        dict: The spec with ranges in FEATURE_COLUMNS order, every fixed value and both axes set.
+    """
+    if not isinstance(spec, dict) or not isinstance(spec.get('ranges'), dict) or not spec['ranges']:
+        raise SweepSpecError("Spec needs a non-empty 'ranges' object")
+    unknown = [name for name in list(spec['ranges']) + list(spec.get('base') or {}) if name not in FEATURE_COLUMNS]
+    if unknown:
+        raise SweepSpecError(f"Unknown features: {', '.join(unknown)}")
+
+    ranges = {}
+    for name in FEATURE_COLUMNS:
+        if name not in spec['ranges']:
+            continue
+        bounds = spec['ranges'][name]
+        try:
+            start, stop, steps = float(bounds['start']), float(bounds['stop']), int(bounds.get('steps', 21))
+        except (KeyError, TypeError, ValueError):
+            raise SweepSpecError(f"Range for {name} needs numeric start, stop and steps")
+        if not 1 <= steps <= MAX_STEPS_PER_FEATURE:
+            raise SweepSpecError(f"Steps for {name} must be between 1 and {MAX_STEPS_PER_FEATURE}")
+        ranges[name] = {'start': start, 'stop': stop, 'steps': steps}
+
+    points = int(np.prod([r['steps'] for r in ranges.values()], dtype=np.int64))
+    if points > MAX_SWEEP_POINTS:
+        raise SweepSpecError(f"Grid has {points:,} points; the limit is {MAX_SWEEP_POINTS:,}")
+
+    base = {name: float(value) for name, value in {**DEFAULT_BASE, **(spec.get('base') or {})}.items()
+            if name not in ranges}
+    swept = list(ranges)
+    axes = list(spec.get('axes') or swept[:2])
+    if any(axis not in ranges for axis in axes) or not 1 <= len(axes) <= 2 or len(set(axes)) != len(axes):
+        raise SweepSpecError(f"Axes must be one or two distinct swept features: {swept}")
+    return {'ranges': ranges, 'base': base, 'axes': axes, 'region': spec.get('region') or None}
+
+
+def spec_key(spec: dict) -> str:
+    """Stable hash of a normalized spec."""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _axis_values(spec: dict) -> Dict[str, np.ndarray]:
+    return {name: np.linspace(r['start'], r['stop'], r['steps']) for name, r in spec['ranges'].items()}
+
+
+def split_thresholds(model) -> Optional[Dict[int, np.ndarray]]:
+    """Sorted split thresholds per feature of a forest (ArrayForest or sklearn), or None for other models."""
+    if isinstance(model, ArrayForest):
+        feature, threshold = model.feature, model.threshold
+        # Leaves carry an infinite threshold
+        is_split = np.isfinite(threshold)
+    elif hasattr(model, 'estimators_') and all(hasattr(e, 'tree_') for e in model.estimators_):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        feature = np.concatenate([tree.feature for tree in trees])
+        threshold = np.concatenate([tree.threshold for tree in trees])
+        is_split = np.concatenate([tree.children_left != -1 for tree in trees])
+    else:
+        return None
+    return {column: np.unique(threshold[is_split & (feature == column)]) for column in range(len(FEATURE_COLUMNS))}
+
+
+def _score_points(model, values: Dict[str, np.ndarray], base: Dict[str, float], chunk_size: int,
+                  progress: Optional[Callable[[float], None]]) -> np.ndarray:
+    shape = tuple(len(v) for v in values.values())
+    n_points = int(np.prod(shape, dtype=np.int64))
+    positive = int(np.flatnonzero(model.classes_ == 1)[0]) if 1 in model.classes_ else len(model.classes_) - 1
+
+    columns = {name: FEATURE_COLUMNS.index(name) for name in values}
+    chunk = np.empty((min(chunk_size, n_points), len(FEATURE_COLUMNS)), dtype=np.float64)
+    for name, value in base.items():
+        chunk[:, FEATURE_COLUMNS.index(name)] = value
+
+    out = np.empty(n_points, dtype=np.float32)
+    for start in range(0, n_points, chunk_size):
+        stop = min(start + chunk_size, n_points)
+        rows = chunk[:stop - start]
+        # Grid coordinates of this chunk's flat indices; only the swept columns change
+        for (name, axis_values), index in zip(values.items(), np.unravel_index(np.arange(start, stop), shape)):
+            rows[:, columns[name]] = axis_values.take(index)
+        out[start:stop] = predict_proba(model, rows)[:, positive]
+        if progress is not None:
+            progress(stop / n_points)
+    return out.reshape(shape)
+
+
+def _representatives(model, spec: dict):
+    """Per-axis values that need scoring and, for every axis value, its representative's index."""
+    values = _axis_values(spec)
+    thresholds = split_thresholds(model)
+    if thresholds is None:
+        return values, [np.arange(len(v)) for v in values.values()]
+    representatives, inverse = {}, []
+    for name, axis_values in values.items():
+        # Trees compare float32 inputs, so the gaps are found for the float32 values
+        gaps = np.searchsorted(thresholds[FEATURE_COLUMNS.index(name)], axis_values.astype(np.float32))
+        _, first, index = np.unique(gaps, return_index=True, return_inverse=True)
+        representatives[name] = axis_values[first]
+        inverse.append(index.reshape(-1))
+    return representatives, inverse
+
+
+def scored_points(model, spec: dict) -> int:
+    """How many grid points score_grid actually scores with this model."""
+    representatives, _ = _representatives(model, spec)
+    return int(np.prod([len(v) for v in representatives.values()], dtype=np.int64))
+
+
+def score_grid(model, spec: dict, chunk_size: int = SWEEP_CHUNK_SIZE,
+               progress: Optional[Callable[[float], None]] = None) -> np.ndarray:
+    """
+    Outbreak probability at every grid point.
+
+    For forests only one value per gap between consecutive split thresholds is
+    scored along each axis: values in the same gap take the same path through every
+    tree, so their probabilities are identical and are copied instead of recomputed.
+    Returns:
+        np.ndarray: float32 array shaped by the steps of the swept features, in FEATURE_COLUMNS order.
+    """
+    check_feature_order(model)
+    representatives, inverse = _representatives(model, spec)
+    reduced = _score_points(model, representatives, spec['base'], chunk_size, progress)
+    return reduced[np.ix_(*inverse)]
+
+
+def summarize(spec: dict, probabilities: np.ndarray) -> dict:
+    """Heatmap over the spec's axes and a partial-dependence curve per swept feature."""
+    values = _axis_values(spec)
+    swept = list(values)
+    partial_dependence = {
+        name: {
+            'values': values[name].round(6).tolist(),
+            'probability': probabilities.mean(axis=tuple(i for i in range(len(swept)) if i != axis),
+                                              dtype=np.float64).round(6).tolist(),
+        }
+        for axis, name in enumerate(swept)
+    }
+    axes = spec['axes']
+    other = tuple(i for i, name in enumerate(swept) if name not in axes)
+    surface = probabilities.mean(axis=other, dtype=np.float64) if other else probabilities.astype(np.float64)
+    if len(axes) == 2 and swept.index(axes[0]) > swept.index(axes[1]):
+        surface = surface.T
+    return {
+        'points': int(probabilities.size),
+        'axes': axes,
+        'x': values[axes[0]].round(6).tolist(),
+        'y': values[axes[1]].round(6).tolist() if len(axes) == 2 else None,
+        # surface[i][j] is the mean probability at x[i] (and y[j])
+        'surface': np.atleast_1d(surface).round(6).tolist(),
+        'partial_dependence': partial_dependence,
+        'mean_probability': float(probabilities.mean(dtype=np.float64)),
+        'high_risk_fraction': float(np.count_nonzero(probabilities > 0.5) / probabilities.size),
+    }
+
+
+class SweepCache:
+    """LRU of sweep summaries keyed on spec and model version."""
+
+    def __init__(self, maxsize: int = SWEEP_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get((key, version))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((key, version))
+            self.hits += 1
+            return entry
+
+    def __contains__(self, entry: tuple) -> bool:
+        with self._lock:
+            return entry in self._entries
+
+    def put(self, key: str, version: str, summary: dict) -> None:
+        with self._lock:
+            self._entries[(key, version)] = summary
+            self._entries.move_to_end((key, version))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+def run_sweep(model, version: str, spec: dict, cache: Optional[SweepCache] = None,
+              progress: Optional[Callable[[float], None]] = None) -> dict:
+    """Score a normalized spec with `model` (served from `cache` when possible) and summarize it."""
+    key = spec_key(spec)
+    if cache is not None:
+        cached = cache.get(key, version)
+        if cached is not None:
+            return dict(cached, cached=True)
+    start = time.perf_counter()
+    probabilities = score_grid(model, spec, progress=progress)
+    summary = dict(summarize(spec, probabilities), spec=spec, spec_key=key, model_version=version,
+                   elapsed_s=time.perf_counter() - start)
+    logger.info(f"Swept {summary['points']:,} points in {summary['elapsed_s']:.2f}s")
+    if cache is not None:
+        cache.put(key, version, summary)
+    return dict(summary, cached=False)
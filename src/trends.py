@@ -0,0 +1,178 @@
+"""
+This module maintains per-region daily and weekly trend aggregates.
+
+The tables are computed from the processed data at ingest time and updated
+incrementally, so the dashboard serves trend charts with an indexed lookup
+instead of recomputing them per request. On a fresh checkout, before any
+preprocessing run, they are built from the shipped merged_data.csv; with no
+processed data at all the tables are empty and so are the charts.
+"""
+import os
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRENDS_DIR = os.path.join(BASE_DIR, "..", "data", "processed", "trends")
+DAILY_PATH = os.path.join(TRENDS_DIR, "daily.parquet")
+WEEKLY_PATH = os.path.join(TRENDS_DIR, "weekly.parquet")
+
+# Pseudo-region holding the aggregate over every region
+NATIONAL = "All Regions"
+
+# Merged-row columns the tables are computed from, and the daily table's columns
+INPUT_COLUMNS = ['Region', 'Date', 'NewCases', 'OutbreakRisk']
+DAILY_COLUMNS = ['Region', 'Date', 'cases', 'outbreaks', 'observations', 'risk_rate', 'cases_ma7',
+                 'risk_rate_ma3', 'risk_rate_ma7', 'risk_projection']
+
+PROJECTION_DAYS = 7
+# Same simple projection the trend chart used: recent risk rate plus 10%
+PROJECTION_GROWTH = 1.1
+
+
+def _daily_sums(rows: pd.DataFrame) -> pd.DataFrame:
+    """Additive per-region, per-day sums of merged rows, including the national total."""
+    rows = rows.assign(Date=pd.to_datetime(rows['Date']), Region=rows['Region'].astype(str))
+    regional = rows.groupby(['Region', 'Date'], sort=False).agg(
+        cases=('NewCases', 'sum'),
+        outbreaks=('OutbreakRisk', 'sum'),
+        observations=('OutbreakRisk', 'size'),
+    ).reset_index()
+    national = regional.groupby('Date', sort=False)[['cases', 'outbreaks', 'observations']].sum().reset_index()
+    national.insert(0, 'Region', NATIONAL)
+    return pd.concat([regional, national], ignore_index=True)
+
+
+def _with_derived_columns(sums: pd.DataFrame) -> pd.DataFrame:
+    """Add rates, rolling means and the 7-day projection to per-day sums."""
+    daily = sums.sort_values(['Region', 'Date'], kind='stable').reset_index(drop=True)
+    daily[['cases', 'outbreaks', 'observations']] = daily[['cases', 'outbreaks', 'observations']].astype(np.int64)
+    daily['risk_rate'] = daily['outbreaks'] / daily['observations']
+
+    by_region = daily.groupby('Region', sort=False)
+    daily['cases_ma7'] = by_region['cases'].transform(lambda s: s.rolling(7, min_periods=1).mean())
+    daily['risk_rate_ma3'] = by_region['risk_rate'].transform(lambda s: s.rolling(3, min_periods=1).mean())
+    daily['risk_rate_ma7'] = by_region['risk_rate'].transform(lambda s: s.rolling(7, min_periods=1).mean())
+    daily['risk_projection'] = np.clip(daily['risk_rate_ma7'] * PROJECTION_GROWTH, 0, 1)
+    return daily
+
+
+def _weekly(daily: pd.DataFrame) -> pd.DataFrame:
+    weeks = daily['Date'] - pd.to_timedelta(daily['Date'].dt.weekday, unit='D')
+    weekly = daily.assign(Week=weeks).groupby(['Region', 'Week'], sort=True)[
+        ['cases', 'outbreaks', 'observations']].sum().reset_index()
+    weekly['risk_rate'] = weekly['outbreaks'] / weekly['observations']
+    return weekly
+
+
+def _save(daily: pd.DataFrame) -> None:
+    os.makedirs(TRENDS_DIR, exist_ok=True)
+    # Write then rename so readers never see a half-written table
+    for frame, path in ((daily, DAILY_PATH), (_weekly(daily), WEEKLY_PATH)):
+        tmp_path = f"{path}.tmp"
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+
+def build_trend_aggregates(rows: pd.DataFrame) -> pd.DataFrame:
+    """Compute the trend tables from all merged rows and save them."""
+    daily = _with_derived_columns(_daily_sums(rows))
+    _save(daily)
+    logger.info(f"Built trend aggregates for {daily['Region'].nunique()} regions")
+    return daily
+
+
+def update_trend_aggregates(new_rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fold newly merged rows into the saved trend tables.
+
+    Only the regions present in new_rows (and the national total) are recomputed,
+    from their stored daily sums rather than the raw history.
+    """
+    if not os.path.exists(DAILY_PATH):
+        return load_or_build_daily()
+
+    daily = pd.read_parquet(DAILY_PATH)
+    if new_rows.empty:
+        return daily
+
+    new_sums = _daily_sums(new_rows)
+    affected = daily['Region'].isin(new_sums['Region'].unique())
+    sums = pd.concat([daily.loc[affected, ['Region', 'Date', 'cases', 'outbreaks', 'observations']], new_sums],
+                     ignore_index=True)
+    sums = sums.groupby(['Region', 'Date'], sort=False).sum().reset_index()
+
+    daily = pd.concat([daily[~affected], _with_derived_columns(sums)], ignore_index=True)
+    daily = daily.sort_values(['Region', 'Date'], kind='stable').reset_index(drop=True)
+    _save(daily)
+    return daily
+
+
+def _merged_rows() -> Optional[pd.DataFrame]:
+    """All merged rows: from the Parquet store, else merged_data.csv, else None."""
+    from storage import PROCESSED_CSV_PATH, dataset_exists, read_processed
+    if dataset_exists():
+        return read_processed(columns=INPUT_COLUMNS)
+    if os.path.exists(PROCESSED_CSV_PATH):
+        # Read only: the Parquet store is created by preprocessing or `storage.py import`
+        logger.info(f"No processed Parquet store yet; building trends from {os.path.normpath(PROCESSED_CSV_PATH)}")
+        return pd.read_csv(PROCESSED_CSV_PATH, usecols=INPUT_COLUMNS)
+    return None
+
+
+def load_or_build_daily() -> pd.DataFrame:
+    """Read the daily trend table, building it from the merged rows if missing; empty if there are none."""
+    if os.path.exists(DAILY_PATH):
+        return pd.read_parquet(DAILY_PATH)
+    rows = _merged_rows()
+    if rows is None:
+        logger.warning("No processed data; trend charts stay empty until data_preprocessing.py runs")
+        return pd.DataFrame(columns=DAILY_COLUMNS)
+    return build_trend_aggregates(rows)
+
+
+class TrendStore:
+    """Per-region index over the daily trend table, reloaded when the file changes."""
+
+    def __init__(self, path: str = DAILY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._loaded = False
+        self._by_region: Dict[str, pd.DataFrame] = {}
+        self._empty = pd.DataFrame(columns=DAILY_COLUMNS)
+
+    def _refresh(self) -> None:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if self._loaded and mtime == self._mtime:
+            return
+        with self._lock:
+            if self._loaded and mtime == self._mtime:
+                return
+            daily = load_or_build_daily() if self.path == DAILY_PATH else pd.read_parquet(self.path)
+            self._by_region = {
+                str(region): frame.reset_index(drop=True)
+                for region, frame in daily.groupby('Region', sort=True)
+            }
+            self._mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+            self._loaded = True
+
+    def regions(self) -> List[str]:
+        self._refresh()
+        return [NATIONAL] + [region for region in self._by_region if region != NATIONAL]
+
+    def lookup(self, region: Optional[str] = None, days: int = 30) -> pd.DataFrame:
+        """Last `days` rows of a region's daily trend (the national total by default); empty without data."""
+        self._refresh()
+        frame = self._by_region.get(region or NATIONAL)
+        if frame is None:
+            return self._empty
+        return frame.tail(days)
@@ -0,0 +1,73 @@
+"""
+This module registers the dashboard's presentational callbacks as clientside callbacks.
+
+Callbacks that only restyle or toggle components, and never need the model, the
+database or the session, run in the browser. They cost no HTTP request. Their
+JavaScript lives in static/ui_callbacks.js (the Dash assets folder) under the
+"ui" namespace. Each one is declared here with ui_callback() and attached to
+the app by register_ui_callbacks().
+
+A new UI-only behavior is added as a function in static/ui_callbacks.js plus a
+ui_callback() declaration, not as an @app.callback. Server callbacks are for
+work that needs Python.
+"""
+import os
+import re
+import logging
+from typing import List, NamedTuple, Sequence
+
+from dash import ClientsideFunction, Input, Output, State
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UI_SCRIPT_PATH = os.path.join(BASE_DIR, "..", "static", "ui_callbacks.js")
+UI_NAMESPACE = "ui"
+
+
+class UICallback(NamedTuple):
+    function_name: str
+    output: Output
+    inputs: Sequence[Input]
+    state: Sequence[State] = ()
+
+
+UI_CALLBACKS: List[UICallback] = []
+
+
+def ui_callback(function_name: str, output: Output, inputs: Sequence[Input], state: Sequence[State] = ()) -> None:
+    """Declare a clientside callback running window.dash_clientside.ui[function_name]."""
+    UI_CALLBACKS.append(UICallback(function_name, output, list(inputs), list(state)))
+
+
+# Press effect on the predict button
+ui_callback("animate_button", Output("predict-button", "style"), [Input("predict-button", "n_clicks")])
+# Navbar collapse on small screens
+ui_callback("toggle_collapse", Output("navbar-collapse", "is_open"), [Input("navbar-toggler", "n_clicks")],
+            [State("navbar-collapse", "is_open")])
+# Welcome line from the per-user values display_page puts in the user-info store
+ui_callback("welcome_message", Output("welcome-message", "children"), [Input("user-info", "data")])
+
+
+def register_ui_callbacks(app, script_path: str = UI_SCRIPT_PATH) -> int:
+    """
+    Attach every declared UI callback to `app` as a clientside callback.
+
+    Raises ValueError if a declared function is missing from the script, so a typo
+    fails at startup instead of silently in the browser.
+    """
+    with open(script_path, encoding="utf-8") as f:
+        defined = set(re.findall(r"^\s*(\w+)\s*:\s*function\b", f.read(), flags=re.MULTILINE))
+    missing = [callback.function_name for callback in UI_CALLBACKS if callback.function_name not in defined]
+    if missing:
+        raise ValueError(f"UI callbacks missing from {script_path}: {', '.join(missing)}")
+
+    for callback in UI_CALLBACKS:
+        app.clientside_callback(
+            ClientsideFunction(namespace=UI_NAMESPACE, function_name=callback.function_name),
+            callback.output,
+            list(callback.inputs),
+            list(callback.state),
+        )
+    logger.info(f"Registered {len(UI_CALLBACKS)} clientside UI callbacks")
+    return len(UI_CALLBACKS)
@@ -0,0 +1,37 @@
+/*
+ * Presentational dashboard callbacks that run in the browser.
+ * Each function is registered from src/ui_callbacks.py under the "ui" namespace.
+ */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    ui: {
+        // Press effect on the predict button once it has been clicked
+        animate_button: function (n_clicks) {
+            var style = {
+                "background": "linear-gradient(45deg, #6366F1, #8B5CF6)",
+                "fontSize": "1.1rem",
+                "border": "none",
+                "borderRadius": "10px"
+            };
+            if (n_clicks) {
+                style.transform = "scale(0.95)";
+                style.boxShadow = "0 2px 5px rgba(99, 102, 241, 0.2)";
+            } else {
+                style.boxShadow = "0 4px 15px rgba(99, 102, 241, 0.3)";
+            }
+            return style;
+        },
+
+        // Open or close a collapse on every click of its toggler
+        toggle_collapse: function (n_clicks, is_open) {
+            return n_clicks ? !is_open : is_open;
+        },
+
+        // Welcome line from the user-info store
+        welcome_message: function (user_info) {
+            if (!user_info || !user_info.username) {
+                return " Welcome!";
+            }
+            return " Welcome, " + user_info.username + "!";
+        }
+    }
+});